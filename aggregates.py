@@ -0,0 +1,396 @@
+"""
+Khối tổng hợp (aggregate cube) dùng chung cho các tab
+
+Dữ liệu ngày được gộp một lần cho mỗi phiên bản thành các ô
+(thành phố, năm-tháng) với sum, count, min, max và tổng bình phương
+của từng số đo. Vùng, mùa và tháng là thuộc tính của ô, nên mọi phép gộp
+theo các chiều đó (và mean, std) đều tính lại được từ khối mà không cần
+quét dữ liệu ngày.
+
+Các biểu đồ gọi group_agg(source, by, spec) với source là DataFrame ngày
+hoặc lát cắt của khối (AggregateCube.select) và nhận cùng một kết quả.
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from data_store import published_path
+
+# CONSTANTS
+CUBE_FILE = 'cube.parquet'
+MEASURES = ['temp_max', 'temp_min', 'temp_mean', 'rainfall', 'humidity', 'windspeed', 'temp_range']
+CUBE_DIMENSIONS = ['city', 'region', 'year_month', 'month', 'season']
+CUBE_STATS = ['sum', 'count', 'min', 'max', 'sumsq']
+ROW_COUNT = 'n_rows'
+
+# Thống kê của khối cần cho từng phép gộp
+_REQUIRED_STATS = {
+    'sum': ['sum'], 'count': ['count'], 'min': ['min'], 'max': ['max'],
+    'mean': ['sum', 'count'], 'std': ['sum', 'count', 'sumsq'],
+}
+
+
+def _stat_col(col, stat):
+    return f'{col}__{stat}'
+
+
+def is_cube(source):
+    """source là lát cắt của khối tổng hợp (không phải dữ liệu ngày)"""
+    return ROW_COUNT in source.columns and 'date' not in source.columns
+
+
+def _cell_keys(df):
+    """Mã ô (thành phố, năm-tháng) của từng dòng, dạng int64; mỗi tháng của mỗi năm là một ô riêng"""
+    city = df['city']
+    if isinstance(city.dtype, pd.CategoricalDtype):
+        city_codes = city.cat.codes.to_numpy().astype(np.int64)
+    else:
+        city_codes = pd.factorize(city, sort=False)[0].astype(np.int64)
+    months = df['date'].to_numpy().astype('datetime64[M]').astype(np.int64)
+    months -= months.min()
+    return city_codes * (int(months.max()) + 1) + months
+
+
+def build_cells(df):
+    """
+    Gộp dữ liệu ngày thành các ô (thành phố, năm-tháng)
+
+    Dữ liệu sắp xếp theo (thành phố, ngày) thì mỗi ô là một đoạn liên tục,
+    được gộp bằng reduceat trong một lần quét; nếu không thì sắp xếp trước.
+
+    Args:
+        df: DataFrame ngày đã có đặc trưng (city, region, date, month, season, số đo)
+
+    Returns:
+        DataFrame mỗi dòng một ô: các chiều CUBE_DIMENSIONS, số dòng gốc và
+        các cột '<số đo>__<sum|count|min|max|sumsq>'
+    """
+    measures = [col for col in MEASURES if col in df.columns]
+    if df.empty:
+        return pd.DataFrame(columns=CUBE_DIMENSIONS + [ROW_COUNT] + [
+            _stat_col(col, stat) for col in measures for stat in CUBE_STATS
+        ])
+
+    keys = _cell_keys(df)
+    change = np.r_[True, keys[1:] != keys[:-1]]
+    if change.sum() != len(np.unique(keys)):
+        order = np.argsort(keys, kind='stable')
+        df, keys = df.iloc[order], keys[order]
+        change = np.r_[True, keys[1:] != keys[:-1]]
+    starts = np.flatnonzero(change)
+
+    cells = {
+        'city': df['city'].take(starts).array,
+        'region': df['region'].take(starts).array,
+        'year_month': df['date'].to_numpy()[starts].astype('datetime64[M]').astype('datetime64[ns]'),
+        'month': df['month'].take(starts).array,
+        'season': df['season'].take(starts).array,
+        ROW_COUNT: np.diff(np.r_[starts, len(df)]),
+    }
+    for col in measures:
+        values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+        cells[_stat_col(col, 'sum')] = np.add.reduceat(filled, starts)
+        cells[_stat_col(col, 'count')] = np.add.reduceat(valid.astype(np.int64), starts)
+        # fmin/fmax bỏ qua NaN; ô toàn NaN cho NaN
+        cells[_stat_col(col, 'min')] = np.fmin.reduceat(values, starts)
+        cells[_stat_col(col, 'max')] = np.fmax.reduceat(values, starts)
+        cells[_stat_col(col, 'sumsq')] = np.add.reduceat(filled * filled, starts)
+
+    return pd.DataFrame(cells)
+
+
+def group_agg(source, by, spec):
+    """
+    Gộp dữ liệu ngày hoặc lát cắt khối theo các chiều `by`
+
+    Args:
+        source: DataFrame ngày hoặc lát cắt khối tổng hợp
+        by: List chiều cần gộp (city, region, season, month, year_month);
+            None = gộp toàn bộ
+        spec: Dict tên cột kết quả -> (cột số đo, 'sum'|'mean'|'min'|'max'|'count'|'std')
+
+    Returns:
+        DataFrame index theo `by` (hoặc Series nếu by là None), cột theo spec
+    """
+    if not is_cube(source):
+        if by is None:
+            return pd.Series({name: getattr(source[col], how)() for name, (col, how) in spec.items()},
+                             dtype='float64')
+        return source.groupby(by, observed=True).agg(**spec)
+
+    # Thống kê cần đọc từ khối và cách gộp chúng
+    needed = {}
+    for col, how in spec.values():
+        for stat in _REQUIRED_STATS[how]:
+            needed[_stat_col(col, stat)] = stat if stat in ('min', 'max') else 'sum'
+
+    if by is None:
+        totals = pd.Series({name: getattr(source[name], kind)() for name, kind in needed.items()},
+                           dtype='float64')
+    else:
+        grouped = source.groupby(by, observed=True)
+        totals = pd.concat([
+            grouped[[name for name, k in needed.items() if k == kind]].agg(kind)
+            for kind in ('sum', 'min', 'max') if kind in needed.values()
+        ], axis=1)
+
+    result = {}
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for name, (col, how) in spec.items():
+            if how in ('sum', 'count', 'min', 'max'):
+                result[name] = totals[_stat_col(col, how)]
+                continue
+            total, count = totals[_stat_col(col, 'sum')], totals[_stat_col(col, 'count')]
+            if how == 'mean':
+                result[name] = total / count
+            else:
+                # Độ lệch chuẩn mẫu (ddof=1) từ tổng và tổng bình phương
+                var = (totals[_stat_col(col, 'sumsq')] - total * total / count) / (count - 1)
+                result[name] = np.sqrt(np.maximum(var, 0))
+
+    if by is None:
+        return pd.Series(result, dtype='float64')
+    return pd.DataFrame(result, index=totals.index)
+
+
+class AggregateCube:
+    """
+    Khối tổng hợp của một phiên bản dữ liệu
+
+    Tạo một lần (một lần groupby trên toàn bộ dữ liệu ngày). select() trả về
+    lát cắt đúng với bộ lọc: các tháng nằm trọn trong khoảng ngày lấy từ
+    khối, tháng bị cắt dở ở hai đầu được gộp lại từ dữ liệu ngày của
+    riêng tháng đó.
+    """
+
+    def __init__(self, df):
+        self.cells = build_cells(df)
+
+    @classmethod
+    def from_cells(cls, cells):
+        """Khối từ các ô đã tính sẵn (ví dụ đọc từ CUBE_FILE của phiên bản đã công bố)"""
+        cube = cls.__new__(cls)
+        cube.cells = cells
+        return cube
+
+    def save(self, path):
+        """Ghi các ô ra file Parquet"""
+        self.cells.to_parquet(path, index=False)
+
+    def select(self, index, cities=None, date_range=None, season=None):
+        """
+        Lát cắt khối cho bộ lọc
+
+        Args:
+            index: FilterIndex hoặc PartitionedIndex của cùng phiên bản dữ liệu
+                (đọc dữ liệu ngày ở hai đầu)
+            cities: List thành phố (None/rỗng = tất cả)
+            date_range: Tuple (start_date, end_date), bao gồm hai đầu
+            season: Mùa ('Tất cả' hoặc None = không lọc)
+
+        Returns:
+            DataFrame cùng định dạng build_cells, dùng được với group_agg
+        """
+        cells = self.cells
+        mask = np.ones(len(cells), dtype=bool)
+        if cities:
+            mask &= cells['city'].isin(cities).to_numpy()
+        if season and season != 'Tất cả':
+            mask &= (cells['season'] == season).to_numpy()
+
+        edges = []
+        if date_range:
+            start = pd.Timestamp(date_range[0])
+            end = pd.Timestamp(date_range[1])
+            end_month = end.to_period('M').to_timestamp()
+            # Tháng đầu / tháng cuối nằm trọn trong khoảng ngày
+            first_full = start if start.is_month_start else start + pd.offsets.MonthBegin(1)
+            last_full = end_month if end.is_month_end else end_month - pd.offsets.MonthBegin(1)
+
+            year_month = cells['year_month']
+            mask &= ((year_month >= first_full) & (year_month <= last_full)).to_numpy()
+
+            # Tháng bị cắt dở: gộp từ dữ liệu ngày
+            if first_full > last_full:
+                edges.append((start, end))
+            else:
+                if start < first_full:
+                    edges.append((start, first_full - pd.Timedelta(days=1)))
+                if end > last_full + pd.offsets.MonthEnd(0):
+                    edges.append((end_month, end))
+
+        selected = cells[mask]
+        partial = [build_cells(index.select(cities, edge, season)) for edge in edges]
+        partial = [frame for frame in partial if not frame.empty]
+        if not partial:
+            return selected
+        return pd.concat([selected] + partial, ignore_index=True)
+
+
+def read_published_cube(version):
+    """
+    Khối tổng hợp lưu cùng một phiên bản đã công bố
+
+    Returns:
+        AggregateCube hoặc None nếu phiên bản không có file khối
+    """
+    path = os.path.join(published_path(version), CUBE_FILE)
+    return AggregateCube.from_cells(pd.read_parquet(path)) if os.path.exists(path) else None
+
+
+def rollup(source, by):
+    """
+    Gộp các ô của khối (hoặc kết quả PrefixIndex) lên các chiều `by`
+
+    Returns:
+        DataFrame cùng định dạng ô, mỗi tổ hợp `by` một dòng
+    """
+    stat_cols = [col for col in source.columns if '__' in col]
+    how = {col: col.rsplit('__', 1)[1] for col in stat_cols}
+    spec = {ROW_COUNT: 'sum'}
+    spec.update({col: stat if stat in ('min', 'max') else 'sum' for col, stat in how.items()})
+    return source.groupby(by, observed=True).agg(spec).reset_index()
+
+
+class PrefixIndex:
+    """
+    Chỉ mục tổng tiền tố cho thống kê theo khoảng ngày của từng thành phố
+
+    Dữ liệu sắp xếp theo (thành phố, ngày) nên mỗi (thành phố, khoảng ngày)
+    là một đoạn [đầu, cuối). Với mỗi số đo lưu tổng tiền tố của giá trị
+    (và số giá trị hợp lệ, tổng bình phương khi cần), nên sum / count / mean
+    của một đoạn chỉ là hiệu hai phần tử. Min / max dùng sparse table trên
+    các khối BLOCK_SIZE dòng, phần lẻ hai đầu quét trực tiếp (< 2 khối).
+
+    Mỗi truy vấn tốn O(số thành phố), không phụ thuộc độ dài lịch sử.
+    """
+
+    BLOCK_SIZE = 64
+
+    # Thống kê lưu cho từng số đo (đủ cho KPI tổng quan và bảng so sánh)
+    STATS = {
+        'temp_mean': ('sum', 'count', 'sumsq'),
+        'temp_max': ('sum', 'count', 'max'),
+        'temp_min': ('sum', 'count', 'min'),
+        'humidity': ('sum', 'count'),
+        'rainfall': ('sum', 'count'),
+        'windspeed': ('sum', 'count'),
+        'temp_range': ('sum', 'count'),
+    }
+
+    def __init__(self, index):
+        """
+        Args:
+            index: FilterIndex của phiên bản dữ liệu (dữ liệu đã sắp xếp)
+        """
+        self.index = index
+        df = index.df
+        self.regions = df['region'].array if 'region' in df.columns else None
+
+        self.prefix = {}
+        self.tables = {}
+        for col, stats in self.STATS.items():
+            if col not in df.columns:
+                continue
+            values = df[col].to_numpy(dtype='float64', na_value=np.nan)
+            valid = ~np.isnan(values)
+            filled = np.where(valid, values, 0.0)
+
+            self.prefix[_stat_col(col, 'sum')] = np.r_[0.0, np.cumsum(filled)]
+            # Cột không có NaN: số giá trị hợp lệ = số dòng, không cần lưu
+            if not valid.all():
+                self.prefix[_stat_col(col, 'count')] = np.r_[0, np.cumsum(valid, dtype=np.int64)]
+            if 'sumsq' in stats:
+                self.prefix[_stat_col(col, 'sumsq')] = np.r_[0.0, np.cumsum(filled * filled)]
+            for stat in ('min', 'max'):
+                if stat in stats:
+                    self.tables[_stat_col(col, stat)] = (values, self._sparse_table(values, stat))
+
+    @classmethod
+    def _sparse_table(cls, values, stat):
+        """Sparse table min/max trên các khối: level k chứa kết quả của 2^k khối liên tiếp"""
+        reduce = np.fmin if stat == 'min' else np.fmax
+        starts = np.arange(0, len(values), cls.BLOCK_SIZE)
+        level = reduce.reduceat(values, starts) if len(values) else np.array([])
+        levels = [level]
+        width = 1
+        while 2 * width <= len(level):
+            prev = levels[-1]
+            levels.append(reduce(prev[:-width], prev[width:]))
+            width *= 2
+        return levels
+
+    @classmethod
+    def _range_extreme(cls, values, levels, stat, lo, hi):
+        """Min/max của values[lo:hi] (bỏ qua NaN)"""
+        reduce = np.fmin if stat == 'min' else np.fmax
+        if hi <= lo:
+            return np.nan
+
+        first_block = -(-lo // cls.BLOCK_SIZE)
+        last_block = hi // cls.BLOCK_SIZE
+        if first_block >= last_block:
+            return reduce.reduce(values[lo:hi])
+
+        k = int(last_block - first_block).bit_length() - 1
+        result = reduce(levels[k][first_block], levels[k][last_block - (1 << k)])
+        if lo < first_block * cls.BLOCK_SIZE:
+            result = reduce(result, reduce.reduce(values[lo:first_block * cls.BLOCK_SIZE]))
+        if hi > last_block * cls.BLOCK_SIZE:
+            result = reduce(result, reduce.reduce(values[last_block * cls.BLOCK_SIZE:hi]))
+        return result
+
+    @property
+    def nbytes(self):
+        """Dung lượng các mảng tổng tiền tố và sparse table"""
+        total = sum(arr.nbytes for arr in self.prefix.values())
+        total += sum(level.nbytes for _, levels in self.tables.values() for level in levels)
+        return total
+
+    def select(self, cities=None, date_range=None):
+        """
+        Thống kê của từng thành phố trong khoảng ngày
+
+        Args:
+            cities: List thành phố (None/rỗng = tất cả)
+            date_range: Tuple (start_date, end_date), bao gồm hai đầu
+
+        Returns:
+            DataFrame cùng định dạng ô của khối (mỗi thành phố một dòng),
+            dùng được với group_agg theo 'city', 'region' hoặc toàn bộ
+        """
+        ranges = [(name, lo, hi) for name, lo, hi in self.index.city_ranges(cities, date_range) if hi > lo]
+        names = [name for name, _, _ in ranges]
+        lo = np.array([r[1] for r in ranges], dtype=np.int64)
+        hi = np.array([r[2] for r in ranges], dtype=np.int64)
+
+        city_col = self.index.df['city']
+        result = {
+            'city': pd.Categorical(names, categories=city_col.cat.categories)
+            if isinstance(city_col.dtype, pd.CategoricalDtype) else names,
+        }
+        if self.regions is not None:
+            result['region'] = self.regions.take(lo) if len(lo) else self.regions[:0]
+        result[ROW_COUNT] = hi - lo
+
+        for col, stats in self.STATS.items():
+            if _stat_col(col, 'sum') not in self.prefix:
+                continue
+            for stat in stats:
+                name = _stat_col(col, stat)
+                if name in self.prefix:
+                    result[name] = self.prefix[name][hi] - self.prefix[name][lo]
+                elif stat == 'count':
+                    result[name] = hi - lo
+                else:
+                    values, levels = self.tables[name]
+                    result[name] = np.array(
+                        [self._range_extreme(values, levels, stat, a, b) for a, b in zip(lo, hi)],
+                        dtype='float64'
+                    )
+
+        return pd.DataFrame(result)
@@ -3,11 +3,20 @@ Dashboard Phân Tích Thời Tiết các thành phố lớn Việt Nam 2025
 Main Application File
 """
 
+import pandas as pd
 import streamlit as st
 from datetime import datetime
 
 # Import modules
-from data_fetcher import fetch_weather_data, filter_data, CITIES
+from data_fetcher import DatasetCache, default_cities, process_memory, CITIES
+from data_store import latest_version, map_published, read_published_meta
+from data_index import FilterIndex, PartitionedIndex
+from aggregates import AggregateCube, MEASURES, PrefixIndex, read_published_cube, rollup
+from running_stats import read_published_stats
+from sql_backend import QUERY_BACKEND, SQLBackend
+from selection_cache import get_selection_cache, derive
+from figure_cache import get_figure_cache
+from visualizations import MAX_CHART_CITIES
 from tab_overview import render_tab_overview
 from tab_trends import render_tab_trends
 from tab_temperature import render_tab_temperature
@@ -110,14 +119,78 @@ st.title("🌤️Thời tiết các thành phố lớn Việt Nam 2025")
 st.markdown("---")
 
 # LOAD DATA
-@st.cache_data(ttl=3600, show_spinner=False)
-def load_data_cached():
-    return fetch_weather_data()
-
+# Số năm gần nhất được chọn sẵn trong khoảng thời gian (lịch sử có thể dài tới 1940)
+DEFAULT_VIEW_YEARS = 2
+
+# Phiên bản dữ liệu do refresh.py công bố: chỉ đọc, không gọi API trong request.
+# Chỉ đọc metadata, khối tổng hợp và thống kê luỹ tiến; dữ liệu ngày được đọc
+# theo phân vùng khi lọc, nên khởi động không phụ thuộc độ dài lịch sử.
+# Phiên bản có file Arrow được ánh xạ bộ nhớ: các tiến trình Streamlit dùng chung
+# một bản dữ liệu trong page cache. Phiên bản mới được nạp khi LATEST đổi, bản cũ
+# được giải phóng khi bị đẩy khỏi cache.
+# WEATHER_QUERY_BACKEND=duckdb: lọc bằng SQL trên DuckDB (xem sql_backend.py)
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_published_dataset(version):
+    if QUERY_BACKEND == 'duckdb':
+        index = SQLBackend(version)
+    else:
+        mapped = map_published(version)
+        index = FilterIndex(mapped) if mapped is not None else PartitionedIndex(version)
+    cube = read_published_cube(version)
+    if cube is None:
+        # Phiên bản cũ chưa lưu khối: tạo từ toàn bộ dữ liệu
+        cube = AggregateCube(FilterIndex(index.select()).df)
+    return index, cube
+
+# Chưa có phiên bản nào được công bố: tự tải trong tiến trình, dùng chung cho mọi
+# phiên, phục vụ dữ liệu đã có ngay và làm mới ở nền khi cũ
+@st.cache_resource(show_spinner=False)
+def get_dataset_cache():
+    return DatasetCache(compact=True)
+
+# Thống kê luỹ tiến lưu kèm phiên bản (None nếu phiên bản cũ không có)
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_published_stats(version):
+    return read_published_stats(version)
+
+# Độ phân giải của phiên bản (refresh.py --resolution): dữ liệu theo giờ chỉ có với 'hourly'
+@st.cache_resource(show_spinner=False, max_entries=2)
+def load_published_resolution(version):
+    return read_published_meta(version).get('resolution', 'daily')
+
+# Chỉ mục lọc: tạo một lần cho mỗi phiên bản dữ liệu, dùng chung cho mọi phiên
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_filter_index(version, _df):
+    return FilterIndex(_df)
+
+# Khối tổng hợp (thành phố x tháng): các tab đọc tổng hợp từ đây thay vì groupby dữ liệu ngày
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_aggregate_cube(version, _df):
+    return AggregateCube(_df)
+
+# Tổng tiền tố theo thành phố: KPI theo khoảng ngày không phụ thuộc độ dài lịch sử
+@st.cache_resource(show_spinner=False, max_entries=2)
+def get_prefix_index(version, _index):
+    return PrefixIndex(_index)
+
+data_version = latest_version()
 with st.spinner('🌍 Đang tải dữ liệu thời tiết từ API...'):
-    df = load_data_cached()
-
-if df.empty:
+    if data_version is not None:
+        filter_index, aggregate_cube = load_published_dataset(data_version)
+        running_stats = load_published_stats(data_version)
+        hourly_active = load_published_resolution(data_version) == 'hourly'
+        prefix_index = None
+    else:
+        df, data_version = get_dataset_cache().get()
+        running_stats = get_dataset_cache().stats_for(data_version)
+        hourly_active = False
+        filter_index = aggregate_cube = prefix_index = None
+        if not df.empty:
+            filter_index = get_filter_index(data_version, df)
+            aggregate_cube = get_aggregate_cube(data_version, filter_index.df)
+            prefix_index = get_prefix_index(data_version, filter_index)
+
+if filter_index is None or len(filter_index) == 0:
     st.error("⚠️ Không thể tải dữ liệu. Vui lòng kiểm tra kết nối internet và thử lại.")
     st.stop()
 
@@ -125,20 +198,23 @@ if df.empty:
 st.sidebar.title("🎛️ Bộ Lọc Dữ Liệu")
 st.sidebar.markdown("---")
 
-# City filter
+# City filter (gõ để tìm; để trống = tất cả địa điểm)
 selected_cities = st.sidebar.multiselect(
     "📍 Chọn thành phố",
     options=list(CITIES.keys()),
-    default=list(CITIES.keys()),
-    help="Chọn một hoặc nhiều thành phố để phân tích"
+    default=default_cities(),
+    placeholder=f"Gõ để tìm trong {len(CITIES)} địa điểm...",
+    help=f"Chọn một hoặc nhiều thành phố để phân tích. Để trống để xem tất cả; "
+         f"biểu đồ theo thành phố tự chọn tối đa {MAX_CHART_CITIES} thành phố nổi bật"
 )
 
-# Date range filter
+# Date range filter (chọn sẵn DEFAULT_VIEW_YEARS năm gần nhất)
+first_date, last_date = filter_index.first_date, filter_index.last_date
 date_range = st.sidebar.date_input(
     "📅 Khoảng thời gian",
-    value=(df['date'].min(), df['date'].max()),
-    min_value=df['date'].min(),
-    max_value=df['date'].max(),
+    value=(max(first_date, last_date - pd.DateOffset(years=DEFAULT_VIEW_YEARS)), last_date),
+    min_value=first_date,
+    max_value=last_date,
     help="Chọn khoảng thời gian cần phân tích"
 )
 
@@ -156,31 +232,87 @@ selected_season = st.sidebar.selectbox(
 st.sidebar.markdown("---")
 
 # FILTER DATA
-df_filtered = filter_data(
-    df,
+# Kết quả lọc dùng chung giữa các phiên, khoá theo phiên bản dữ liệu + bộ lọc đã chuẩn hoá
+selection_cache = get_selection_cache()
+filter_key = (data_version,) + filter_index.normalize(selected_cities, date_range, selected_season)
+df_filtered = selection_cache.get(filter_key, lambda: filter_index.select(
     cities=selected_cities if selected_cities else None,
     date_range=date_range,
     season=selected_season
-)
+))
+
+if df_filtered.empty:
+    st.warning("❌ Không có dữ liệu cho bộ lọc đã chọn")
+    st.stop()
+
+cube = derive(df_filtered, 'cube', lambda: aggregate_cube.select(
+    filter_index,
+    cities=selected_cities if selected_cities else None,
+    date_range=date_range,
+    season=selected_season
+))
+
+# Bộ lọc phủ toàn bộ lịch sử (không cắt ngày, không lọc mùa): đọc từ thống kê luỹ tiến
+full_history = running_stats is not None and filter_key[2:] == (None, None)
+
+# Thống kê theo thành phố cho KPI và bảng so sánh: từ thống kê luỹ tiến, tổng
+# tiền tố (dữ liệu trong bộ nhớ), hoặc từ khối tổng hợp (dữ liệu đọc theo phân
+# vùng, hoặc khi lọc theo mùa vì mùa không phải một khoảng ngày liên tục)
+def select_city_stats():
+    if full_history:
+        return running_stats.city_frame(selected_cities if selected_cities else None)
+    if selected_season == 'Tất cả' and prefix_index is not None:
+        return prefix_index.select(selected_cities if selected_cities else None, date_range)
+    return rollup(cube, ['city', 'region'])
+
+city_stats = derive(df_filtered, 'city_stats', select_city_stats)
+
+# Ma trận tương quan: gộp đồng mô-men của các thành phố thay vì quét dữ liệu ngày
+def select_correlation():
+    if full_history:
+        return running_stats.correlation(selected_cities if selected_cities else None, MEASURES)
+    return df_filtered[[col for col in MEASURES if col in df_filtered.columns]].corr()
+
+corr_matrix = derive(df_filtered, 'correlation', select_correlation)
 
 # Data info
+n_rows, n_cities, first_day, last_day = derive(df_filtered, 'summary', lambda: (
+    len(df_filtered), df_filtered['city'].nunique(), df_filtered['date'].min(), df_filtered['date'].max()
+))
 st.sidebar.info(f"""
 📊 **Thống kê dữ liệu:**
-- Số điểm dữ liệu: **{len(df_filtered):,}**
-- Số thành phố: **{df_filtered['city'].nunique()}**
-- Từ ngày: **{df_filtered['date'].min().strftime('%d/%m/%Y')}**
-- Đến ngày: **{df_filtered['date'].max().strftime('%d/%m/%Y')}**
+- Số điểm dữ liệu: **{n_rows:,}**
+- Số thành phố: **{n_cities}**
+- Từ ngày: **{first_day.strftime('%d/%m/%Y')}**
+- Đến ngày: **{last_day.strftime('%d/%m/%Y')}**
 """)
 
+cache_stats = selection_cache.stats()
+st.sidebar.caption(
+    f"⚡ Cache bộ lọc: trúng {cache_stats['hit_rate']:.0%} bộ lọc, "
+    f"{cache_stats['derived_hit_rate']:.0%} tổng hợp · {cache_stats['entries']} mục, "
+    f"{cache_stats['nbytes'] / 1024 ** 2:.0f} MB"
+)
+figure_stats = get_figure_cache().stats()
+st.sidebar.caption(
+    f"🖼️ Cache biểu đồ: trúng {figure_stats['hit_rate']:.0%} · {figure_stats['entries']} biểu đồ, "
+    f"{figure_stats['nbytes'] / 1024 ** 2:.0f} MB"
+)
+memory = process_memory()
+if memory is not None:
+    st.sidebar.caption(
+        f"🧠 Bộ nhớ tiến trình: {memory['private']:.0f} MB riêng + {memory['shared']:.0f} MB dùng chung "
+        f"(PSS {memory['pss']:.0f} MB)"
+    )
+
 # Download button
 st.sidebar.markdown("---")
 st.sidebar.subheader("📥 Tải Dữ Liệu")
 
-@st.cache_data
 def convert_df_to_csv(df):
     return df.to_csv(index=False).encode('utf-8-sig')
 
-csv = convert_df_to_csv(df_filtered)
+csv = derive(df_filtered, 'csv', lambda: convert_df_to_csv(df_filtered))
 
 st.sidebar.download_button(
     label="⬇️ Tải CSV",
@@ -202,22 +334,22 @@ tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
 
 # Render tabs
 with tab1:
-    render_tab_overview(df_filtered)
+    render_tab_overview(df_filtered, cube, city_stats)
 
 with tab2:
-    render_tab_trends(df_filtered)
+    render_tab_trends(df_filtered, cube, hourly=hourly_active)
 
 with tab3:
-    render_tab_temperature(df_filtered)
+    render_tab_temperature(df_filtered, cube)
 
 with tab4:
-    render_tab_rainfall(df_filtered)
+    render_tab_rainfall(df_filtered, cube)
 
 with tab5:
-    render_tab_comparison(df_filtered)
+    render_tab_comparison(df_filtered, cube, city_stats, corr_matrix)
 
 with tab6:
-    render_tab_map(df_filtered)
+    render_tab_map(df_filtered, cube)
 
 
 # FOOTER
@@ -243,15 +375,3 @@ st.sidebar.markdown("""
 
 💡 **Tips:** Hover chuột lên biểu đồ để xem chi tiết!
 """)
-
-# ERROR HANDLING
-if len(df_filtered) == 0:
-    st.warning("⚠️ Không có dữ liệu phù hợp với bộ lọc. Vui lòng điều chỉnh các tiêu chí lọc.")
-    
-    
-    
-    
-    
-    
-    
-    
\ No newline at end of file
@@ -0,0 +1,99 @@
+"""
+Benchmark tổng hợp cho các tab: groupby trên dữ liệu ngày vs khối tổng hợp
+
+Đo tổng thời gian các phép gộp của một lần rerun dashboard (thống kê, area
+chart, treemap, sunburst, bản đồ, biểu đồ mùa, radar...) và kiểm tra hai
+cách cho cùng kết quả:
+    python benchmarks/bench_aggregates.py --rows 1000000 10000000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+import data_fetcher
+from aggregates import AggregateCube, group_agg
+from bench_features import make_frame
+from data_index import FilterIndex
+
+# Các phép gộp mà các tab thực hiện trong một lần rerun
+TAB_AGGREGATIONS = [
+    (None, {'avg_temp': ('temp_mean', 'mean'), 'max_temp': ('temp_max', 'max'),
+            'min_temp': ('temp_min', 'min'), 'total_rainfall': ('rainfall', 'sum')}),
+    (['city'], {'temp_mean': ('temp_mean', 'mean'), 'rainfall': ('rainfall', 'sum'),
+                'humidity': ('humidity', 'mean'), 'temp_range': ('temp_range', 'mean')}),
+    (['month', 'city'], {'humidity': ('humidity', 'mean'), 'rainfall': ('rainfall', 'sum')}),
+    (['region', 'city'], {'rainfall': ('rainfall', 'sum')}),
+    (['region', 'season', 'city'], {'rainfall': ('rainfall', 'sum')}),
+    (['season', 'city'], {'temp_mean': ('temp_mean', 'mean'), 'humidity': ('humidity', 'mean')}),
+    (['season'], {'rainfall': ('rainfall', 'sum')}),
+    (['month'], {'temp_mean': ('temp_mean', 'mean')}),
+]
+
+
+def make_dataset(n_rows):
+    """Dữ liệu ngày đã có đặc trưng, kèm vùng; thành phố và vùng dạng category như lược đồ gọn"""
+    raw = make_frame(n_rows)
+    raw['region'] = np.array(['Bắc', 'Trung', 'Nam'])[raw['city'].str[-3:].astype(int) % 3]
+    raw['lat'] = 0.0
+    raw['lon'] = 0.0
+    df = data_fetcher.add_features(raw)
+    return df.astype({'city': 'category', 'region': 'category'})
+
+
+def run_aggregations(source):
+    return [group_agg(source, by, spec) for by, spec in TAB_AGGREGATIONS]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000])
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        df = make_dataset(n_rows)
+        index = FilterIndex(df)
+
+        t0 = time.perf_counter()
+        cube = AggregateCube(index.df)
+        t_build = time.perf_counter() - t0
+
+        cities = list(index.city_bounds)
+        first, last = df['date'].min(), df['date'].max()
+        cases = {
+            'toàn bộ': (None, None, None),
+            '8 thành phố, cắt giữa tháng': (cities[:8], (first + pd.Timedelta(days=400), last - pd.Timedelta(days=45)), None),
+            'mùa Hè': (None, (first, last), 'Hè'),
+        }
+
+        print(f'{n_rows:,} dòng (tạo khối {t_build:.2f}s, {len(cube.cells):,} ô)')
+        for name, (sel_cities, date_range, season) in cases.items():
+            selection = index.select(sel_cities, date_range, season)
+
+            t0 = time.perf_counter()
+            expected = run_aggregations(selection)
+            t_raw = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            cube_slice = cube.select(index, sel_cities, date_range, season)
+            result = run_aggregations(cube_slice)
+            t_cube = time.perf_counter() - t0
+
+            for left, right in zip(expected, result):
+                if isinstance(left, pd.Series):
+                    pd.testing.assert_series_equal(left, right, rtol=1e-6)
+                else:
+                    pd.testing.assert_frame_equal(left, right, rtol=1e-6, check_dtype=False)
+
+            print(f'  {name:<30} groupby {t_raw * 1000:8.1f}ms  khối {t_cube * 1000:7.1f}ms  '
+                  f'x{t_raw / t_cube:.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+"""
+Benchmark biểu đồ đường của tab Xu hướng khi lịch sử dài ra
+
+Dựng biểu đồ nhiệt độ theo ngày (create_line_chart) cho --cities thành phố
+với số năm tăng dần, theo từng cách giảm điểm; in số điểm gửi xuống trình
+duyệt, kích thước JSON của figure, loại trace và thời gian dựng. Thời gian
+vẽ trên trình duyệt không đo được ở đây; nó tỉ lệ với số điểm và loại trace:
+    python benchmarks/bench_charts.py --cities 10 --years 1 10 40
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import visualizations
+from bench_range_stats import make_dataset
+from visualizations import create_line_chart
+
+
+def no_downsample(df, x_col, y_col, group_col=None):
+    """Không giảm điểm (để so sánh với trước khi có downsample.py)"""
+    return df
+
+
+def build(df, downsample):
+    t0 = time.perf_counter()
+    fig = create_line_chart(df, 'date', 'temp_mean', 'city', 'Nhiệt độ', downsample=downsample)
+    elapsed = time.perf_counter() - t0
+    points = sum(len(trace.x) for trace in fig.data)
+    return fig, points, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cities', type=int, default=10)
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 10, 40])
+    args = parser.parse_args()
+
+    visualizations.DOWNSAMPLERS['không'] = no_downsample
+    for years in args.years:
+        df = make_dataset(args.cities, years)
+        print(f'{years} năm x {args.cities} thành phố, {len(df):,} dòng')
+        for downsample in ('không', 'minmax', 'lttb'):
+            fig, points, elapsed = build(df, downsample)
+            size = len(fig.to_json()) / 1e6
+            trace = fig.data[0].type
+            print(f'  {downsample:<7} {points:>9,} điểm  JSON {size:7.2f} MB  {trace:<10} dựng {elapsed * 1000:6.0f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark histogram, box plot và violin plot: plotly tự tính vs tính sẵn phía server
+
+Dựng các biểu đồ phân phối của tab Tổng quan / Nhiệt độ trên dữ liệu giả
+lập với số năm tăng dần, theo hai cách (server_side=False / True của
+create_histogram, create_boxplot, create_violin_plot); in kích thước JSON
+của figure (dữ liệu gửi xuống trình duyệt) và thời gian dựng:
+    python benchmarks/bench_distributions.py --cities 10 --years 1 10 40
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_range_stats import make_dataset
+from visualizations import create_boxplot, create_histogram, create_violin_plot
+
+CHARTS = {
+    'histogram': lambda df, server_side: create_histogram(df, 'temp_mean', 'Nhiệt độ', 'Nhiệt độ (°C)', server_side=server_side),
+    'box thành phố': lambda df, server_side: create_boxplot(df, 'city', 'temp_mean', 'Nhiệt độ', server_side=server_side),
+    'box mùa x miền': lambda df, server_side: create_boxplot(df, 'season', 'temp_range', 'Biên độ', 'region', server_side=server_side),
+    'violin thành phố': lambda df, server_side: create_violin_plot(df, 'city', 'temp_mean', 'Nhiệt độ', server_side=server_side),
+}
+
+
+def build(chart, df, server_side):
+    """Dựng figure và serialize như st.plotly_chart; trả về (kích thước JSON, thời gian)"""
+    t0 = time.perf_counter()
+    spec = chart(df, server_side).to_json()
+    return len(spec), time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cities', type=int, default=10)
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 10, 40])
+    args = parser.parse_args()
+
+    for years in args.years:
+        df = make_dataset(args.cities, years)
+        print(f'{years} năm x {args.cities} thành phố, {len(df):,} dòng')
+        for name, chart in CHARTS.items():
+            (raw_size, raw_time), (size, seconds) = build(chart, df, False), build(chart, df, True)
+            print(f'  {name:<17} plotly {raw_size / 1e3:7.0f} kB {raw_time * 1000:5.0f}ms   '
+                  f'server {size / 1e3:5.0f} kB {seconds * 1000:5.0f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark feature engineering: add_features cũ (apply + pd.cut) vs vectorized
+
+    python benchmarks/bench_features.py --rows 10000000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+import data_fetcher
+
+
+def make_frame(n_rows, n_cities=100, seed=0):
+    """Sinh DataFrame thô (chưa có đặc trưng) với n_rows dòng, mỗi thành phố một chuỗi ngày liên tục"""
+    rng = np.random.default_rng(seed)
+    days_per_city = -(-n_rows // n_cities)
+    city_idx = np.repeat(np.arange(n_cities), days_per_city)[:n_rows]
+    day_idx = np.tile(np.arange(days_per_city), n_cities)[:n_rows]
+
+    return pd.DataFrame({
+        'city': np.array([f'Trạm {i:03d}' for i in range(n_cities)], dtype=object)[city_idx],
+        'date': np.datetime64('1940-01-01', 'ns') + day_idx.astype('timedelta64[D]'),
+        'temp_max': rng.normal(30, 4, n_rows),
+        'temp_min': rng.normal(22, 4, n_rows),
+        'temp_mean': rng.normal(26, 4, n_rows),
+        'rainfall': rng.gamma(0.6, 8, n_rows),
+        'humidity': rng.uniform(50, 100, n_rows),
+        'windspeed': rng.uniform(0, 50, n_rows),
+    })
+
+
+def add_features_legacy(df):
+    """add_features trước khi vectorize (apply theo từng phần tử, 4 lần pd.cut)"""
+    df['month'] = df['date'].dt.month
+    df['day'] = df['date'].dt.day
+    df['week'] = df['date'].dt.isocalendar().week
+    df['dayofweek'] = df['date'].dt.dayofweek
+    df['season'] = df['month'].apply(data_fetcher.get_season)
+    df['temp_range'] = df['temp_max'] - df['temp_min']
+    df['temp_category'] = pd.cut(df['temp_mean'], bins=[0, 20, 28, 100], labels=['Mát', 'Ấm', 'Nóng'])
+    df['humidity_level'] = pd.cut(df['humidity'], bins=[0, 60, 80, 100], labels=['Thấp', 'TB', 'Cao'])
+    df['rain_category'] = pd.cut(df['rainfall'], bins=[0, 5, 20, 1000], labels=['Ít', 'Vừa', 'Nhiều'])
+    df['wind_category'] = pd.cut(df['windspeed'], bins=[0, 20, 40, 100], labels=['Nhẹ', 'Vừa', 'Mạnh'])
+    df['comfort_index'] = 100 - abs(df['temp_mean'] - 25) * 3 - abs(df['humidity'] - 60) / 2
+    return df
+
+
+def timed(func, *args):
+    t0 = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--cities', type=int, default=100)
+    args = parser.parse_args()
+
+    raw = make_frame(args.rows, args.cities)
+
+    old, t_old = timed(add_features_legacy, raw.copy())
+    new, t_new = timed(data_fetcher.add_features, raw.copy())
+
+    # Kiểm tra kết quả giống nhau (bỏ qua kiểu dữ liệu)
+    for col in old.columns:
+        left = old[col].astype(str) if isinstance(old[col].dtype, pd.CategoricalDtype) or old[col].dtype == object else old[col]
+        right = new[col].astype(str) if isinstance(new[col].dtype, pd.CategoricalDtype) or new[col].dtype == object else new[col]
+        pd.testing.assert_series_equal(left, right, check_dtype=False, check_names=False)
+
+    # Thêm 1 ngày mới cho mỗi thành phố: tính lại toàn bộ vs chỉ tính dòng mới
+    last = raw.groupby('city')['date'].max()
+    delta = make_frame(len(last), len(last), seed=1)
+    delta['city'] = last.index.values
+    delta['date'] = (last + pd.Timedelta(days=1)).values
+    full = pd.concat([raw, delta], ignore_index=True)
+
+    _, t_full = timed(data_fetcher.add_features, full)
+    _, t_delta = timed(lambda: pd.concat([new, data_fetcher.add_features(delta)], ignore_index=True))
+
+    print(f'{args.rows:,} dòng, {args.cities} thành phố')
+    print(f'  add_features cũ       : {t_old:7.2f}s')
+    print(f'  add_features vectorize: {t_new:7.2f}s  (x{t_old / t_new:.1f})')
+    print(f'  thêm 1 ngày - tính lại toàn bộ : {t_full:7.2f}s')
+    print(f'  thêm 1 ngày - chỉ dòng mới     : {t_delta:7.2f}s')
+
+
+if __name__ == '__main__':
+    main()
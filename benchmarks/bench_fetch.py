@@ -0,0 +1,62 @@
+"""
+Benchmark thời gian tải dữ liệu: tuần tự vs song song, từng địa điểm vs theo batch
+
+Chạy với stub server cục bộ, không cần mạng:
+    python benchmarks/bench_fetch.py --latency 0.3 --workers 1 4 8
+    python benchmarks/bench_fetch.py --cities 200 --workers 8 --batch-sizes 1 10 50
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import data_fetcher
+from stub_server import start_stub_server, synthetic_cities
+
+
+def time_fetch(max_workers, batch_size, start_date, end_date, repeat):
+    """Đo thời gian tải (giây) tốt nhất sau `repeat` lần"""
+    best = float('inf')
+    for _ in range(repeat):
+        data_fetcher.fetch_weather_data.clear()
+        t0 = time.perf_counter()
+        df = data_fetcher.fetch_weather_data(
+            start_date, end_date, max_workers=max_workers, use_store=False, batch_size=batch_size
+        )
+        best = min(best, time.perf_counter() - t0)
+    return best, len(df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--latency', type=float, default=0.3, help='Độ trễ mỗi request (giây)')
+    parser.add_argument('--cities', type=int, default=None, help='Số địa điểm giả lập (mặc định: CITIES)')
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4, 8])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1])
+    parser.add_argument('--start-date', default='2025-01-01')
+    parser.add_argument('--end-date', default='2025-06-30')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    server, url = start_stub_server(latency=args.latency)
+    data_fetcher.API_URL = url
+    if args.cities:
+        data_fetcher.CITIES = synthetic_cities(args.cities)
+
+    print(f'{len(data_fetcher.CITIES)} thành phố, độ trễ {args.latency:.2f}s/request')
+    baseline = None
+    for batch_size in args.batch_sizes:
+        for workers in args.workers:
+            elapsed, rows = time_fetch(workers, batch_size, args.start_date, args.end_date, args.repeat)
+            baseline = baseline or elapsed
+            print(f'  batch_size={batch_size:<3} max_workers={workers:<3} '
+                  f'{elapsed:7.3f}s  {rows:,} dòng  x{baseline / elapsed:.1f}')
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Benchmark cache figure: thời gian rerun dashboard khi bộ lọc không đổi
+
+Công bố một phiên bản giả lập (tên các thành phố trong CITIES, để tab bản đồ
+có toạ độ) rồi chạy app.py bằng Streamlit AppTest với bộ lọc mặc định. Sau
+lần chạy đầu (nạp dữ liệu, lọc), đo thời gian mỗi lần rerun với cùng bộ lọc
+theo hai cách; cache bộ lọc (SelectionCache) luôn ấm nên chênh lệch chỉ là
+phần dựng biểu đồ:
+    no-cache  xoá cache figure trước mỗi lần rerun: mọi tab dựng lại figure
+    cache     figure lấy từ FigureCache (JSON) của lần chạy trước
+    python benchmarks/bench_figures.py --years 10 40
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def publish(data_dir, years):
+    """Công bố dữ liệu giả lập của các thành phố trong CITIES, kèm khối tổng hợp và thống kê luỹ tiến"""
+    os.environ['WEATHER_DATA_DIR'] = data_dir
+    import data_store
+    from aggregates import CUBE_FILE, AggregateCube
+    from bench_range_stats import make_dataset
+    from data_fetcher import CITIES
+    from data_index import FilterIndex
+    from running_stats import STATS_FILE, RunningStats
+
+    df = make_dataset(len(CITIES), years)
+    df['city'] = df['city'].cat.rename_categories(list(CITIES))
+    df['region'] = df['city'].map({city: coords['region'] for city, coords in CITIES.items()}).astype('category')
+    df = FilterIndex(df).df
+    data_store.publish_dataset(
+        df, meta={'cities': list(df['city'].cat.categories)},
+        attachments={CUBE_FILE: AggregateCube(df).save, STATS_FILE: RunningStats.from_frame(df).save}
+    )
+    return len(df)
+
+
+def best_rerun(app, before, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        before()
+        t0 = time.perf_counter()
+        app.run()
+        best = min(best, time.perf_counter() - t0)
+    assert not app.exception, app.exception
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--years', type=int, nargs='+', default=[10, 40])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    from streamlit.testing.v1 import AppTest
+
+    from figure_cache import get_figure_cache
+
+    os.chdir(ROOT)
+    for years in args.years:
+        with tempfile.TemporaryDirectory() as data_dir:
+            n_rows = publish(data_dir, years)
+            app = AppTest.from_file('app.py', default_timeout=600)
+            t0 = time.perf_counter()
+            app.run()
+            first = time.perf_counter() - t0
+            n_charts = len(app.get('plotly_chart'))
+            print(f'{years} năm, {n_rows:,} dòng, {n_charts} biểu đồ '
+                  f'(lần chạy đầu {first:.2f}s)')
+
+            cache = get_figure_cache()
+            t_cold = best_rerun(app, cache.clear, args.repeat)
+            t_warm = best_rerun(app, lambda: None, args.repeat)
+            stats = cache.stats()
+            print(f'  rerun no-cache {t_cold * 1000:6.0f}ms  cache {t_warm * 1000:6.0f}ms  '
+                  f'(x{t_cold / t_warm:.1f}, {stats["entries"]} figure, {stats["nbytes"] / 1024 ** 2:.1f} MB JSON)')
+            cache.clear()
+
+
+if __name__ == '__main__':
+    main()
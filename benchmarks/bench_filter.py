@@ -0,0 +1,108 @@
+"""
+Benchmark lọc dữ liệu: filter_data cũ (copy + mask) vs mask không copy vs FilterIndex
+
+    python benchmarks/bench_filter.py --rows 1000000 50000000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+import data_fetcher
+from data_index import FilterIndex
+
+
+def make_frame(n_rows, max_days=31_000):
+    """
+    Sinh DataFrame lược đồ gọn đã sắp xếp theo (thành phố, ngày)
+
+    Mỗi thành phố tối đa `max_days` ngày từ 1940 (~85 năm), số thành phố tăng theo số dòng.
+    """
+    rng = np.random.default_rng(0)
+    n_cities = max(63, -(-n_rows // max_days))
+    days_per_city = -(-n_rows // n_cities)
+    city_idx = np.repeat(np.arange(n_cities, dtype=np.int16), days_per_city)[:n_rows]
+    dates = np.datetime64('1940-01-01', 'ns') + np.tile(
+        np.arange(days_per_city).astype('timedelta64[D]'), n_cities
+    )[:n_rows]
+    months = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    cities = [f'Trạm {i:03d}' for i in range(n_cities)]
+
+    return pd.DataFrame({
+        'city': pd.Categorical.from_codes(city_idx, categories=cities),
+        'date': dates,
+        'temp_mean': rng.normal(26, 4, n_rows).astype(np.float32),
+        'rainfall': rng.gamma(0.6, 8, n_rows).astype(np.float32),
+        'season': pd.Categorical.from_codes(
+            data_fetcher.SEASON_CODE_BY_MONTH[months], categories=data_fetcher.SEASONS
+        ),
+    })
+
+
+def filter_data_legacy(df, cities=None, date_range=None, season=None):
+    """filter_data trước khi có chỉ mục: copy toàn bộ rồi áp từng mask"""
+    df_filtered = df.copy()
+    if cities:
+        df_filtered = df_filtered[df_filtered['city'].isin(cities)]
+    if date_range:
+        start, end = date_range
+        df_filtered = df_filtered[
+            (df_filtered['date'] >= pd.Timestamp(start)) &
+            (df_filtered['date'] <= pd.Timestamp(end))
+        ]
+    if season and season != 'Tất cả':
+        df_filtered = df_filtered[df_filtered['season'] == season]
+    return df_filtered
+
+
+def best_time(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 50_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    for n_rows in args.rows:
+        df = make_frame(n_rows)
+        cities = list(df['city'].cat.categories)
+        first, last = df['date'].min(), df['date'].max()
+        span = last - first
+        cases = {
+            'mặc định (8 thành phố, toàn bộ)': (cities[:8], (first, last), 'Tất cả'),
+            '3 thành phố, 1 năm': (cities[10:13], (last - pd.Timedelta(days=364), last), 'Tất cả'),
+            'tất cả, nửa khoảng, mùa Hè': (None, (first + span / 4, first + span * 3 / 4), 'Hè'),
+        }
+
+        index, t_build = best_time(lambda: FilterIndex(df), 1)
+        print(f'{n_rows:,} dòng, {len(cities)} thành phố (tạo chỉ mục {t_build:.3f}s)')
+
+        for name, (sel_cities, date_range, season) in cases.items():
+            expected, t_old = best_time(lambda: filter_data_legacy(df, sel_cities, date_range, season), args.repeat)
+            masked, t_mask = best_time(lambda: data_fetcher.filter_data(df, sel_cities, date_range, season), args.repeat)
+            result, t_index = best_time(
+                lambda: data_fetcher.filter_data(df, sel_cities, date_range, season, index=index), args.repeat
+            )
+            pd.testing.assert_frame_equal(expected, masked)
+            pd.testing.assert_frame_equal(expected, result)
+            print(f'  {name:<32} {len(result):>12,} dòng  copy+mask {t_old * 1000:9.1f}ms  '
+                  f'mask {t_mask * 1000:9.1f}ms  chỉ mục {t_index * 1000:8.2f}ms  x{t_old / t_index:.0f}')
+
+        del df, index
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark chế độ dữ liệu theo giờ: parse, gộp thành ngày và dữ liệu gửi xuống biểu đồ
+
+Đo trên payload giả lập (n thành phố x n năm, 24 giờ mỗi ngày):
+- parse JSON hourly -> DataFrame theo cột (float32) và bộ nhớ mỗi dòng
+- hourly_to_daily so với số dòng ngày tương ứng
+- số điểm và kích thước JSON của biểu đồ đường: toàn bộ điểm vs giảm điểm min-max
+    python benchmarks/bench_hourly.py --cities 10 --years 1 5
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import plotly.express as px
+
+import data_fetcher
+from downsample import CHART_WIDTH_PX, minmax_downsample
+from stub_server import build_hourly_payload, synthetic_cities
+
+
+def make_payload(n_cities, years, start_date='2015-01-01'):
+    """Sinh dict thành phố -> JSON hourly và dict thông tin thành phố"""
+    end_date = f'{int(start_date[:4]) + years - 1}-12-31'
+    variables = list(data_fetcher.HOURLY_COLUMNS)
+    cities = synthetic_cities(n_cities)
+    responses = {
+        name: build_hourly_payload(coords['lat'], coords['lon'], start_date, end_date, variables)
+        for name, coords in cities.items()
+    }
+    return cities, responses
+
+
+def figure_size(df, y_col):
+    """Kích thước JSON (MB) của biểu đồ đường một giá trị theo thành phố"""
+    fig = px.line(df, x='date', y=y_col, color='city')
+    return len(fig.to_json()) / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cities', type=int, default=10)
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 5])
+    args = parser.parse_args()
+
+    for years in args.years:
+        cities, responses = make_payload(args.cities, years)
+
+        t0 = time.perf_counter()
+        hourly = data_fetcher.build_hourly_frame(responses, cities)
+        t_parse = time.perf_counter() - t0
+        bytes_per_row = hourly.memory_usage(deep=True).sum() / len(hourly)
+
+        t0 = time.perf_counter()
+        daily = data_fetcher.hourly_to_daily(hourly)
+        t_rollup = time.perf_counter() - t0
+        assert len(daily) * 24 == len(hourly)
+
+        t0 = time.perf_counter()
+        series = minmax_downsample(hourly, 'date', 'temp', 'city', CHART_WIDTH_PX)
+        t_downsample = time.perf_counter() - t0
+        assert (series.groupby('city', observed=True)['temp'].max() == hourly.groupby('city', observed=True)['temp'].max()).all()
+
+        print(f'{years} năm x {args.cities} thành phố: {len(hourly):,} giờ '
+              f'({bytes_per_row:.0f} bytes/dòng), parse {t_parse:.2f}s, '
+              f'gộp thành {len(daily):,} ngày {t_rollup * 1000:.0f}ms')
+        print(f'  biểu đồ: {len(hourly):,} điểm {figure_size(hourly, "temp"):.1f} MB -> '
+              f'{len(series):,} điểm {figure_size(series, "temp"):.2f} MB '
+              f'(giảm điểm {t_downsample * 1000:.0f}ms)')
+
+
+if __name__ == '__main__':
+    main()
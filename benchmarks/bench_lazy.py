@@ -0,0 +1,114 @@
+"""
+Benchmark khởi động dashboard khi lịch sử dài dần: nạp toàn bộ vs đọc lười theo phân vùng
+
+Với mỗi độ dài lịch sử, công bố một phiên bản giả lập (n thành phố x n năm)
+rồi đo trong một tiến trình mới:
+    eager  read_published toàn bộ + FilterIndex + AggregateCube + PrefixIndex
+    lazy   PartitionedIndex + khối và thống kê lưu kèm phiên bản
+thời gian khởi động, RSS tăng thêm và thời gian lọc bộ lọc mặc định
+(8 thành phố, 2 năm gần nhất):
+    python benchmarks/bench_lazy.py --cities 63 --years 10 40 85
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def rss_mb():
+    """RSS hiện tại của tiến trình (MB), đọc từ /proc (Linux)"""
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 ** 2
+
+
+def publish(data_dir, n_cities, years):
+    """Công bố một phiên bản giả lập kèm khối tổng hợp và thống kê luỹ tiến"""
+    os.environ['WEATHER_DATA_DIR'] = data_dir
+    import data_store
+    from aggregates import CUBE_FILE, AggregateCube
+    from bench_range_stats import make_dataset
+    from data_index import FilterIndex
+    from running_stats import STATS_FILE, RunningStats
+
+    df = FilterIndex(make_dataset(n_cities, years)).df
+    return data_store.publish_dataset(
+        df, meta={'cities': list(df['city'].cat.categories)},
+        attachments={CUBE_FILE: AggregateCube(df).save, STATS_FILE: RunningStats.from_frame(df).save}
+    ), len(df)
+
+
+def child(mode, version):
+    """Đo trong tiến trình con (WEATHER_DATA_DIR đã đặt trong môi trường)"""
+    import pandas as pd
+
+    import data_store
+    from aggregates import AggregateCube, PrefixIndex, read_published_cube
+    from data_index import FilterIndex, PartitionedIndex
+    from running_stats import read_published_stats
+
+    base_rss = rss_mb()
+    t0 = time.perf_counter()
+    if mode == 'eager':
+        index = FilterIndex(data_store.read_published(version))
+        AggregateCube(index.df)
+        PrefixIndex(index)
+    else:
+        index = PartitionedIndex(version)
+        read_published_cube(version)
+        read_published_stats(version)
+    t_startup = time.perf_counter() - t0
+    startup_rss = rss_mb() - base_rss
+
+    date_range = (index.last_date - pd.DateOffset(years=2), index.last_date)
+    cities = [f'Trạm {i:03d}' for i in range(8)]
+    t0 = time.perf_counter()
+    selection = index.select(cities, date_range)
+    t_select = time.perf_counter() - t0
+
+    print(json.dumps({'startup': t_startup, 'rss': startup_rss, 'select': t_select, 'rows': len(selection)}))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cities', type=int, default=63)
+    parser.add_argument('--years', type=int, nargs='+', default=[10, 40, 85])
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'VERSION'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    for years in args.years:
+        with tempfile.TemporaryDirectory() as data_dir:
+            result = subprocess.run(
+                [sys.executable, '-c',
+                 f'import sys; sys.path[:0] = [{str(ROOT)!r}, {str(ROOT / "benchmarks")!r}]; '
+                 f'from bench_lazy import publish; print(*publish({data_dir!r}, {args.cities}, {years}))'],
+                capture_output=True, text=True, check=True
+            )
+            version, n_rows = result.stdout.split()[-2:]
+
+            line = f'{years:>3} năm, {int(n_rows):>11,} dòng'
+            for mode in ('eager', 'lazy'):
+                out = subprocess.run(
+                    [sys.executable, __file__, '--child', mode, version],
+                    capture_output=True, text=True, check=True,
+                    env={**os.environ, 'WEATHER_DATA_DIR': data_dir}
+                ).stdout
+                stats = json.loads(out.strip().splitlines()[-1])
+                line += (f'  {mode}: khởi động {stats["startup"]:6.2f}s, RSS +{stats["rss"]:5.0f} MB, '
+                         f'lọc mặc định {stats["select"] * 1000:5.0f}ms')
+            print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""
+Báo cáo bộ nhớ (bytes/dòng) của DataFrame thời tiết: lược đồ mặc định vs lược đồ gọn
+
+    python benchmarks/bench_memory.py --cities 100 --years 30
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import data_fetcher
+from bench_parse import make_payload
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cities', type=int, default=100)
+    parser.add_argument('--years', type=int, default=30)
+    args = parser.parse_args()
+
+    cities, responses = make_payload(args.cities, args.years)
+    data_fetcher.CITIES = cities
+
+    df = data_fetcher.add_features(data_fetcher.build_weather_frame(responses))
+    compact = data_fetcher.compact_frame(df)
+
+    before = data_fetcher.memory_report(df)
+    after = data_fetcher.memory_report(compact)
+
+    print(f'{args.cities} thành phố x {args.years} năm = {before["rows"]:,} dòng')
+    print(f'{"cột":<16}{"mặc định":>14}{"gọn":>14}')
+    for col, size in before['columns'].items():
+        compact_size = after['columns'].get(col)
+        compact_text = f'{compact_size / before["rows"]:.1f}' if compact_size is not None else '(bảng city)'
+        print(f'{col:<16}{size / before["rows"]:>14.1f}{compact_text:>14}')
+    print(f'{"bytes/dòng":<16}{before["bytes_per_row"]:>14.1f}{after["bytes_per_row"]:>14.1f}')
+    print(f'{"tổng (MB)":<16}{before["total_bytes"] / 1024 ** 2:>14.1f}{after["total_bytes"] / 1024 ** 2:>14.1f}')
+
+
+if __name__ == '__main__':
+    main()
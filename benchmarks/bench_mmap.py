@@ -0,0 +1,115 @@
+"""
+Benchmark bộ nhớ khi nhiều worker Streamlit cùng phục vụ một phiên bản
+
+Mỗi worker là một tiến trình riêng nạp cùng phiên bản đã công bố rồi quét
+toàn bộ dữ liệu (get_statistics), theo hai cách:
+    copy  read_published: mỗi worker giữ một bản DataFrame riêng
+    mmap  map_published: ánh xạ bộ nhớ dataset.arrow, dùng chung page cache
+Các worker chạy đồng thời; in bộ nhớ riêng (RssAnon) và PSS tăng thêm của
+từng worker, cùng tổng PSS (bộ nhớ vật lý thực dùng):
+    python benchmarks/bench_mmap.py --cities 63 --years 40 --workers 1 4
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+
+def publish(data_dir, n_cities, years):
+    """Công bố một phiên bản giả lập kèm file Arrow (đã sắp xếp theo thành phố, ngày)"""
+    os.environ['WEATHER_DATA_DIR'] = data_dir
+    import data_store
+    from bench_range_stats import make_dataset
+    from data_index import FilterIndex
+
+    df = FilterIndex(make_dataset(n_cities, years)).df
+    version = data_store.publish_dataset(
+        df, meta={'cities': list(df['city'].cat.categories)},
+        attachments={data_store.ARROW_FILE: lambda path: data_store.write_arrow(df, path)}
+    )
+    return version, len(df)
+
+
+def child(mode, version):
+    """Một worker: nạp, quét toàn bộ, báo bộ nhớ rồi chờ đến khi tiến trình cha đóng stdin"""
+    import data_store
+    from data_fetcher import get_statistics, process_memory
+    from data_index import FilterIndex
+
+    before = process_memory()
+    t0 = time.perf_counter()
+    df = data_store.map_published(version) if mode == 'mmap' else data_store.read_published(version)
+    index = FilterIndex(df)
+    get_statistics(index.df)
+    elapsed = time.perf_counter() - t0
+    after = process_memory()
+
+    print(json.dumps({
+        'load': elapsed,
+        'private': after['private'] - before['private'],
+        'shared': after['shared'] - before['shared'],
+    }), flush=True)
+    sys.stdin.read()
+    # PSS đo lại sau khi mọi worker đã nạp xong (trang dùng chung chia đều)
+    print(json.dumps({'pss': process_memory()['pss'] - before['pss']}), flush=True)
+
+
+def run_workers(mode, version, n_workers, data_dir):
+    env = {**os.environ, 'WEATHER_DATA_DIR': data_dir}
+    workers = [
+        subprocess.Popen([sys.executable, __file__, '--child', mode, version],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=env)
+        for _ in range(n_workers)
+    ]
+    loaded = [json.loads(worker.stdout.readline()) for worker in workers]
+    # Mọi worker đã nạp xong và còn sống: đo PSS
+    for worker in workers:
+        worker.stdin.close()
+    pss = [json.loads(worker.stdout.readline())['pss'] for worker in workers]
+    for worker in workers:
+        worker.wait()
+    return loaded, pss
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cities', type=int, default=63)
+    parser.add_argument('--years', type=int, default=40)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 4])
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'VERSION'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(*args.child)
+        return
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        result = subprocess.run(
+            [sys.executable, '-c',
+             f'import sys; sys.path[:0] = [{str(ROOT)!r}, {str(ROOT / "benchmarks")!r}]; '
+             f'from bench_mmap import publish; print(*publish({data_dir!r}, {args.cities}, {args.years}))'],
+            capture_output=True, text=True, check=True
+        )
+        version, n_rows = result.stdout.split()[-2:]
+        print(f'{args.years} năm x {args.cities} thành phố, {int(n_rows):,} dòng')
+
+        for n_workers in args.workers:
+            for mode in ('copy', 'mmap'):
+                loaded, pss = run_workers(mode, version, n_workers, data_dir)
+                load = max(item['load'] for item in loaded)
+                private = sum(item['private'] for item in loaded) / n_workers
+                shared = sum(item['shared'] for item in loaded) / n_workers
+                print(f'  {n_workers} worker, {mode}: nạp {load:5.2f}s, mỗi worker +{private:5.0f} MB riêng '
+                      f'+{shared:5.0f} MB dùng chung, tổng PSS +{sum(pss):6.0f} MB')
+
+
+if __name__ == '__main__':
+    main()
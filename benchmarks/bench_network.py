@@ -0,0 +1,43 @@
+"""
+Benchmark Network Graph (create_network_graph) khi số thành phố tăng
+
+Với mỗi số thành phố, dựng đồ thị thành phố - mùa từ khối tổng hợp một năm
+dữ liệu giả lập hai lần: lần đầu tính spring layout, lần sau lấy layout đã
+cache theo cấu trúc đồ thị (network_layout); in kích thước JSON của figure:
+    python benchmarks/bench_network.py --cities 8 63 300 1000
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from aggregates import build_cells
+from bench_range_stats import make_dataset
+from visualizations import create_network_graph, network_layout
+
+
+def timed(func):
+    t0 = time.perf_counter()
+    result = func()
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cities', type=int, nargs='+', default=[8, 63, 300, 1000])
+    args = parser.parse_args()
+
+    for n_cities in args.cities:
+        cube = build_cells(make_dataset(n_cities, 1))
+        network_layout.clear()
+        _, cold = timed(lambda: create_network_graph(cube))
+        fig, warm = timed(lambda: create_network_graph(cube))
+        print(f'  {n_cities:>5} thành phố: lần đầu {cold * 1000:6.0f}ms  layout đã cache {warm * 1000:5.0f}ms  '
+              f'JSON {len(fig.to_json()) / 1e3:5.0f} kB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark phần tính toán của một lần làm mới trên process pool
+
+Trên dữ liệu thô giả lập lớn, đo thời gian (wall-clock) các bước làm mới
+không phụ thuộc mạng: tính đặc trưng (add_features), thống kê luỹ tiến và
+khối tổng hợp, với số tiến trình khác nhau; kết quả được so với chạy tuần tự:
+    python benchmarks/bench_parallel.py --rows 20000000 --cities 63 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+import data_fetcher
+from bench_features import make_frame
+from data_index import FilterIndex
+from parallel import apply_rows, build_cells_parallel, running_stats_parallel
+
+
+def refresh_compute(raw, workers):
+    """Các bước tính toán của refresh_once sau khi có dữ liệu thô"""
+    timings = {}
+    t0 = time.perf_counter()
+    df = apply_rows(data_fetcher.add_features, raw.copy(), workers)
+    df = df.astype({'city': 'category', 'region': 'category'})
+    timings['đặc trưng'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    stats = running_stats_parallel(df, workers)
+    timings['thống kê'] = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    cells = build_cells_parallel(FilterIndex(df).df, workers)
+    timings['khối'] = time.perf_counter() - t0
+    return (df, stats, cells), timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=20_000_000)
+    parser.add_argument('--cities', type=int, default=63)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    raw = make_frame(args.rows, args.cities)
+    cities = raw['city'].unique()
+    raw['region'] = np.array(['Bắc', 'Trung', 'Nam'])[np.arange(len(cities)) % 3][pd.factorize(raw['city'])[0]]
+    print(f'{len(raw):,} dòng, {args.cities} thành phố, {os.cpu_count()} CPU')
+
+    expected, baseline = None, None
+    for workers in args.workers:
+        result, timings = refresh_compute(raw, workers)
+        total = sum(timings.values())
+        if expected is None:
+            expected, baseline = result, total
+        else:
+            pd.testing.assert_frame_equal(expected[0], result[0])
+            pd.testing.assert_frame_equal(expected[2], result[2])
+            for name in ('n', 'mean', 'm2', 'min', 'max', 'comoment'):
+                assert np.allclose(getattr(expected[1], name), getattr(result[1], name), equal_nan=True), name
+        stages = '  '.join(f'{name} {seconds:6.2f}s' for name, seconds in timings.items())
+        print(f'  {workers:>2} tiến trình: {stages}  tổng {total:6.2f}s  (x{baseline / total:.1f})')
+
+
+if __name__ == '__main__':
+    main()
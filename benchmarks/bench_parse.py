@@ -0,0 +1,87 @@
+"""
+Benchmark parse JSON -> DataFrame: từng dòng dict (cũ) vs theo cột NumPy (mới)
+
+Đo thời gian và bộ nhớ đỉnh (tracemalloc) trên payload giả lập:
+    python benchmarks/bench_parse.py --cities 100 --years 30
+"""
+
+import argparse
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd
+
+import data_fetcher
+from stub_server import build_daily_payload, synthetic_cities
+
+
+def make_payload(n_cities, years, start_date='1995-01-01'):
+    """Sinh dict thành phố -> JSON và dict thông tin thành phố"""
+    end_date = f'{int(start_date[:4]) + years - 1}-12-31'
+    variables = list(data_fetcher.DAILY_COLUMNS)
+    cities = synthetic_cities(n_cities)
+    responses = {
+        name: build_daily_payload(coords['lat'], coords['lon'], start_date, end_date, variables)
+        for name, coords in cities.items()
+    }
+    return cities, responses
+
+
+def parse_rows_legacy(responses, cities):
+    """Cách parse cũ: một dict cho mỗi thành phố mỗi ngày"""
+    all_data = []
+    for city, coords in cities.items():
+        data = responses[city]
+        dates = pd.to_datetime(data['daily']['time'])
+        for i, date in enumerate(dates):
+            all_data.append({
+                'city': city,
+                'date': date,
+                'temp_max': data['daily']['temperature_2m_max'][i],
+                'temp_min': data['daily']['temperature_2m_min'][i],
+                'temp_mean': data['daily']['temperature_2m_mean'][i],
+                'rainfall': data['daily']['precipitation_sum'][i],
+                'humidity': data['daily']['relative_humidity_2m_mean'][i],
+                'windspeed': data['daily']['windspeed_10m_max'][i],
+                'lat': coords['lat'],
+                'lon': coords['lon'],
+                'region': coords['region']
+            })
+    return pd.DataFrame(all_data)
+
+
+def measure(func, *args):
+    """Trả về (kết quả, thời gian giây, bộ nhớ đỉnh MB)"""
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / 1024 ** 2
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cities', type=int, default=100)
+    parser.add_argument('--years', type=int, default=30)
+    args = parser.parse_args()
+
+    cities, responses = make_payload(args.cities, args.years)
+
+    df_old, t_old, mem_old = measure(parse_rows_legacy, responses, cities)
+    df_new, t_new, mem_new = measure(data_fetcher.build_weather_frame, responses, cities)
+    pd.testing.assert_frame_equal(df_old, df_new, check_dtype=False)
+
+    print(f'{args.cities} thành phố x {args.years} năm = {len(df_new):,} dòng')
+    print(f'  dict từng dòng : {t_old:7.2f}s  đỉnh {mem_old:8.1f} MB')
+    print(f'  cột NumPy      : {t_new:7.2f}s  đỉnh {mem_new:8.1f} MB')
+    print(f'  nhanh hơn x{t_old / t_new:.1f}, bộ nhớ đỉnh giảm x{mem_old / mem_new:.1f}')
+
+
+if __name__ == '__main__':
+    main()
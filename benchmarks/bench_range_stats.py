@@ -0,0 +1,76 @@
+"""
+Benchmark KPI theo khoảng ngày: quét dữ liệu ngày vs khối tổng hợp vs tổng tiền tố
+
+Thời gian get_statistics cho khoảng ngày "kéo thanh trượt" (bỏ 1 tháng lẻ
+ở mỗi đầu) khi lịch sử dài dần, số thành phố cố định:
+    python benchmarks/bench_range_stats.py --cities 63 --years 10 40 85
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+import data_fetcher
+from aggregates import AggregateCube, PrefixIndex, rollup
+from bench_features import make_frame
+from data_index import FilterIndex
+
+
+def make_dataset(n_cities, years):
+    """Dữ liệu ngày đã có đặc trưng: n_cities thành phố x `years` năm"""
+    raw = make_frame(n_cities * int(years * 365.25), n_cities)
+    raw['region'] = np.array(['Bắc', 'Trung', 'Nam'])[raw['city'].str[-3:].astype(int) % 3]
+    raw['lat'] = 0.0
+    raw['lon'] = 0.0
+    df = data_fetcher.add_features(raw)
+    return df.astype({'city': 'category', 'region': 'category'})
+
+
+def best_time(func, repeat=5):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cities', type=int, default=63)
+    parser.add_argument('--years', type=int, nargs='+', default=[10, 40, 85])
+    args = parser.parse_args()
+
+    for years in args.years:
+        df = make_dataset(args.cities, years)
+        index = FilterIndex(df)
+        cube = AggregateCube(index.df)
+        prefix = PrefixIndex(index)
+
+        date_range = (df['date'].min() + pd.Timedelta(days=17), df['date'].max() - pd.Timedelta(days=12))
+
+        expected, t_raw = best_time(lambda: data_fetcher.get_statistics(index.select(None, date_range)))
+        from_cube, t_cube = best_time(
+            lambda: data_fetcher.get_statistics(rollup(cube.select(index, None, date_range), ['city', 'region']))
+        )
+        from_prefix, t_prefix = best_time(lambda: data_fetcher.get_statistics(prefix.select(None, date_range)))
+
+        for key, value in expected.items():
+            if isinstance(value, str):
+                assert value == from_cube[key] == from_prefix[key], key
+            else:
+                assert np.isclose(value, from_cube[key]) and np.isclose(value, from_prefix[key]), key
+
+        print(f'{years:>3} năm, {len(df):>11,} dòng  quét {t_raw * 1000:8.1f}ms  '
+              f'khối {t_cube * 1000:7.1f}ms  tổng tiền tố {t_prefix * 1000:6.1f}ms  '
+              f'(chỉ mục {prefix.nbytes / 1024 ** 2:.0f} MB)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+"""
+Benchmark scatter kèm đường hồi quy (tab Nhiệt độ): trendline='ols' vs regression.py
+
+Dựng scatter nhiệt độ - độ ẩm theo thành phố trên dữ liệu giả lập với số
+năm tăng dần, theo hai cách, kiểm tra hệ số góc trùng nhau và in kích thước
+JSON, số điểm vẽ và thời gian dựng:
+    ols     px.scatter(trendline='ols'): mỗi thành phố một mô hình statsmodels, vẽ mọi điểm
+    gộp     create_scatter_with_regression: hồi quy mọi nhóm một lượt, vẽ tối đa MAX_SCATTER_POINTS điểm
+    python benchmarks/bench_regression.py --cities 10 --years 1 10 40
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import plotly.express as px
+
+from bench_range_stats import make_dataset
+from visualizations import create_scatter_with_regression
+
+
+def timed(func):
+    t0 = time.perf_counter()
+    fig = func()
+    spec = fig.to_json()
+    return fig, len(spec), time.perf_counter() - t0
+
+
+def n_points(fig):
+    return sum(len(trace.x) for trace in fig.data if trace.mode == 'markers')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cities', type=int, default=10)
+    parser.add_argument('--years', type=int, nargs='+', default=[1, 10, 40])
+    args = parser.parse_args()
+
+    for years in args.years:
+        df = make_dataset(args.cities, years)
+        ols, ols_size, ols_time = timed(lambda: px.scatter(
+            df, x='temp_mean', y='humidity', color='city', size='rainfall', trendline='ols'
+        ))
+        fig, size, seconds = timed(lambda: create_scatter_with_regression(df, 'temp_mean', 'humidity', 'city', 'rainfall'))
+
+        slopes = {trace.name: (trace.y[-1] - trace.y[0]) / (trace.x[-1] - trace.x[0])
+                  for trace in fig.data if trace.mode == 'lines'}
+        for _, row in px.get_trendline_results(ols).iterrows():
+            assert np.isclose(slopes[row['city']], row['px_fit_results'].params[1]), row['city']
+
+        print(f'{years} năm x {args.cities} thành phố, {len(df):,} dòng')
+        print(f'  ols  {n_points(ols):>9,} điểm  JSON {ols_size / 1e6:6.2f} MB  dựng {ols_time * 1000:5.0f}ms')
+        print(f'  gộp  {n_points(fig):>9,} điểm  JSON {size / 1e6:6.2f} MB  dựng {seconds * 1000:5.0f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark thống kê luỹ tiến: tính lại toàn bộ vs gộp ngày mới vào trạng thái cũ
+
+Mô phỏng một lần làm mới hằng ngày (thêm 1 ngày cho mỗi thành phố) khi lịch
+sử dài dần, số thành phố cố định:
+    python benchmarks/bench_running_stats.py --cities 63 --years 10 40 85
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from bench_range_stats import best_time, make_dataset
+from running_stats import RunningStats, update_stats
+
+
+def check_backfill(df, trailing_days=3):
+    """
+    Làm mới đè lên các ngày cuối trước đó còn trống phải cho kết quả như tính lại toàn bộ
+    """
+    last = df['date'].max()
+    base = df[df['date'] < last].copy()
+    tail = base['date'] > last - pd.Timedelta(days=trailing_days + 1)
+    measures = RunningStats.from_frame(base).measures
+    # Thành phố đầu tiên không có ngày trống nên không được tải lại
+    base.loc[tail & (base['city'] != base['city'].iloc[0]), measures] = np.nan
+    base_stats = RunningStats.from_frame(base)
+    # Các thành phố còn lại được tải lại từ ngày trống đầu tiên (như load_weather_data báo)
+    refetched_from = {city: last - pd.Timedelta(days=trailing_days) for city in base_stats.cities[1:]}
+
+    full = RunningStats.from_frame(df)
+    for since in (refetched_from, None):
+        merged = update_stats(base_stats, df, base, since)
+        assert merged.cities == full.cities
+        for name in ('rows', 'n', 'mean', 'm2', 'min', 'max', 'cov_n', 'comoment'):
+            assert np.allclose(getattr(full, name), getattr(merged, name), equal_nan=True), name
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cities', type=int, default=63)
+    parser.add_argument('--years', type=int, nargs='+', default=[10, 40, 85])
+    args = parser.parse_args()
+
+    for years in args.years:
+        df = make_dataset(args.cities, years)
+        last = df['date'].max()
+        base = df[df['date'] < last]
+        base_stats = RunningStats.from_frame(base)
+        refetched_from = dict.fromkeys(base_stats.cities, last)
+
+        full, t_full = best_time(lambda: RunningStats.from_frame(df), repeat=3)
+        merged, t_merge = best_time(lambda: update_stats(base_stats, df, base, refetched_from))
+
+        for name in ('n', 'mean', 'm2', 'min', 'max', 'comoment'):
+            assert np.allclose(getattr(full, name), getattr(merged, name), equal_nan=True), name
+        pd.testing.assert_frame_equal(full.correlation(), merged.correlation())
+        check_backfill(df)
+
+        print(f'{years:>3} năm, {len(df):>11,} dòng  tính lại {t_full * 1000:8.1f}ms  '
+              f'gộp ngày mới {t_merge * 1000:6.1f}ms  x{t_full / t_merge:.0f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+"""
+Benchmark backend pandas vs DuckDB (SQL) trên một phiên bản đã công bố
+
+Với mỗi bộ lọc, đo lọc (filter_data), get_statistics và các phép gộp của
+tab (group_agg) theo ba cách, đồng thời kiểm tra kết quả trùng nhau:
+    pandas     dữ liệu đã nạp sẵn trong bộ nhớ, lọc bằng mask rồi gộp
+    phân vùng  PartitionedIndex đọc phân vùng rồi gộp bằng pandas
+    duckdb     SQLBackend chạy SQL thẳng trên file Parquet
+    python benchmarks/bench_sql.py --cities 63 --years 10 40
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+import pandas as pd
+
+from bench_lazy import publish
+
+# Các phép gộp các tab dùng (xem tab_*.py)
+TAB_AGGREGATIONS = [
+    (['city'], {'temp_mean': ('temp_mean', 'mean'), 'rainfall': ('rainfall', 'sum')}),
+    (['city'], {'temp_range': ('temp_range', 'mean')}),
+    (['season', 'city'], {'humidity': ('humidity', 'mean')}),
+    (['season'], {'rainfall': ('rainfall', 'sum')}),
+    (['month'], {'temp_mean': ('temp_mean', 'mean'), 'temp_std': ('temp_mean', 'std')}),
+    (['region', 'season'], {'temp_max': ('temp_max', 'max'), 'temp_min': ('temp_min', 'min'), 'days': ('rainfall', 'count')}),
+]
+
+
+def best_time(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+def run_pandas(select, filters):
+    """Lọc rồi gộp bằng pandas trên DataFrame đã lọc"""
+    from aggregates import group_agg
+    from data_fetcher import get_statistics
+
+    df = select(*filters)
+    return df, get_statistics(df), [group_agg(df, by, spec) for by, spec in TAB_AGGREGATIONS]
+
+
+def run_sql(backend, filters):
+    """Cùng các kết quả bằng SQL; các phép gộp của tab chung một lần quét"""
+    return (
+        backend.select(*filters),
+        backend.get_statistics(*filters),
+        backend.group_aggs(TAB_AGGREGATIONS, *filters),
+    )
+
+
+def check_equal(expected, actual):
+    df, stats, aggs = expected
+    sql_df, sql_stats, sql_aggs = actual
+    pd.testing.assert_frame_equal(df.reset_index(drop=True), sql_df, check_dtype=False, check_categorical=False)
+    for key, value in stats.items():
+        assert value == sql_stats[key] if isinstance(value, str) else np.isclose(value, sql_stats[key]), key
+    for agg, sql_agg in zip(aggs, sql_aggs):
+        pd.testing.assert_frame_equal(agg, sql_agg, check_dtype=False, check_categorical=False, check_index_type=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cities', type=int, default=63)
+    parser.add_argument('--years', type=int, nargs='+', default=[10, 40])
+    args = parser.parse_args()
+
+    for years in args.years:
+        with tempfile.TemporaryDirectory() as data_dir:
+            version, n_rows = publish(data_dir, args.cities, years)
+
+            import data_store
+            from data_fetcher import filter_data
+            from data_index import PartitionedIndex
+            from sql_backend import SQLBackend
+
+            t0 = time.perf_counter()
+            df = data_store.read_published(version)
+            t_load = time.perf_counter() - t0
+            index = PartitionedIndex(version)
+            backend = SQLBackend(version)
+            print(f'{years} năm, {n_rows:,} dòng (nạp toàn bộ vào pandas: {t_load:.2f}s)')
+
+            last = index.last_date
+            cases = {
+                'tất cả': (None, None, None),
+                '8 TP, 2 năm': ([f'Trạm {i:03d}' for i in range(8)], (last - pd.DateOffset(years=2), last), None),
+                'tất cả TP, 5 năm, mùa Hè': (None, (last - pd.DateOffset(years=5), last), 'Hè'),
+            }
+            for name, filters in cases.items():
+                expected, t_pandas = best_time(lambda: run_pandas(lambda *f: filter_data(df, *f), filters))
+                lazy, t_lazy = best_time(lambda: run_pandas(index.select, filters))
+                actual, t_sql = best_time(lambda: run_sql(backend, filters))
+                check_equal(expected, actual)
+                check_equal(lazy, actual)
+
+                stats_only = (lambda: backend.get_statistics(*filters))
+                _, t_sql_stats = best_time(stats_only)
+                print(f'  {name:<26} {len(expected[0]):>11,} dòng  pandas {t_pandas * 1000:7.0f}ms  '
+                      f'phân vùng {t_lazy * 1000:7.0f}ms  duckdb {t_sql * 1000:7.0f}ms '
+                      f'(chỉ KPI {t_sql_stats * 1000:5.0f}ms)')
+
+
+if __name__ == '__main__':
+    main()
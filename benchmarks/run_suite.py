@@ -0,0 +1,238 @@
+"""
+Bộ benchmark đường tải dữ liệu, chạy hoàn toàn cục bộ với stub server (không cần mạng)
+
+Đo từng giai đoạn trên lưới (số thành phố x số ngày):
+    cold_load   tải từ API giả lập vào store trống
+    warm_load   tải lại khi store đã đầy đủ (không gọi API)
+    parse       JSON -> DataFrame (build_weather_frame)
+    features    add_features
+    filter      filter_data
+    statistics  get_statistics
+
+Kết quả ghi ra file JSON trong benchmarks/results/ để so sánh giữa các commit:
+    python benchmarks/run_suite.py --cities 8 63 --days 365 3650
+    python benchmarks/run_suite.py --compare benchmarks/results/<baseline>.json
+"""
+
+import argparse
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+import pandas as pd
+import pyarrow
+
+import data_fetcher
+import data_store
+from stub_server import build_daily_payload, start_stub_server, synthetic_cities
+
+# CONSTANTS
+RESULTS_DIR = Path(__file__).resolve().parent / 'results'
+RAW_COLUMNS = ['city', 'date', 'temp_max', 'temp_min', 'temp_mean',
+               'rainfall', 'humidity', 'windspeed', 'lat', 'lon', 'region']
+
+
+# HELPER FUNCTIONS
+def git_revision():
+    """Commit hiện tại và trạng thái working tree (None nếu không phải git repo)"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=ROOT,
+                               capture_output=True, text=True, check=True).stdout.strip() != ''
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def best_of(func, repeat):
+    """Chạy func `repeat` lần, trả về (kết quả lần cuối, thời gian tốt nhất)"""
+    best = float('inf')
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - t0)
+    return result, best
+
+
+# SCENARIO
+def run_scenario(server, n_cities, n_days, start_date, repeat, batch_size, max_workers):
+    """
+    Đo các giai đoạn cho một kịch bản (n_cities thành phố x n_days ngày)
+
+    Returns:
+        List dict kết quả, mỗi giai đoạn một dict
+    """
+    end_date = (date.fromisoformat(start_date) + timedelta(days=n_days - 1)).isoformat()
+    cities = synthetic_cities(n_cities)
+    data_fetcher.CITIES = cities
+    load_kwargs = dict(start_date=start_date, end_date=end_date,
+                       max_workers=max_workers, batch_size=batch_size)
+
+    results = []
+
+    def record(stage, seconds, rows, **extra):
+        results.append({
+            'scenario': f'cities={n_cities},days={n_days}',
+            'cities': n_cities,
+            'days': n_days,
+            'stage': stage,
+            'seconds': round(seconds, 6),
+            'rows': rows,
+            **extra,
+        })
+
+    # Cold load: mỗi lần đo dùng một store trống mới
+    best_cold, cold_requests, cold_bytes = float('inf'), 0, 0
+    for attempt in range(repeat):
+        store_dir = tempfile.mkdtemp(prefix='weather-bench-')
+        data_store.DATA_DIR = store_dir
+        requests_before, bytes_before = server.request_count, server.bytes_sent
+        t0 = time.perf_counter()
+        df = data_fetcher.load_weather_data(**load_kwargs)
+        elapsed = time.perf_counter() - t0
+        if elapsed < best_cold:
+            best_cold = elapsed
+            cold_requests = server.request_count - requests_before
+            cold_bytes = server.bytes_sent - bytes_before
+        if attempt < repeat - 1:
+            shutil.rmtree(store_dir, ignore_errors=True)
+    record('cold_load', best_cold, len(df), requests=cold_requests, bytes=cold_bytes)
+
+    # Warm load: store đã đầy đủ, chỉ đọc Parquet
+    requests_before = server.request_count
+    df, elapsed = best_of(lambda: data_fetcher.load_weather_data(**load_kwargs), repeat)
+    record('warm_load', elapsed, len(df), requests=server.request_count - requests_before)
+    shutil.rmtree(store_dir, ignore_errors=True)
+
+    # Parse: JSON đã sinh sẵn -> DataFrame
+    variables = list(data_fetcher.DAILY_COLUMNS)
+    responses = {
+        name: build_daily_payload(coords['lat'], coords['lon'], start_date, end_date, variables)
+        for name, coords in cities.items()
+    }
+    raw, elapsed = best_of(lambda: data_fetcher.build_weather_frame(responses, cities), repeat)
+    record('parse', elapsed, len(raw))
+
+    # Feature engineering trên dữ liệu thô
+    raw = raw[RAW_COLUMNS]
+    featured, elapsed = best_of(lambda: data_fetcher.add_features(raw), repeat)
+    record('features', elapsed, len(featured))
+
+    # Lọc: nửa số thành phố, nửa giữa khoảng ngày, một mùa
+    selected = list(cities)[:max(1, n_cities // 2)]
+    first_day = pd.Timestamp(start_date)
+    date_range = (first_day + pd.Timedelta(days=n_days // 4), first_day + pd.Timedelta(days=3 * n_days // 4))
+    filtered, elapsed = best_of(
+        lambda: data_fetcher.filter_data(df, selected, date_range, 'Hè'), repeat
+    )
+    record('filter', elapsed, len(filtered))
+
+    _, elapsed = best_of(lambda: data_fetcher.get_statistics(df), repeat)
+    record('statistics', elapsed, len(df))
+
+    return results
+
+
+# COMPARE
+def compare(results, baseline_path, threshold):
+    """
+    In bảng so sánh với file kết quả trước đó
+
+    Returns:
+        Số giai đoạn chậm hơn baseline quá `threshold` lần
+    """
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)
+
+    previous = {(r['scenario'], r['stage']): r['seconds'] for r in baseline['results']}
+    base_commit = baseline['meta'].get('git_commit')
+    print(f'\nSo với {baseline_path} (commit {base_commit}):')
+
+    regressions = 0
+    for r in results:
+        before = previous.get((r['scenario'], r['stage']))
+        if not before:
+            continue
+        ratio = r['seconds'] / before
+        flag = ''
+        if ratio > threshold:
+            regressions += 1
+            flag = '  <-- chậm hơn'
+        print(f'  {r["scenario"]:<22} {r["stage"]:<11} {before:9.4f}s -> {r["seconds"]:9.4f}s  x{ratio:.2f}{flag}')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bộ benchmark đường tải dữ liệu')
+    parser.add_argument('--cities', type=int, nargs='+', default=[8, 63])
+    parser.add_argument('--days', type=int, nargs='+', default=[365, 3650])
+    parser.add_argument('--start-date', default='2015-01-01')
+    parser.add_argument('--latency', type=float, default=0.05, help='Độ trễ mỗi request (giây)')
+    parser.add_argument('--padding', type=int, default=0, help='Số byte đệm mỗi địa điểm trong JSON')
+    parser.add_argument('--batch-size', type=int, default=data_fetcher.BATCH_SIZE)
+    parser.add_argument('--workers', type=int, default=data_fetcher.MAX_WORKERS)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', default=None, help='File JSON kết quả (mặc định benchmarks/results/)')
+    parser.add_argument('--compare', default=None, help='File JSON kết quả để so sánh')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Tỉ lệ chậm hơn baseline bị coi là regression')
+    args = parser.parse_args()
+
+    server, url = start_stub_server(latency=args.latency, padding=args.padding)
+    data_fetcher.API_URL = url
+    original_dir, original_cities = data_store.DATA_DIR, data_fetcher.CITIES
+
+    results = []
+    try:
+        for n_cities in args.cities:
+            for n_days in args.days:
+                print(f'{n_cities} thành phố x {n_days} ngày')
+                for r in run_scenario(server, n_cities, n_days, args.start_date,
+                                      args.repeat, args.batch_size, args.workers):
+                    extra = f'  {r["requests"]} request' if 'requests' in r else ''
+                    print(f'  {r["stage"]:<11} {r["seconds"]:9.4f}s  {r["rows"]:>12,} dòng{extra}')
+                    results.append(r)
+    finally:
+        server.shutdown()
+        data_store.DATA_DIR, data_fetcher.CITIES = original_dir, original_cities
+
+    commit, dirty = git_revision()
+    created_at = datetime.now(timezone.utc)
+    report = {
+        'meta': {
+            'created_at': created_at.isoformat(),
+            'git_commit': commit,
+            'git_dirty': dirty,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'packages': {'pandas': pd.__version__, 'numpy': np.__version__, 'pyarrow': pyarrow.__version__},
+            'args': vars(args),
+        },
+        'results': results,
+    }
+
+    output = Path(args.output) if args.output else (
+        RESULTS_DIR / f'{created_at.strftime("%Y%m%dT%H%M%S")}-{commit or "nogit"}.json'
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f'\nĐã ghi kết quả vào {output}')
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
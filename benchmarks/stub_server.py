@@ -0,0 +1,195 @@
+"""
+Server giả lập Open-Meteo Archive API để benchmark không cần mạng
+
+Chạy độc lập:
+    python benchmarks/stub_server.py --port 8765 --latency 0.3 --padding 0
+"""
+
+import argparse
+import json
+import threading
+import time
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+
+def _noise(ordinals, lat, lon, salt):
+    """Nhiễu giả ngẫu nhiên trong [0, 1), cố định theo (toạ độ, ngày)"""
+    x = np.sin(ordinals * 12.9898 + lat * 78.233 + lon * 37.719 + salt * 4.1414) * 43758.5453
+    return x - np.floor(x)
+
+
+def build_daily_payload(lat, lon, start_date, end_date, variables):
+    """
+    Sinh dữ liệu `daily` giống định dạng Open-Meteo cho một địa điểm
+
+    Giá trị chỉ phụ thuộc vào toạ độ và ngày, nên tải theo từng đoạn
+    hay tải cả khoảng đều cho cùng kết quả.
+    """
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    n_days = max((end - start).days + 1, 0)
+
+    ordinals = np.arange(start.toordinal(), start.toordinal() + n_days, dtype='float64')
+    seasonal = np.sin(2 * np.pi * (ordinals % 365.25) / 365.25)
+
+    daily = {'time': [(start + timedelta(days=i)).isoformat() for i in range(n_days)]}
+    for salt, var in enumerate(variables):
+        noise = _noise(ordinals, lat, lon, salt)
+        if var.startswith('temperature'):
+            values = 26 - (lat - 10) * 0.3 + 4 * seasonal + 6 * (noise - 0.5)
+        elif var.startswith('precipitation'):
+            values = np.where(noise > 0.55, (noise - 0.55) * 60, 0.0)
+        elif var.startswith('relative_humidity'):
+            values = 75 + 10 * seasonal + 20 * (noise - 0.5)
+        else:
+            values = 5 + 35 * noise
+        daily[var] = np.round(values, 1).tolist()
+
+    return {
+        'latitude': lat,
+        'longitude': lon,
+        'timezone': 'Asia/Bangkok',
+        'daily': daily,
+    }
+
+
+def build_hourly_payload(lat, lon, start_date, end_date, variables):
+    """Sinh dữ liệu `hourly` (24 giờ mỗi ngày, có chu kỳ ngày đêm) cho một địa điểm"""
+    start = date.fromisoformat(start_date)
+    end = date.fromisoformat(end_date)
+    n_hours = max((end - start).days + 1, 0) * 24
+
+    hours = np.arange(n_hours)
+    ordinals = start.toordinal() + hours / 24
+    seasonal = np.sin(2 * np.pi * (ordinals % 365.25) / 365.25)
+    diurnal = np.sin(2 * np.pi * ((hours % 24) - 9) / 24)
+
+    times = np.datetime64(start_date, 'h') + hours.astype('timedelta64[h]')
+    hourly = {'time': np.datetime_as_string(times, unit='m').tolist()}
+    for salt, var in enumerate(variables):
+        noise = _noise(ordinals, lat, lon, salt)
+        if var.startswith('temperature'):
+            values = 26 - (lat - 10) * 0.3 + 4 * seasonal + 4 * diurnal + 2 * (noise - 0.5)
+        elif var.startswith('precipitation'):
+            values = np.where(noise > 0.9, (noise - 0.9) * 30, 0.0)
+        elif var.startswith('relative_humidity'):
+            values = 75 + 10 * seasonal - 12 * diurnal + 10 * (noise - 0.5)
+        else:
+            values = 5 + 20 * noise
+        hourly[var] = np.round(values, 1).tolist()
+
+    return {
+        'latitude': lat,
+        'longitude': lon,
+        'timezone': 'Asia/Bangkok',
+        'hourly': hourly,
+    }
+
+
+class StubArchiveHandler(BaseHTTPRequestHandler):
+    """Xử lý request GET /v1/archive (tham số `daily` hoặc `hourly`)"""
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)
+        time.sleep(self.server.latency)
+
+        try:
+            lats = [float(v) for v in query['latitude'][0].split(',')]
+            lons = [float(v) for v in query['longitude'][0].split(',')]
+            if len(lats) != len(lons):
+                raise ValueError('latitude và longitude phải có cùng số phần tử')
+            if any(abs(lat) > 90 for lat in lats):
+                raise ValueError('Latitude must be in range of -90 to 90°')
+
+            resolution = 'hourly' if 'hourly' in query else 'daily'
+            build_payload = build_hourly_payload if resolution == 'hourly' else build_daily_payload
+            variables = query[resolution][0].split(',')
+            results = [
+                build_payload(lat, lon, query['start_date'][0], query['end_date'][0], variables)
+                for lat, lon in zip(lats, lons)
+            ]
+            # Phần đệm giả lập payload lớn hơn (ví dụ thêm biến theo giờ)
+            if self.server.padding:
+                for result in results:
+                    result['padding'] = 'x' * self.server.padding
+            # Giống Open-Meteo: nhiều địa điểm -> trả về list, một địa điểm -> object
+            payload = results if len(results) > 1 else results[0]
+            status = 200
+        except (KeyError, ValueError) as e:
+            payload = {'error': True, 'reason': str(e)}
+            status = 400
+
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+        with self.server.stats_lock:
+            self.server.request_count += 1
+            self.server.bytes_sent += len(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def synthetic_cities(n_cities):
+    """Sinh n địa điểm giả lập có toạ độ trong lãnh thổ Việt Nam"""
+    return {
+        f'Trạm {i:03d}': {
+            'lat': round(8.5 + (i * 0.137) % 14.5, 4),
+            'lon': round(102.5 + (i * 0.071) % 7.0, 4),
+            'region': ('Bắc', 'Trung', 'Nam')[i % 3],
+        }
+        for i in range(n_cities)
+    }
+
+
+def start_stub_server(latency=0.2, port=0, padding=0):
+    """
+    Khởi động stub server trong một daemon thread
+
+    Args:
+        latency: Độ trễ (giây) thêm vào mỗi request
+        port: Cổng lắng nghe (0 = tự chọn cổng trống)
+        padding: Số byte đệm thêm vào JSON của mỗi địa điểm
+
+    Returns:
+        Tuple (server, url) - url trỏ tới endpoint /v1/archive
+    """
+    server = ThreadingHTTPServer(('127.0.0.1', port), StubArchiveHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.padding = padding
+    server.request_count = 0
+    server.bytes_sent = 0
+    server.stats_lock = threading.Lock()
+
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    host, port = server.server_address
+    return server, f'http://{host}:{port}/v1/archive'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Stub Open-Meteo Archive API')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--padding', type=int, default=0, help='Số byte đệm mỗi địa điểm')
+    args = parser.parse_args()
+
+    server, url = start_stub_server(args.latency, args.port, args.padding)
+    print(f'Stub server đang chạy tại {url}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -2,22 +2,106 @@
 Module thu thập và xử lý dữ liệu thời tiết từ API
 """
 
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
 import requests
 import pandas as pd
 from datetime import datetime
 import streamlit as st
 
+from aggregates import group_agg
+from running_stats import update_stats
+from data_store import DAILY_STORE, HOURLY_STORE, read_store, append_to_store, stored_date_ranges
+from parallel import apply_rows
+from http_client import get_session, get_with_retry
+
+logger = logging.getLogger(__name__)
+
 # CONSTANTS
-CITIES = {
-    'Hà Nội': {'lat': 21.0285, 'lon': 105.8542, 'region': 'Bắc'},
-    'Hồ Chí Minh': {'lat': 10.8231, 'lon': 106.6297, 'region': 'Nam'},
-    'Đà Nẵng': {'lat': 16.0544, 'lon': 108.2022, 'region': 'Trung'},
-    'Hải Phòng': {'lat': 20.8449, 'lon': 106.6881, 'region': 'Bắc'},
-    'Cần Thơ': {'lat': 10.0452, 'lon': 105.7469, 'region': 'Nam'},
-    'Huế': {'lat': 16.4637, 'lon': 107.5909, 'region': 'Trung'},
-    'Nha Trang': {'lat': 12.2388, 'lon': 109.1967, 'region': 'Trung'},
-    'Vũng Tàu': {'lat': 10.3460, 'lon': 107.0843, 'region': 'Nam'}
+# Danh mục địa điểm (CSV: city, lat, lon, region), đổi bằng biến môi trường WEATHER_LOCATIONS_FILE
+LOCATIONS_FILE = os.environ.get(
+    'WEATHER_LOCATIONS_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'locations', 'major_cities.csv')
+)
+LOCATION_COLUMNS = ['city', 'lat', 'lon', 'region']
+
+# Số địa điểm được chọn sẵn trên sidebar (theo thứ tự trong file danh mục)
+DEFAULT_CITY_COUNT = 8
+
+
+def load_locations(path=LOCATIONS_FILE):
+    """
+    Đọc danh mục địa điểm từ file CSV
+    
+    Args:
+        path: Đường dẫn file CSV có các cột city, lat, lon, region
+    
+    Returns:
+        Dict tên địa điểm -> {'lat', 'lon', 'region'}, giữ thứ tự trong file
+    """
+    catalog = pd.read_csv(path, encoding='utf-8')
+    
+    missing = set(LOCATION_COLUMNS) - set(catalog.columns)
+    if missing:
+        raise ValueError(f"File danh mục {path} thiếu cột: {', '.join(sorted(missing))}")
+    
+    duplicated = catalog.loc[catalog['city'].duplicated(), 'city']
+    if not duplicated.empty:
+        raise ValueError(f"File danh mục {path} có địa điểm trùng tên: {', '.join(duplicated.unique())}")
+    
+    return {
+        row.city: {'lat': float(row.lat), 'lon': float(row.lon), 'region': row.region}
+        for row in catalog[LOCATION_COLUMNS].itertuples(index=False)
+    }
+
+
+CITIES = load_locations()
+
+# Open-Meteo API (Free, không cần API key)
+API_URL = os.environ.get('OPEN_METEO_ARCHIVE_URL', 'https://archive-api.open-meteo.com/v1/archive')
+# Biến daily của API -> tên cột trong DataFrame
+DAILY_COLUMNS = {
+    'temperature_2m_max': 'temp_max',
+    'temperature_2m_min': 'temp_min',
+    'temperature_2m_mean': 'temp_mean',
+    'precipitation_sum': 'rainfall',
+    'relative_humidity_2m_mean': 'humidity',
+    'windspeed_10m_max': 'windspeed',
+}
+DAILY_VARIABLES = ','.join(DAILY_COLUMNS)
+# Biến hourly của API -> tên cột (chế độ dữ liệu theo giờ)
+HOURLY_COLUMNS = {
+    'temperature_2m': 'temp',
+    'precipitation': 'rainfall',
+    'relative_humidity_2m': 'humidity',
+    'windspeed_10m': 'windspeed',
+}
+HOURLY_VARIABLES = ','.join(HOURLY_COLUMNS)
+# Độ phân giải -> (danh sách biến gửi API, store lưu trữ)
+RESOLUTIONS = {
+    'daily': (DAILY_VARIABLES, DAILY_STORE),
+    'hourly': (HOURLY_VARIABLES, HOURLY_STORE),
 }
+# Timeout (kết nối, đọc) cho mỗi request
+REQUEST_TIMEOUT = (5, 15)
+
+# Số request chạy song song tối đa khi tải dữ liệu
+MAX_WORKERS = 8
+# Số địa điểm gộp trong một request (API nhận list toạ độ phân cách bởi dấu phẩy)
+BATCH_SIZE = 10
+
+# Thời gian (giây) trước khi bộ dữ liệu đang phục vụ được làm mới ở nền
+DATA_TTL = 3600
+
+# Lược đồ gọn (compact): kiểu dữ liệu cho từng nhóm cột
+SEASONS = ['Xuân', 'Hè', 'Thu', 'Đông']
+FLOAT32_COLUMNS = list(DAILY_COLUMNS.values()) + ['temp_range', 'comfort_index']
+INT8_COLUMNS = ['month', 'day', 'week', 'dayofweek']
 
 
 # HELPER FUNCTIONS
@@ -33,94 +117,705 @@ def get_season(month):
         return 'Thu'
 
 
+def default_cities():
+    """Các địa điểm được chọn sẵn trên sidebar"""
+    return list(CITIES)[:DEFAULT_CITY_COUNT]
+
+
+def get_city_table():
+    """
+    Bảng chiều thành phố (city, lat, lon, region)
+
+    Dùng để ghép toạ độ khi cần (ví dụ bản đồ) thay vì lặp lại trên từng dòng.
+    """
+    return pd.DataFrame([
+        {'city': city, 'lat': coords['lat'], 'lon': coords['lon'], 'region': coords['region']}
+        for city, coords in CITIES.items()
+    ])
+
+
+def _fetch_batch(session, batch, start_date, end_date, resolution='daily'):
+    """
+    Gửi một request lấy dữ liệu cho nhiều địa điểm (chạy trong thread pool)
+
+    Nếu API từ chối cả batch (HTTP 400, thường do một toạ độ không hợp lệ),
+    từng địa điểm được tải lại riêng để lỗi chỉ ảnh hưởng tới thành phố đó.
+
+    Args:
+        session: requests.Session dùng chung
+        batch: List các tuple (tên thành phố, coords)
+        start_date: Ngày bắt đầu (YYYY-MM-DD)
+        end_date: Ngày kết thúc (YYYY-MM-DD)
+        resolution: 'daily' hoặc 'hourly' (xem RESOLUTIONS)
+
+    Returns:
+        List các tuple (tên thành phố, data, issue) - data là None nếu không thành công,
+        issue là tuple (mức độ, thông báo) hoặc None
+    """
+    params = {
+        'latitude': ','.join(str(coords['lat']) for _, coords in batch),
+        'longitude': ','.join(str(coords['lon']) for _, coords in batch),
+        'start_date': start_date,
+        'end_date': end_date,
+        resolution: RESOLUTIONS[resolution][0],
+        'timezone': 'Asia/Bangkok'
+    }
+
+    response = get_with_retry(session, API_URL, params=params, timeout=REQUEST_TIMEOUT)
+
+    if response.status_code == 200:
+        payload = response.json()
+        # Một địa điểm -> object, nhiều địa điểm -> list theo đúng thứ tự toạ độ
+        if isinstance(payload, dict):
+            payload = [payload]
+        return [(city, data, None) for (city, _), data in zip(batch, payload)]
+
+    if response.status_code == 400 and len(batch) > 1:
+        results = []
+        for item in batch:
+            try:
+                results.extend(_fetch_batch(session, [item], start_date, end_date, resolution))
+            except requests.RequestException as e:
+                results.append((item[0], None, ('error', f"❌ Lỗi khi lấy dữ liệu {item[0]}: {str(e)}")))
+        return results
+
+    return [
+        (city, None, ('warning', f"⚠️ Không thể lấy dữ liệu cho {city} (Status: {response.status_code})"))
+        for city, _ in batch
+    ]
+
+
+def _make_batches(pending, batch_size):
+    """
+    Chia các thành phố cần tải thành từng batch cùng ngày bắt đầu
+
+    Args:
+        pending: Dict tên thành phố -> ngày bắt đầu
+        batch_size: Số địa điểm tối đa mỗi batch
+
+    Returns:
+        List các tuple (ngày bắt đầu, list (tên thành phố, coords))
+    """
+    by_start = {}
+    for city, city_start in pending.items():
+        by_start.setdefault(city_start, []).append((city, CITIES[city]))
+
+    batch_size = max(1, batch_size)
+    return [
+        (city_start, items[i:i + batch_size])
+        for city_start, items in by_start.items()
+        for i in range(0, len(items), batch_size)
+    ]
+
+
+# PARSING
+def parse_daily_block(city, coords, data):
+    """
+    Chuyển phần `daily` trong JSON của một thành phố thành các cột NumPy
+
+    Args:
+        city: Tên thành phố
+        coords: Dict chứa lat, lon, region
+        data: JSON trả về từ API
+
+    Returns:
+        Dict tên cột -> mảng NumPy
+    """
+    daily = data['daily']
+    n_days = len(daily['time'])
+
+    block = {
+        'city': np.full(n_days, city, dtype=object),
+        'date': np.array(daily['time'], dtype='datetime64[ns]'),
+    }
+    for var, col in DAILY_COLUMNS.items():
+        # None (thiếu dữ liệu) tự chuyển thành NaN
+        block[col] = np.array(daily[var], dtype='float64')
+    block['lat'] = np.full(n_days, coords['lat'])
+    block['lon'] = np.full(n_days, coords['lon'])
+    block['region'] = np.full(n_days, coords['region'], dtype=object)
+
+    return block
+
+
+def build_weather_frame(responses, cities=None):
+    """
+    Ghép dữ liệu các thành phố thành một DataFrame theo từng cột
+
+    Args:
+        responses: Dict tên thành phố -> JSON trả về từ API
+        cities: Dict thông tin thành phố, mặc định CITIES
+
+    Returns:
+        DataFrame, thứ tự thành phố giữ như trong `cities`
+    """
+    cities = CITIES if cities is None else cities
+    blocks = [
+        parse_daily_block(city, coords, responses[city])
+        for city, coords in cities.items()
+        if city in responses
+    ]
+
+    if not blocks:
+        return pd.DataFrame()
+
+    return pd.DataFrame({
+        col: np.concatenate([block[col] for block in blocks])
+        for col in blocks[0]
+    })
+
+
+def parse_hourly_block(data):
+    """
+    Chuyển phần `hourly` trong JSON của một thành phố thành các cột NumPy
+
+    Giá trị lưu dạng float32 (lược đồ gọn); toạ độ và vùng không lặp lại
+    trên từng giờ mà ghép khi cần (xem hourly_to_daily, get_city_table).
+
+    Returns:
+        Dict tên cột -> mảng NumPy (date là giờ, các số đo)
+    """
+    hourly = data['hourly']
+
+    block = {'date': np.array(hourly['time'], dtype='datetime64[ns]')}
+    for var, col in HOURLY_COLUMNS.items():
+        block[col] = np.array(hourly[var], dtype='float64').astype('float32')
+
+    return block
+
+
+def build_hourly_frame(responses, cities=None):
+    """Ghép dữ liệu theo giờ các thành phố thành một DataFrame (city dạng category)"""
+    cities = CITIES if cities is None else cities
+    names = [city for city in cities if city in responses]
+    blocks = [parse_hourly_block(responses[city]) for city in names]
+
+    if not blocks:
+        return pd.DataFrame()
+
+    lengths = [len(block['date']) for block in blocks]
+    return pd.DataFrame({
+        'city': pd.Categorical.from_codes(np.repeat(np.arange(len(names)), lengths), categories=names),
+        **{col: np.concatenate([block[col] for block in blocks]) for col in blocks[0]},
+    })
+
+
+def hourly_to_daily(hourly):
+    """
+    Gộp dữ liệu theo giờ thành dữ liệu ngày cùng lược đồ với API daily
+
+    temp_max/temp_min/temp_mean từ nhiệt độ giờ, rainfall là tổng, humidity là
+    trung bình, windspeed là giá trị lớn nhất. Chỉ giữ những ngày đủ 24 giờ
+    (ngày đang dở sẽ được gộp ở lần làm mới sau).
+
+    Args:
+        hourly: DataFrame có cột city, date (giờ) và các cột HOURLY_COLUMNS
+
+    Returns:
+        DataFrame ngày có cột city, date và các cột DAILY_COLUMNS
+    """
+    if hourly.empty:
+        return pd.DataFrame()
+
+    codes, cities = pd.factorize(hourly['city'], sort=False)
+    hours = hourly['date'].to_numpy().astype('datetime64[ns]', copy=False)
+    days = hours.astype('datetime64[D]')
+
+    # Các đoạn liên tục (thành phố, ngày) sau khi sắp xếp
+    order = np.lexsort((hours, codes))
+    codes, days = codes[order], days[order]
+    starts = np.flatnonzero(np.r_[True, (codes[1:] != codes[:-1]) | (days[1:] != days[:-1])])
+    counts = np.diff(np.r_[starts, len(order)])
+
+    def reduce(col, ufunc):
+        values = hourly[col].to_numpy(dtype='float64', na_value=np.nan)[order]
+        valid = ~np.isnan(values)
+        n_valid = np.add.reduceat(valid, starts)
+        if ufunc is np.add:
+            result = np.add.reduceat(np.where(valid, values, 0.0), starts)
+        else:
+            fill = -np.inf if ufunc is np.maximum else np.inf
+            result = ufunc.reduceat(np.where(valid, values, fill), starts)
+        return np.where(n_valid > 0, result, np.nan), n_valid
+
+    temp_sum, temp_n = reduce('temp', np.add)
+    humidity_sum, humidity_n = reduce('humidity', np.add)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        daily = {
+            'city': np.asarray(cities, dtype=object)[codes[starts]],
+            'date': days[starts].astype('datetime64[ns]'),
+            'temp_max': reduce('temp', np.maximum)[0],
+            'temp_min': reduce('temp', np.minimum)[0],
+            'temp_mean': temp_sum / temp_n,
+            'rainfall': reduce('rainfall', np.add)[0],
+            'humidity': humidity_sum / humidity_n,
+            'windspeed': reduce('windspeed', np.maximum)[0],
+        }
+
+    df = pd.DataFrame(daily)
+    return df[counts == 24].reset_index(drop=True)
+
+
+# LOCAL STORE
+def _pending_start_dates(start_date, end_date, store=DAILY_STORE, cities=None):
+    """
+    Xác định ngày cần bắt đầu tải cho từng thành phố dựa trên dữ liệu đã lưu
+
+    Với store theo giờ, ngày cuối cùng chưa đủ 24 giờ được tải lại.
+
+    Returns:
+        Dict tên thành phố -> ngày bắt đầu (YYYY-MM-DD); thành phố đã đủ dữ liệu bị bỏ qua
+    """
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    cities = CITIES if cities is None else cities
+    stored = stored_date_ranges(cities, store)
+    step = pd.Timedelta(hours=1) if store == HOURLY_STORE else pd.Timedelta(days=1)
+
+    pending = {}
+    for city in cities:
+        first, last = stored.get(city, (None, None))
+        if first is None or first > start:
+            # Chưa có dữ liệu (hoặc thiếu phần đầu): tải lại toàn bộ khoảng
+            pending[city] = start
+        elif (last + step).normalize() <= end:
+            # Chỉ tải phần sau ngày cuối cùng đã lưu (đủ)
+            pending[city] = max(start, (last + step).normalize())
+
+    return {city: date.strftime('%Y-%m-%d') for city, date in pending.items()}
+
+
+def _attach_city_info(df):
+    """Thêm lat, lon, region từ CITIES cho dữ liệu đọc từ store"""
+    for col in ('lat', 'lon', 'region'):
+        df[col] = df['city'].map({city: coords[col] for city, coords in CITIES.items()})
+    return df
+
+
+def _combine_frames(stored, fetched):
+    """Gộp dữ liệu đã lưu với dữ liệu mới tải, sắp xếp theo thứ tự CITIES rồi theo ngày"""
+    frames = [frame for frame in (stored, fetched) if not frame.empty]
+    if not frames:
+        return pd.DataFrame()
+
+    df = pd.concat(frames, ignore_index=True)
+    df = df.drop_duplicates(subset=['city', 'date'], keep='last')
+
+    city_order = np.asarray(df['city'].map({city: i for i, city in enumerate(CITIES)}), dtype='float64')
+    order = np.lexsort((df['date'].values, city_order))
+    return df.iloc[order].reset_index(drop=True)
+
+
 # DATA FETCHING
-@st.cache_data(ttl=3600)
-def fetch_weather_data(start_date='2025-01-01', end_date=None):
+def _fetch_pending(pending, end_date, max_workers, batch_size, on_progress, on_issue, resolution='daily'):
+    """
+    Tải song song các thành phố còn thiếu dữ liệu
+
+    Args:
+        pending: Dict tên thành phố -> ngày bắt đầu (xem _pending_start_dates)
+        resolution: 'daily' hoặc 'hourly'
+
+    Returns:
+        Dict tên thành phố -> JSON trả về từ API (bỏ qua thành phố lỗi, đã báo qua on_issue)
+    """
+    responses = {}
+    if not pending:
+        return responses
+
+    total_cities = len(pending)
+    batches = _make_batches(pending, batch_size)
+    max_workers = max(1, min(max_workers, len(batches)))
+    session = get_session(max_workers)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(_fetch_batch, session, batch, city_start, end_date, resolution): batch
+            for city_start, batch in batches
+        }
+
+        # Báo tiến trình ngay khi từng batch tải xong
+        done = 0
+        for future in as_completed(futures):
+            batch = futures[future]
+            done += len(batch)
+            if on_progress:
+                on_progress(done, total_cities, batch[-1][0])
+
+            try:
+                results = future.result()
+            except Exception as e:
+                for city, _ in batch:
+                    on_issue('error', f"❌ Lỗi khi lấy dữ liệu {city}: {str(e)}")
+                continue
+
+            for city, data, issue in results:
+                if data is not None:
+                    responses[city] = data
+                else:
+                    on_issue(*issue)
+
+    return responses
+
+
+def ingest_hourly(start_date='2025-01-01', end_date=None, cities=None, max_workers=MAX_WORKERS,
+                  batch_size=BATCH_SIZE, on_progress=None, on_issue=None):
     """
-    Thu thập dữ liệu thời tiết từ Open-Meteo API
+    Tải phần dữ liệu theo giờ còn thiếu vào store theo giờ
+
+    Chỉ những giờ sau giờ cuối cùng đã lưu của mỗi thành phố được tải
+    (ngày chưa đủ 24 giờ được tải lại).
+
+    Args:
+        cities: List thành phố (None = tất cả trong CITIES)
+
+    Returns:
+        Số dòng (giờ) mới được ghi
+    """
+    if end_date is None:
+        end_date = datetime.now().strftime('%Y-%m-%d')
+    on_issue = on_issue or (lambda level, message: logger.warning(message))
+    cities = {city: CITIES[city] for city in (cities or CITIES) if city in CITIES}
+
+    pending = _pending_start_dates(start_date, end_date, HOURLY_STORE, cities)
+    responses = _fetch_pending(pending, end_date, max_workers, batch_size, on_progress, on_issue,
+                               resolution='hourly')
+    fetched = build_hourly_frame(responses, cities)
+    if fetched.empty:
+        return 0
+
+    # Không lưu những giờ API chưa có số liệu (để lần sau tải lại)
+    complete = fetched.dropna(subset=list(HOURLY_COLUMNS.values()), how='all')
+    append_to_store(complete, HOURLY_STORE)
+    return len(complete)
+
+
+def read_hourly(cities=None, start_date=None, end_date=None, columns=None):
+    """
+    Đọc dữ liệu theo giờ từ store (chỉ các phân vùng và cột cần thiết)
+
+    Args:
+        cities: List thành phố (None = tất cả)
+        start_date, end_date: Khoảng ngày, bao gồm cả 24 giờ của ngày cuối
+        columns: Các số đo cần đọc (None = tất cả)
+
+    Returns:
+        DataFrame có cột city (category), date (giờ) và các số đo (float32)
+    """
+    if end_date is not None:
+        end_date = pd.Timestamp(end_date).normalize() + pd.Timedelta(hours=23)
+    df = read_store(cities, start_date, end_date, columns=columns, store=HOURLY_STORE)
+    if not df.empty:
+        df['city'] = df['city'].astype('category')
+    return df
+
+
+def load_weather_data(start_date='2025-01-01', end_date=None, max_workers=MAX_WORKERS,
+                      use_store=True, batch_size=BATCH_SIZE, offline=False,
+                      compact=False, base=None, on_progress=None, on_issue=None, resolution='daily',
+                      process_workers=1):
+    """
+    Thu thập dữ liệu thời tiết từ Open-Meteo API (không phụ thuộc giao diện)
+    
+    Các thành phố được gộp thành batch (nhiều toạ độ trong một request)
+    và tải song song qua một thread pool dùng chung một session HTTP
+    (keep-alive), có retry và circuit breaker (xem http_client.py). Khi
+    bật `use_store`, dữ liệu đã lưu trên đĩa được đọc trước và chỉ những
+    ngày sau ngày cuối cùng đã lưu của mỗi thành phố mới được tải thêm.
     
     Args:
         start_date: Ngày bắt đầu (YYYY-MM-DD), mặc định 2025-01-01
         end_date: Ngày kết thúc (YYYY-MM-DD), mặc định là hôm nay
+        max_workers: Số request chạy song song tối đa (1 = tải tuần tự)
+        use_store: Đọc/ghi store Parquet cục bộ (xem data_store.py)
+        batch_size: Số địa điểm gộp trong một request (1 = mỗi thành phố một request)
+        offline: Chỉ đọc store, không gọi API
+        compact: Trả về lược đồ gọn (xem compact_frame)
+        base: DataFrame đã tải trước đó (cùng tham số, đã có đặc trưng); chỉ
+            những dòng mới được đọc từ store và tính đặc trưng rồi nối vào
+        on_progress: Hàm (số thành phố đã xong, tổng, tên thành phố) báo tiến trình
+        on_issue: Hàm (mức độ 'warning'/'error', thông báo) báo lỗi từng thành phố
+        resolution: 'daily' (biến daily của API) hoặc 'hourly' (tải dữ liệu theo
+            giờ vào store theo giờ rồi gộp thành ngày, xem hourly_to_daily;
+            luôn dùng store)
+        process_workers: Số tiến trình tính đặc trưng (chia theo thành phố,
+            xem parallel.py; 1 = trong tiến trình hiện tại)
     
     Returns:
-        DataFrame chứa dữ liệu thời tiết
+        DataFrame chứa dữ liệu thời tiết (đã thêm các cột đặc trưng); khi có
+        dòng mới nối vào base, df.attrs['refetched_from'] là dict thành phố ->
+        ngày sớm nhất được đọc/tải lại
     """
     # Nếu không chỉ định end_date, dùng ngày hôm nay
     if end_date is None:
         end_date = datetime.now().strftime('%Y-%m-%d')
     
-    all_data = []
+    on_issue = on_issue or (lambda level, message: logger.warning(message))
+    measure_cols = list(DAILY_COLUMNS.values())
+    
+    has_base = base is not None and not base.empty
+    
+    # Đã có base: chỉ đọc những ngày sau ngày cuối cùng trong base
+    read_from = start_date
+    if has_base:
+        read_from = base.groupby('city', observed=True)['date'].max().min() + pd.Timedelta(days=1)
     
+    if resolution == 'hourly':
+        # Tải các giờ còn thiếu vào store theo giờ, dữ liệu ngày được gộp từ store đó
+        if not offline:
+            try:
+                ingest_hourly(start_date, end_date, max_workers=max_workers, batch_size=batch_size,
+                              on_progress=on_progress, on_issue=on_issue)
+            except OSError as e:
+                on_issue('warning', f"⚠️ Không thể ghi dữ liệu vào bộ nhớ cục bộ: {str(e)}")
+        stored = hourly_to_daily(read_hourly(list(CITIES), read_from, end_date))
+        pending = {}
+    elif use_store:
+        stored = read_store(CITIES, read_from, end_date, columns=measure_cols)
+        pending = {} if offline else _pending_start_dates(start_date, end_date)
+    else:
+        stored = pd.DataFrame()
+        pending = {} if offline else {city: start_date for city in CITIES}
+    
+    if not stored.empty:
+        stored = _attach_city_info(stored)
+    
+    responses = _fetch_pending(pending, end_date, max_workers, batch_size, on_progress, on_issue)
+    fetched = build_weather_frame(responses)
+    
+    if use_store and not fetched.empty:
+        # Không lưu những ngày API chưa có số liệu (để lần sau tải lại)
+        complete = fetched.dropna(subset=measure_cols, how='all')
+        try:
+            append_to_store(complete[['city', 'date'] + measure_cols])
+        except OSError as e:
+            on_issue('warning', f"⚠️ Không thể ghi dữ liệu vào bộ nhớ cục bộ: {str(e)}")
+    
+    df = _combine_frames(stored, fetched)
+    
+    # Feature Engineering (chỉ cho các dòng mới khi có base), chia theo thành phố
+    # trên process pool nếu process_workers > 1
+    df = apply_rows(add_features, df, process_workers)
+    if compact:
+        df = compact_frame(df)
+    
+    if has_base and not df.empty:
+        # Ngày sớm nhất được đọc/tải lại của từng thành phố: các dòng của base
+        # từ ngày đó có thể bị ghi đè (xem running_stats.update_stats)
+        refetched_from = df.groupby('city', observed=True)['date'].min().to_dict()
+        df = _combine_frames(base, df)
+        df.attrs['refetched_from'] = refetched_from
+    elif has_base:
+        # Không có dòng mới: trả về chính base để phiên bản dữ liệu giữ nguyên
+        df = base
+    
+    return df
+
+
+def _streamlit_callbacks():
+    """Tạo thanh tiến trình Streamlit và các callback cho load_weather_data"""
     progress_bar = st.progress(0)
     status_text = st.empty()
     
-    total_cities = len(CITIES)
+    def on_progress(done, total, city):
+        status_text.text(f'🌍 Đã tải dữ liệu {city}... ({done}/{total})')
+        progress_bar.progress(done / total)
     
-    for idx, (city, coords) in enumerate(CITIES.items()):
-        try:
-            status_text.text(f'🌍 Đang tải dữ liệu {city}... ({idx+1}/{total_cities})')
-            progress_bar.progress((idx + 1) / total_cities)
-            
-            # Open-Meteo API (Free, không cần API key)
-            url = "https://archive-api.open-meteo.com/v1/archive"
-            params = {
-                'latitude': coords['lat'],
-                'longitude': coords['lon'],
-                'start_date': start_date,
-                'end_date': end_date,
-                'daily': 'temperature_2m_max,temperature_2m_min,temperature_2m_mean,precipitation_sum,relative_humidity_2m_mean,windspeed_10m_max',
-                'timezone': 'Asia/Bangkok'
-            }
-            
-            response = requests.get(url, params=params, timeout=15)
-            
-            if response.status_code == 200:
-                data = response.json()
-                dates = pd.to_datetime(data['daily']['time'])
-                
-                for i, date in enumerate(dates):
-                    all_data.append({
-                        'city': city,
-                        'date': date,
-                        'temp_max': data['daily']['temperature_2m_max'][i],
-                        'temp_min': data['daily']['temperature_2m_min'][i],
-                        'temp_mean': data['daily']['temperature_2m_mean'][i],
-                        'rainfall': data['daily']['precipitation_sum'][i],
-                        'humidity': data['daily']['relative_humidity_2m_mean'][i],
-                        'windspeed': data['daily']['windspeed_10m_max'][i],
-                        'lat': coords['lat'],
-                        'lon': coords['lon'],
-                        'region': coords['region']
-                    })
-            else:
-                st.warning(f"⚠️ Không thể lấy dữ liệu cho {city} (Status: {response.status_code})")
-                
-        except Exception as e:
-            st.error(f"❌ Lỗi khi lấy dữ liệu {city}: {str(e)}")
+    def on_issue(level, message):
+        getattr(st, level)(message)
     
-    progress_bar.empty()
-    status_text.empty()
+    def close():
+        progress_bar.empty()
+        status_text.empty()
     
-    if not all_data:
-        st.error("❌ Không thể tải dữ liệu. Vui lòng kiểm tra kết nối internet.")
-        return pd.DataFrame()
+    return on_progress, on_issue, close
+
+
+@st.cache_data(ttl=DATA_TTL)
+def fetch_weather_data(start_date='2025-01-01', end_date=None, max_workers=MAX_WORKERS,
+                       use_store=True, batch_size=BATCH_SIZE, compact=False):
+    """
+    Thu thập dữ liệu thời tiết, hiển thị tiến trình và lỗi trên Streamlit
     
-    df = pd.DataFrame(all_data)
+    Xem load_weather_data để biết ý nghĩa các tham số.
+    
+    Returns:
+        DataFrame chứa dữ liệu thời tiết
+    """
+    on_progress, on_issue, close = _streamlit_callbacks()
+    try:
+        df = load_weather_data(
+            start_date, end_date, max_workers=max_workers, use_store=use_store,
+            batch_size=batch_size, compact=compact, on_progress=on_progress, on_issue=on_issue
+        )
+    finally:
+        close()
     
-    # Feature Engineering
-    df = add_features(df)
+    if df.empty:
+        st.error("❌ Không thể tải dữ liệu. Vui lòng kiểm tra kết nối internet.")
     
-    # st.success(f"✅ Đã tải {len(df):,} điểm dữ liệu từ {total_cities} thành phố!")
+    # st.success(f"✅ Đã tải {len(df):,} điểm dữ liệu từ {len(CITIES)} thành phố!")
     
     return df
 
 
+# STALE-WHILE-REVALIDATE
+class DatasetCache:
+    """
+    Giữ bộ dữ liệu tốt gần nhất và làm mới ở nền (stale-while-revalidate)
+    
+    - Đã có dữ liệu trong bộ nhớ: trả về ngay; nếu quá `ttl` giây thì
+      khởi động một thread làm mới, xong sẽ thay thế bộ dữ liệu cũ.
+    - Chưa có trong bộ nhớ nhưng store cục bộ có dữ liệu: trả về dữ liệu
+      trên đĩa ngay và làm mới phần còn thiếu ở nền.
+    - Chưa có gì: tải đồng bộ (chỉ xảy ra ở lần chạy đầu tiên).
+    
+    Thành phố tải lỗi ở lần làm mới vẫn giữ dữ liệu của bộ dữ liệu cũ.
+    Thống kê luỹ tiến (running_stats.RunningStats) được cập nhật từ các dòng mới.
+    """
+    
+    def __init__(self, ttl=DATA_TTL, **load_kwargs):
+        self.ttl = ttl
+        self.load_kwargs = load_kwargs
+        self.df = None
+        self.version = None
+        self.stats = None
+        self.loaded_at = None
+        self.last_error = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+        self._cold_load_lock = threading.Lock()
+    
+    @property
+    def refreshing(self):
+        return self._refreshing
+    
+    def get(self):
+        """
+        Lấy bộ dữ liệu hiện tại
+        
+        Returns:
+            Tuple (DataFrame, version)
+        """
+        if self.df is None:
+            with self._cold_load_lock:
+                if self.df is None:
+                    self._cold_load()
+        elif time.monotonic() - self.loaded_at > self.ttl:
+            self.refresh_in_background()
+        
+        with self._lock:
+            return self.df, self.version
+    
+    def _cold_load(self):
+        stored = load_weather_data(offline=True, **self.load_kwargs)
+        if not stored.empty:
+            # Phục vụ dữ liệu trên đĩa ngay, coi như đã cũ để làm mới ở nền
+            self._swap(stored, loaded_at=-float('inf'))
+            self.refresh_in_background()
+            return
+        
+        on_progress, on_issue, close = _streamlit_callbacks()
+        try:
+            df = load_weather_data(on_progress=on_progress, on_issue=on_issue, **self.load_kwargs)
+        finally:
+            close()
+        self._swap(df)
+    
+    def refresh_in_background(self):
+        """Khởi động thread làm mới nếu chưa có thread nào đang chạy"""
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        
+        threading.Thread(target=self._refresh, name='weather-refresh', daemon=True).start()
+    
+    def _refresh(self):
+        try:
+            df = load_weather_data(base=self.df, **self.load_kwargs)
+            if df.empty:
+                raise RuntimeError('Không tải được dữ liệu mới')
+            if df is self.df:
+                self.loaded_at = time.monotonic()
+            else:
+                self._swap(df)
+            self.last_error = None
+        except Exception as e:
+            logger.warning('Làm mới dữ liệu thất bại: %s', e)
+            self.last_error = str(e)
+        finally:
+            self._refreshing = False
+    
+    def stats_for(self, version):
+        """Trạng thái thống kê luỹ tiến nếu `version` vẫn là phiên bản hiện tại"""
+        with self._lock:
+            return self.stats if version == self.version else None
+    
+    def _swap(self, df, loaded_at=None):
+        with self._lock:
+            refetched_from = df.attrs.get('refetched_from')
+            if self.df is not None and not self.df.empty:
+                # Giữ dữ liệu cũ của các thành phố không tải được lần này
+                missing = self.df[~self.df['city'].isin(df['city'].unique())]
+                if not missing.empty:
+                    df = _combine_frames(missing, df)
+            self.stats = update_stats(self.stats, df, self.df, refetched_from)
+            self.df = df
+            self.version = datetime.now().strftime('%Y%m%d%H%M%S%f')
+            self.loaded_at = time.monotonic() if loaded_at is None else loaded_at
+
+
 # FEATURE ENGINEERING
+# Mã mùa theo tháng (chỉ số = tháng, phần tử 0 không dùng), giá trị là vị trí trong SEASONS
+SEASON_CODE_BY_MONTH = np.array([-1, 3, 3, 0, 0, 0, 1, 1, 1, 2, 2, 2, 3], dtype=np.int8)
+
+# Cột phân loại: cột nguồn, biên các khoảng (trái mở, phải đóng như pd.cut), nhãn
+FEATURE_BINS = {
+    'temp_category': ('temp_mean', np.array([0, 20, 28, 100], dtype='float64'), ['Mát', 'Ấm', 'Nóng']),
+    'humidity_level': ('humidity', np.array([0, 60, 80, 100], dtype='float64'), ['Thấp', 'TB', 'Cao']),
+    'rain_category': ('rainfall', np.array([0, 5, 20, 1000], dtype='float64'), ['Ít', 'Vừa', 'Nhiều']),
+    'wind_category': ('windspeed', np.array([0, 20, 40, 100], dtype='float64'), ['Nhẹ', 'Vừa', 'Mạnh']),
+}
+
+
+def _bin_codes(values, edges):
+    """Mã khoảng của từng giá trị, -1 nếu nằm ngoài các khoảng hoặc là NaN"""
+    # Ít biên nên so sánh trực tiếp nhanh hơn tìm kiếm nhị phân
+    codes = np.zeros(len(values), dtype=np.int8)
+    for edge in edges[1:-1]:
+        codes += values > edge
+    codes[~((values > edges[0]) & (values <= edges[-1]))] = -1
+    return codes
+
+
+def _calendar_lookup(first_day, n_days):
+    """
+    Bảng tra tháng, ngày, tuần ISO, thứ cho n_days ngày liên tiếp từ first_day
+
+    Returns:
+        Dict tên cột -> mảng int8 độ dài n_days
+    """
+    days = first_day + np.arange(n_days).astype('timedelta64[D]')
+    months = days.astype('datetime64[M]')
+    dayofweek = (days.astype('int64') + 3) % 7          # 1970-01-01 là thứ Năm
+    thursday = days - dayofweek + 3                       # Tuần ISO tính theo thứ Năm cùng tuần
+    week = (thursday - thursday.astype('datetime64[Y]').astype('datetime64[D]')).astype('int64') // 7 + 1
+
+    return {
+        'month': (months.astype('int64') % 12 + 1).astype(np.int8),
+        'day': ((days - months).astype('int64') + 1).astype(np.int8),
+        'week': week.astype(np.int8),
+        'dayofweek': dayofweek.astype(np.int8),
+    }
+
+
 def add_features(df):
     """
     Thêm các cột đặc trưng mới
     
+    Tính hoàn toàn bằng NumPy: các cột lịch được tính một lần cho mỗi ngày
+    trong khoảng dữ liệu rồi tra theo chỉ số ngày, mùa tra bảng theo tháng,
+    các cột phân loại so với biên khoảng định sẵn.
+    
     Args:
         df: DataFrame gốc
     
@@ -131,50 +826,114 @@ def add_features(df):
         return df
     
     # Thời gian
-    df['month'] = df['date'].dt.month
-    df['day'] = df['date'].dt.day
-    df['week'] = df['date'].dt.isocalendar().week
-    df['dayofweek'] = df['date'].dt.dayofweek
-    df['season'] = df['month'].apply(get_season)
+    day_numbers = df['date'].values.astype('datetime64[D]').astype('int64')
+    first_day = day_numbers.min()
+    day_index = day_numbers - first_day
+    calendar = _calendar_lookup(np.datetime64(int(first_day), 'D'), int(day_index.max()) + 1)
+    
+    for col, lookup in calendar.items():
+        df[col] = lookup[day_index]
+    df['season'] = pd.Categorical.from_codes(SEASON_CODE_BY_MONTH[df['month'].values], categories=SEASONS)
     
     # Nhiệt độ
-    df['temp_range'] = df['temp_max'] - df['temp_min']
-    df['temp_category'] = pd.cut(
-        df['temp_mean'], 
-        bins=[0, 20, 28, 100], 
-        labels=['Mát', 'Ấm', 'Nóng']
-    )
-    
-    # Độ ẩm
-    df['humidity_level'] = pd.cut(
-        df['humidity'], 
-        bins=[0, 60, 80, 100], 
-        labels=['Thấp', 'TB', 'Cao']
-    )
-    
-    # Mưa
-    df['rain_category'] = pd.cut(
-        df['rainfall'], 
-        bins=[0, 5, 20, 1000], 
-        labels=['Ít', 'Vừa', 'Nhiều']
-    )
-    
-    # Gió
-    df['wind_category'] = pd.cut(
-        df['windspeed'],
-        bins=[0, 20, 40, 100],
-        labels=['Nhẹ', 'Vừa', 'Mạnh']
-    )
+    df['temp_range'] = df['temp_max'].values - df['temp_min'].values
+    
+    # Phân loại nhiệt độ, độ ẩm, mưa, gió
+    for col, (source, edges, labels) in FEATURE_BINS.items():
+        codes = _bin_codes(df[source].values, edges)
+        df[col] = pd.Categorical.from_codes(codes, categories=labels, ordered=True)
     
     # Comfort index (đơn giản hóa)
-    df['comfort_index'] = 100 - abs(df['temp_mean'] - 25) * 3 - abs(df['humidity'] - 60) / 2
+    temp_mean, humidity = df['temp_mean'].values, df['humidity'].values
+    df['comfort_index'] = 100 - np.abs(temp_mean - 25) * 3 - np.abs(humidity - 60) / 2
     
     return df
 
 
+# COMPACT SCHEMA
+def compact_frame(df):
+    """
+    Chuyển DataFrame sang lược đồ gọn
+    
+    - city, region, season: category (danh mục cố định theo CITIES / SEASONS)
+    - Số đo: float32, cột lịch: int8
+    - Bỏ lat, lon (lấy từ get_city_table khi cần)
+    
+    Args:
+        df: DataFrame sau add_features
+    
+    Returns:
+        DataFrame mới với lược đồ gọn
+    """
+    if df.empty:
+        return df
+    
+    df = df.drop(columns=['lat', 'lon'], errors='ignore')
+    
+    categories = {
+        'city': list(CITIES),
+        'region': sorted({coords['region'] for coords in CITIES.values()}),
+        'season': SEASONS,
+    }
+    dtypes = {col: pd.CategoricalDtype(cats) for col, cats in categories.items() if col in df}
+    dtypes.update({col: 'float32' for col in FLOAT32_COLUMNS if col in df})
+    dtypes.update({col: 'int8' for col in INT8_COLUMNS if col in df})
+    
+    return df.astype(dtypes)
+
+
+def memory_report(df):
+    """
+    Thống kê bộ nhớ của DataFrame
+    
+    Returns:
+        Dictionary: rows, total_bytes, bytes_per_row, columns (bytes theo cột)
+    """
+    usage = df.memory_usage(index=False, deep=True)
+    rows = len(df)
+    return {
+        'rows': rows,
+        'total_bytes': int(usage.sum()),
+        'bytes_per_row': usage.sum() / rows if rows else 0.0,
+        'columns': usage.astype(int).to_dict(),
+    }
+
+
+def process_memory():
+    """
+    Bộ nhớ thường trú của tiến trình hiện tại, đọc từ /proc (Linux)
+
+    Trang của file ánh xạ bộ nhớ (map_published) được tính vào `shared`: chúng
+    nằm trong page cache, dùng chung giữa các tiến trình Streamlit. `pss` chia
+    đều trang dùng chung cho các tiến trình đang ánh xạ, nên tổng pss của các
+    worker là bộ nhớ vật lý thực dùng.
+
+    Returns:
+        Dictionary (MB): rss, private, shared, pss; None nếu không đọc được
+    """
+    fields = {}
+    for name in ('/proc/self/status', '/proc/self/smaps_rollup'):
+        try:
+            with open(name) as f:
+                for line in f:
+                    key, _, value = line.partition(':')
+                    if value.strip().endswith('kB'):
+                        fields.setdefault(key, int(value.split()[0]) / 1024)
+        except OSError:
+            continue
+    if 'VmRSS' not in fields:
+        return None
+    return {
+        'rss': fields['VmRSS'],
+        'private': fields.get('RssAnon', 0.0),
+        'shared': fields.get('RssFile', 0.0) + fields.get('RssShmem', 0.0),
+        'pss': fields.get('Pss', fields['VmRSS']),
+    }
+
+
 # DATA FILTERING
 
-def filter_data(df, cities=None, date_range=None, season=None):
+def filter_data(df, cities=None, date_range=None, season=None, index=None):
     """
     Lọc dữ liệu theo các tiêu chí
     
@@ -183,26 +942,28 @@ def filter_data(df, cities=None, date_range=None, season=None):
         cities: List thành phố cần lọc
         date_range: Tuple (start_date, end_date)
         season: Mùa cần lọc
+        index: FilterIndex của df (xem data_index.py); khi có, lọc bằng tìm
+            nhị phân theo từng thành phố thay vì quét toàn bộ dữ liệu
     
     Returns:
-        DataFrame đã lọc
+        DataFrame đã lọc (có thể là lát cắt của df, không được sửa trực tiếp)
     """
-    df_filtered = df.copy()
+    if index is not None:
+        return index.select(cities, date_range, season)
+    
+    mask = np.ones(len(df), dtype=bool)
     
     if cities:
-        df_filtered = df_filtered[df_filtered['city'].isin(cities)]
+        mask &= df['city'].isin(cities).to_numpy()
     
     if date_range:
         start, end = date_range
-        df_filtered = df_filtered[
-            (df_filtered['date'] >= pd.Timestamp(start)) & 
-            (df_filtered['date'] <= pd.Timestamp(end))
-        ]
+        mask &= ((df['date'] >= pd.Timestamp(start)) & (df['date'] <= pd.Timestamp(end))).to_numpy()
     
     if season and season != 'Tất cả':
-        df_filtered = df_filtered[df_filtered['season'] == season]
+        mask &= (df['season'] == season).to_numpy()
     
-    return df_filtered
+    return df if mask.all() else df[mask]
 
 
 # STATISTICS
@@ -210,24 +971,35 @@ def get_statistics(df):
     """
     Tính toán các thống kê cơ bản
     
+    Args:
+        df: DataFrame ngày hoặc lát cắt khối tổng hợp (xem aggregates.py)
+    
     Returns:
         Dictionary chứa các thống kê
     """
     if df.empty:
         return {}
     
+    totals = group_agg(df, None, {
+        'avg_temp': ('temp_mean', 'mean'),
+        'max_temp': ('temp_max', 'max'),
+        'min_temp': ('temp_min', 'min'),
+        'avg_humidity': ('humidity', 'mean'),
+        'total_rainfall': ('rainfall', 'sum'),
+        'avg_rainfall': ('rainfall', 'mean'),
+        'avg_windspeed': ('windspeed', 'mean'),
+    })
+    by_city = group_agg(df, ['city'], {
+        'temp_mean': ('temp_mean', 'mean'),
+        'rainfall': ('rainfall', 'sum'),
+    })
+    
     stats = {
-        'avg_temp': df['temp_mean'].mean(),
-        'max_temp': df['temp_max'].max(),
-        'min_temp': df['temp_min'].min(),
-        'avg_humidity': df['humidity'].mean(),
-        'total_rainfall': df['rainfall'].sum(),
-        'avg_rainfall': df['rainfall'].mean(),
-        'avg_windspeed': df['windspeed'].mean(),
-        'hottest_city': df.groupby('city')['temp_mean'].mean().idxmax(),
-        'coldest_city': df.groupby('city')['temp_mean'].mean().idxmin(),
-        'rainiest_city': df.groupby('city')['rainfall'].sum().idxmax(),
-        'driest_city': df.groupby('city')['rainfall'].sum().idxmin(),
+        **totals.to_dict(),
+        'hottest_city': by_city['temp_mean'].idxmax(),
+        'coldest_city': by_city['temp_mean'].idxmin(),
+        'rainiest_city': by_city['rainfall'].idxmax(),
+        'driest_city': by_city['rainfall'].idxmin(),
     }
     
     return stats
\ No newline at end of file
@@ -0,0 +1,244 @@
+"""
+Chỉ mục lọc dữ liệu theo thành phố, ngày và mùa
+
+Bộ dữ liệu được giữ sắp xếp theo (thành phố, ngày). Mỗi thành phố là một
+đoạn liên tục, nên lọc theo thành phố + khoảng ngày chỉ cần tìm nhị phân
+trong đoạn của từng thành phố; lọc theo mùa dùng danh sách vị trí dòng
+của từng mùa đã tính sẵn. Không tạo mask dài bằng toàn bộ dữ liệu.
+
+PartitionedIndex có cùng giao diện nhưng không giữ dữ liệu trong bộ nhớ:
+mỗi lần lọc chỉ đọc các phân vùng (thành phố, năm) của phiên bản đã công bố.
+"""
+
+import numpy as np
+import pandas as pd
+
+from data_fetcher import SEASON_CODE_BY_MONTH, SEASONS
+from data_store import read_published, read_published_meta
+
+
+def normalize_filter(known_cities, first, last, cities=None, date_range=None, season=None):
+    """
+    Dạng chuẩn của bộ lọc, dùng làm khoá cache
+
+    Các bộ lọc cho cùng kết quả có cùng dạng chuẩn: thứ tự thành phố không
+    quan trọng, chọn tất cả = không lọc, khoảng ngày được cắt theo dữ liệu.
+
+    Args:
+        known_cities: Các thành phố có trong dữ liệu
+        first, last: Ngày đầu / ngày cuối của dữ liệu (None nếu rỗng)
+
+    Returns:
+        Tuple (thành phố, (ngày đầu, ngày cuối), mùa)
+    """
+    names = tuple(sorted({c for c in cities if c in known_cities})) if cities else None
+    if names is not None and len(names) == len(known_cities):
+        names = None
+
+    dates = None
+    if date_range and first is not None:
+        first, last = pd.Timestamp(first), pd.Timestamp(last)
+        start = max(pd.Timestamp(date_range[0]), first)
+        end = min(pd.Timestamp(date_range[1]), last)
+        if (start, end) != (first, last):
+            dates = (start.isoformat(), end.isoformat())
+
+    return names, dates, None if season in (None, '', 'Tất cả') else season
+
+
+class FilterIndex:
+    """
+    Chỉ mục (thành phố, ngày, mùa) của một DataFrame bất biến
+
+    Tạo một lần cho mỗi phiên bản dữ liệu (O(n)), sau đó mỗi lần lọc chỉ
+    tốn O(số thành phố x log n + số dòng kết quả).
+
+    Attributes:
+        df: DataFrame đã sắp xếp theo (thành phố, ngày); chính là DataFrame
+            truyền vào nếu nó đã được sắp xếp sẵn
+        city_bounds: Dict tên thành phố -> (vị trí đầu, vị trí cuối + 1)
+    """
+
+    def __init__(self, df):
+        codes, cities = self._city_codes(df['city'])
+        dates = self._date_values(df['date'])
+
+        # Sắp xếp lại nếu thành phố không liền khối hoặc ngày không tăng dần
+        if not self._is_sorted(codes, dates):
+            order = np.lexsort((dates, codes))
+            df = df.iloc[order].reset_index(drop=True)
+            codes, dates = codes[order], dates[order]
+
+        self.df = df
+        self.dates = dates
+
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.array([], dtype=int)
+        stops = np.r_[starts[1:], len(codes)]
+        self.city_bounds = {
+            cities[code]: (int(start), int(stop))
+            for code, start, stop in zip(codes[starts], starts, stops)
+            if code >= 0
+        }
+
+        # Vị trí dòng (tăng dần) của từng mùa
+        self.season_positions = {}
+        if 'season' in df.columns:
+            season_codes, seasons = self._city_codes(df['season'])
+            for code, season in enumerate(seasons):
+                self.season_positions[season] = np.flatnonzero(season_codes == code)
+
+    @staticmethod
+    def _city_codes(col):
+        """Mã số nguyên của một cột phân loại và danh sách giá trị tương ứng"""
+        if isinstance(col.dtype, pd.CategoricalDtype):
+            return col.cat.codes.to_numpy(), list(col.cat.categories)
+        codes, uniques = pd.factorize(col, sort=False)
+        return codes, list(uniques)
+
+    @staticmethod
+    def _date_values(col):
+        """Ngày dạng int64 (nano giây) để tìm nhị phân"""
+        return col.to_numpy().astype('datetime64[ns]', copy=False).view('i8')
+
+    @staticmethod
+    def _is_sorted(codes, dates):
+        if len(codes) < 2:
+            return True
+        boundary = codes[1:] != codes[:-1]
+        # Mỗi thành phố chỉ xuất hiện trong một đoạn liên tục
+        if boundary.sum() + 1 != len(np.unique(codes)):
+            return False
+        return bool(np.all((dates[1:] >= dates[:-1]) | boundary))
+
+    def __len__(self):
+        return len(self.df)
+
+    @property
+    def first_date(self):
+        return pd.Timestamp(self.dates.min()) if len(self.dates) else None
+
+    @property
+    def last_date(self):
+        return pd.Timestamp(self.dates.max()) if len(self.dates) else None
+
+    def normalize(self, cities=None, date_range=None, season=None):
+        """Dạng chuẩn của bộ lọc, dùng làm khoá cache (xem normalize_filter)"""
+        return normalize_filter(self.city_bounds, self.first_date, self.last_date, cities, date_range, season)
+
+    def city_ranges(self, cities=None, date_range=None):
+        """
+        Đoạn vị trí [đầu, cuối) của từng thành phố trong khoảng ngày
+
+        Returns:
+            List (tên thành phố, đầu, cuối), sắp xếp theo vị trí; đoạn có thể rỗng
+        """
+        names = self.city_bounds if not cities else [c for c in cities if c in self.city_bounds]
+        bounds = sorted((self.city_bounds[name], name) for name in names)
+
+        if not date_range:
+            return [(name, lo, hi) for (lo, hi), name in bounds]
+
+        start, end = date_range
+        start_ns = pd.Timestamp(start).as_unit('ns').value
+        end_ns = pd.Timestamp(end).as_unit('ns').value
+        result = []
+        for (lo, hi), name in bounds:
+            city_dates = self.dates[lo:hi]
+            result.append((
+                name,
+                lo + int(np.searchsorted(city_dates, start_ns, side='left')),
+                lo + int(np.searchsorted(city_dates, end_ns, side='right')),
+            ))
+        return result
+
+    def ranges(self, cities=None, date_range=None):
+        """
+        Các đoạn vị trí [đầu, cuối) thoả điều kiện thành phố và khoảng ngày
+
+        Các đoạn liền kề được gộp lại, sắp xếp theo vị trí.
+        """
+        merged = []
+        for _, lo, hi in self.city_ranges(cities, date_range):
+            if hi <= lo:
+                continue
+            if merged and merged[-1][1] == lo:
+                merged[-1] = (merged[-1][0], hi)
+            else:
+                merged.append((lo, hi))
+        return merged
+
+    def select(self, cities=None, date_range=None, season=None):
+        """
+        Lọc dữ liệu
+
+        Args:
+            cities: List thành phố cần lọc (None/rỗng = tất cả)
+            date_range: Tuple (start_date, end_date), bao gồm hai đầu
+            season: Mùa cần lọc ('Tất cả' hoặc None = không lọc)
+
+        Returns:
+            DataFrame: lát cắt của self.df nếu kết quả là một đoạn liên tục,
+            nếu không thì chỉ sao chép các dòng được chọn
+        """
+        ranges = self.ranges(cities, date_range)
+
+        if season and season != 'Tất cả':
+            season_pos = self.season_positions.get(season, np.array([], dtype=np.intp))
+            positions = [
+                season_pos[np.searchsorted(season_pos, lo):np.searchsorted(season_pos, hi)]
+                for lo, hi in ranges
+            ]
+            return self.df.take(np.concatenate(positions) if positions else [])
+
+        if not ranges:
+            return self.df.iloc[0:0]
+        if len(ranges) == 1:
+            lo, hi = ranges[0]
+            return self.df if (lo, hi) == (0, len(self.df)) else self.df.iloc[lo:hi]
+        return self.df.take(np.concatenate([np.arange(lo, hi) for lo, hi in ranges]))
+
+
+class PartitionedIndex:
+    """
+    Chỉ mục lọc đọc lười trên một phiên bản đã công bố
+
+    Chỉ giữ metadata (danh sách thành phố, khoảng ngày, số dòng), nên thời
+    gian khởi động và bộ nhớ không phụ thuộc độ dài lịch sử đã lưu. Mỗi lần
+    select chỉ đọc các phân vùng (thành phố, năm) giao với bộ lọc; ngày và
+    tháng của mùa được đẩy xuống khi quét file.
+    """
+
+    def __init__(self, version):
+        meta = read_published_meta(version)
+        self.version = version
+        self.cities = list(meta.get('cities') or [])
+        self.rows = int(meta.get('rows', 0))
+        first = meta.get('first_date') or meta.get('start_date')
+        last = meta.get('last_date') or meta.get('end_date')
+        self.first_date = pd.Timestamp(first) if first and self.rows else None
+        self.last_date = pd.Timestamp(last) if last and self.rows else None
+
+    def __len__(self):
+        return self.rows
+
+    def normalize(self, cities=None, date_range=None, season=None):
+        """Dạng chuẩn của bộ lọc, dùng làm khoá cache (xem normalize_filter)"""
+        return normalize_filter(self.cities, self.first_date, self.last_date, cities, date_range, season)
+
+    def select(self, cities=None, date_range=None, season=None):
+        """
+        Lọc dữ liệu, chỉ đọc các phân vùng cần thiết
+
+        Args:
+            cities: List thành phố cần lọc (None/rỗng = tất cả)
+            date_range: Tuple (start_date, end_date), bao gồm hai đầu
+            season: Mùa cần lọc ('Tất cả' hoặc None = không lọc)
+
+        Returns:
+            DataFrame sắp xếp theo (thành phố, ngày)
+        """
+        start, end = date_range if date_range else (None, None)
+        months = None
+        if season and season != 'Tất cả':
+            months = [m for m in range(1, 13) if SEASONS[SEASON_CODE_BY_MONTH[m]] == season]
+        return read_published(self.version, cities or None, start, end, months)
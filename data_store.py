@@ -0,0 +1,436 @@
+"""
+Module lưu trữ dữ liệu thời tiết cục bộ dạng Parquet
+
+Dữ liệu thô được phân vùng theo thành phố và năm:
+    data/daily/city=<tên thành phố>/year=<năm>/part-0.parquet
+(dữ liệu theo giờ nằm trong data/hourly/ với cùng cách phân vùng, cột date là giờ)
+
+Bộ dữ liệu hoàn chỉnh (đã có đặc trưng) được công bố thành các phiên bản bất biến,
+cũng phân vùng theo thành phố và năm để đọc lười từng phần:
+    data/published/<phiên bản>/dataset/city=<tên>/year=<năm>/part-0.parquet
+    data/published/<phiên bản>/meta.json (và các file kèm theo)
+    data/published/<phiên bản>/dataset.arrow (tuỳ chọn, Arrow IPC để ánh xạ bộ nhớ)
+    data/published/LATEST  (tên phiên bản mới nhất)
+Phiên bản cũ ghi một file dataset.parquet vẫn đọc được.
+"""
+
+import json
+import os
+import shutil
+from datetime import datetime, timezone
+from urllib.parse import quote, unquote
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# CONSTANTS
+DATA_DIR = os.environ.get(
+    'WEATHER_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+)
+DAILY_STORE = 'daily'
+HOURLY_STORE = 'hourly'
+PUBLISHED_DIR = 'published'
+LATEST_FILE = 'LATEST'
+DATASET_FILE = 'dataset.parquet'
+DATASET_DIR = 'dataset'
+ARROW_FILE = 'dataset.arrow'
+META_FILE = 'meta.json'
+
+PART_FILE = 'part-0.parquet'
+PARTITIONING = ds.partitioning(
+    pa.schema([('city', pa.string()), ('year', pa.int32())]),
+    flavor='hive'
+)
+
+
+# HELPER FUNCTIONS
+def store_path(store=DAILY_STORE):
+    """Thư mục gốc của một store"""
+    return os.path.join(DATA_DIR, store)
+
+
+def _city_dir(city, store=DAILY_STORE):
+    return os.path.join(store_path(store), f'city={quote(city, safe="")}')
+
+
+def _partition_file(city, year, store=DAILY_STORE):
+    return os.path.join(_city_dir(city, store), f'year={year}', PART_FILE)
+
+
+def _city_years(city, store=DAILY_STORE):
+    """Danh sách năm đã lưu của một thành phố (tăng dần)"""
+    city_dir = _city_dir(city, store)
+    if not os.path.isdir(city_dir):
+        return []
+
+    years = []
+    for name in os.listdir(city_dir):
+        if name.startswith('year=') and os.path.exists(os.path.join(city_dir, name, PART_FILE)):
+            years.append(int(name[len('year='):]))
+    return sorted(years)
+
+
+def _file_date_range(path):
+    """Ngày nhỏ nhất / lớn nhất của một file, đọc từ metadata Parquet"""
+    metadata = pq.ParquetFile(path).metadata
+    date_idx = metadata.schema.to_arrow_schema().get_field_index('date')
+
+    first, last = None, None
+    for i in range(metadata.num_row_groups):
+        stats = metadata.row_group(i).column(date_idx).statistics
+        if stats is None or not stats.has_min_max:
+            continue
+        first = stats.min if first is None else min(first, stats.min)
+        last = stats.max if last is None else max(last, stats.max)
+    return pd.Timestamp(first) if first is not None else None, pd.Timestamp(last) if last is not None else None
+
+
+def _partition_files(cities=None, start_date=None, end_date=None, store=DAILY_STORE):
+    """
+    Các file phân vùng (thành phố, năm) giao với bộ lọc
+
+    Chỉ liệt kê thư mục của các thành phố được chọn, không quét toàn bộ
+    store, nên chi phí theo số phân vùng cần đọc chứ không theo độ dài lịch sử.
+    """
+    if cities is None:
+        root = store_path(store)
+        cities = sorted(unquote(name[len('city='):]) for name in os.listdir(root) if name.startswith('city='))
+    first = pd.Timestamp(start_date).year if start_date is not None else None
+    last = pd.Timestamp(end_date).year if end_date is not None else None
+
+    return [
+        _partition_file(city, year, store)
+        for city in cities
+        for year in _city_years(city, store)
+        if (first is None or year >= first) and (last is None or year <= last)
+    ]
+
+
+def _open_partitions(cities=None, start_date=None, end_date=None, store=DAILY_STORE):
+    """pyarrow Dataset chỉ gồm các file phân vùng cần đọc (None nếu không có file nào)"""
+    files = _partition_files(cities, start_date, end_date, store)
+    if not files:
+        return None
+    return ds.dataset(files, format='parquet', partitioning=PARTITIONING, partition_base_dir=store_path(store))
+
+
+def _filter_expression(cities=None, start_date=None, end_date=None, months=None, partitioned=True):
+    """
+    Biểu thức lọc của pyarrow (đẩy xuống khi quét): thành phố, khoảng ngày, tháng
+
+    Với dữ liệu phân vùng, điều kiện theo năm giúp bỏ qua cả các file không cần đọc.
+    """
+    filters = []
+    if cities is not None:
+        filters.append(ds.field('city').isin(list(cities)))
+    if start_date is not None:
+        start = pd.Timestamp(start_date)
+        if partitioned:
+            filters.append(ds.field('year') >= start.year)
+        filters.append(ds.field('date') >= pa.scalar(start.to_pydatetime(), pa.timestamp('ns')))
+    if end_date is not None:
+        end = pd.Timestamp(end_date)
+        if partitioned:
+            filters.append(ds.field('year') <= end.year)
+        filters.append(ds.field('date') <= pa.scalar(end.to_pydatetime(), pa.timestamp('ns')))
+    if months is not None:
+        filters.append(ds.field('month').isin(list(months)))
+
+    expression = None
+    for f in filters:
+        expression = f if expression is None else expression & f
+    return expression
+
+
+def _write_atomic(table, path):
+    """Ghi file Parquet ra file tạm rồi đổi tên, tránh để lại file hỏng"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f'{path}.tmp-{os.getpid()}'
+    pq.write_table(table, tmp_path)
+    os.replace(tmp_path, path)
+
+
+# READ
+def stored_date_ranges(cities, store=DAILY_STORE):
+    """
+    Khoảng ngày đã lưu của từng thành phố
+
+    Chỉ đọc metadata của phân vùng năm đầu và năm cuối, không đọc dữ liệu.
+
+    Args:
+        cities: Danh sách tên thành phố
+
+    Returns:
+        Dict tên thành phố -> (ngày đầu, ngày cuối); bỏ qua thành phố chưa có dữ liệu
+    """
+    ranges = {}
+    for city in cities:
+        years = _city_years(city, store)
+        if not years:
+            continue
+        first, _ = _file_date_range(_partition_file(city, years[0], store))
+        _, last = _file_date_range(_partition_file(city, years[-1], store))
+        if first is not None and last is not None:
+            ranges[city] = (first, last)
+    return ranges
+
+
+def read_store(cities=None, start_date=None, end_date=None, columns=None, store=DAILY_STORE):
+    """
+    Đọc dữ liệu từ store, chỉ quét các phân vùng cần thiết
+
+    Args:
+        cities: List thành phố cần đọc (None = tất cả)
+        start_date: Ngày bắt đầu (bao gồm)
+        end_date: Ngày kết thúc (bao gồm)
+        columns: Các cột cần đọc (None = tất cả), luôn kèm 'city' và 'date'
+
+    Returns:
+        DataFrame có cột city, date và các cột dữ liệu
+    """
+    if not os.path.isdir(store_path(store)):
+        return pd.DataFrame()
+
+    dataset = _open_partitions(cities, start_date, end_date, store)
+    if dataset is None:
+        return pd.DataFrame()
+    expression = _filter_expression(cities, start_date, end_date)
+
+    if columns is None:
+        columns = [name for name in dataset.schema.names if name != 'year']
+    else:
+        columns = ['city', 'date'] + [col for col in columns if col not in ('city', 'date')]
+
+    table = dataset.to_table(columns=columns, filter=expression)
+    return table.to_pandas()
+
+
+# WRITE
+def append_to_store(df, store=DAILY_STORE):
+    """
+    Ghi thêm dữ liệu mới vào store
+
+    Chỉ các phân vùng (thành phố, năm) có dữ liệu mới được ghi lại;
+    ngày trùng được thay bằng dữ liệu mới.
+
+    Args:
+        df: DataFrame có cột city, date và các cột dữ liệu
+    """
+    if df.empty:
+        return
+
+    years = df['date'].dt.year
+    for (city, year), part in df.groupby([df['city'], years], sort=False, observed=True):
+        path = _partition_file(city, year, store)
+        part = part.drop(columns='city')
+
+        if os.path.exists(path):
+            existing = pq.read_table(path).to_pandas()
+            part = pd.concat([existing, part], ignore_index=True)
+            part = part.drop_duplicates(subset='date', keep='last')
+
+        part = part.sort_values('date').reset_index(drop=True)
+        _write_atomic(pa.Table.from_pandas(part, preserve_index=False), path)
+
+
+# PUBLISHED VERSIONS
+def published_path(version=None):
+    """Thư mục chứa các phiên bản đã công bố (hoặc của một phiên bản)"""
+    root = os.path.join(DATA_DIR, PUBLISHED_DIR)
+    return root if version is None else os.path.join(root, version)
+
+
+def latest_version():
+    """
+    Phiên bản mới nhất đã công bố
+
+    Returns:
+        Tên phiên bản hoặc None nếu chưa công bố phiên bản nào
+    """
+    try:
+        with open(os.path.join(published_path(), LATEST_FILE), encoding='utf-8') as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version if version and os.path.isdir(published_path(version)) else None
+
+
+def read_published(version, cities=None, start_date=None, end_date=None, months=None, columns=None):
+    """
+    Đọc DataFrame (hoặc một phần) của một phiên bản đã công bố
+
+    Chỉ các phân vùng (thành phố, năm) giao với bộ lọc được đọc; điều kiện
+    ngày và tháng được đẩy xuống khi quét từng file.
+
+    Args:
+        cities: List thành phố (None = tất cả)
+        start_date, end_date: Khoảng ngày, bao gồm hai đầu (None = không giới hạn)
+        months: List tháng cần đọc (None = tất cả)
+        columns: Các cột cần đọc (None = tất cả)
+
+    Returns:
+        DataFrame sắp xếp theo (thành phố, ngày); city dạng category theo thứ tự
+        danh mục địa điểm lúc công bố
+    """
+    path = published_path(version)
+    partitioned = os.path.isdir(os.path.join(path, DATASET_DIR))
+    if partitioned:
+        # Cùng cách phân vùng với store: dùng chung cách chọn file theo thành phố và năm
+        dataset = _open_partitions(cities, start_date, end_date, os.path.join(PUBLISHED_DIR, version, DATASET_DIR))
+        if dataset is None:
+            return pd.DataFrame()
+    else:
+        dataset = ds.dataset(os.path.join(path, DATASET_FILE), format='parquet')
+
+    if columns is not None:
+        columns = ['city', 'date'] + [col for col in columns if col not in ('city', 'date')]
+    elif partitioned:
+        columns = ['city'] + [name for name in dataset.schema.names if name not in ('city', 'year')]
+
+    table = dataset.to_table(
+        columns=columns,
+        filter=_filter_expression(cities, start_date, end_date, months, partitioned)
+    )
+    df = table.to_pandas()
+    if not partitioned or df.empty:
+        return df
+
+    # Cột city lấy từ tên thư mục: khôi phục category theo danh mục lúc công bố
+    categories = read_published_meta(version).get('cities')
+    categories = categories or sorted(df['city'].unique())
+    df['city'] = pd.Categorical(df['city'], categories=categories)
+
+    codes = df['city'].cat.codes.to_numpy()
+    dates = df['date'].to_numpy()
+    if np.any((codes[1:] < codes[:-1]) | ((codes[1:] == codes[:-1]) & (dates[1:] < dates[:-1]))):
+        order = np.lexsort((dates, codes))
+        df = df.iloc[order].reset_index(drop=True)
+    return df
+
+
+def published_files(version, cities=None, start_date=None, end_date=None):
+    """
+    Các file Parquet của một phiên bản đã công bố giao với bộ lọc
+
+    Phiên bản phân vùng: các file (thành phố, năm) như read_published; phiên
+    bản cũ: file dataset.parquet duy nhất.
+    """
+    path = published_path(version)
+    if not os.path.isdir(os.path.join(path, DATASET_DIR)):
+        return [os.path.join(path, DATASET_FILE)]
+    return _partition_files(cities, start_date, end_date, os.path.join(PUBLISHED_DIR, version, DATASET_DIR))
+
+
+def write_arrow(df, path):
+    """
+    Ghi DataFrame ra file Arrow IPC (Feather v2) không nén, một record batch
+
+    Số đo giữ NaN thay vì null nên khi ánh xạ bộ nhớ, pandas dùng thẳng vùng
+    nhớ của file cho mọi cột số mà không sao chép.
+    """
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_floating(field.type):
+            table = table.set_column(i, field, pa.array(df[field.name].to_numpy(), from_pandas=False))
+    with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table, max_chunksize=max(len(df), 1))
+
+
+def map_published(version):
+    """
+    DataFrame của một phiên bản đã công bố, ánh xạ bộ nhớ (chỉ đọc) từ ARROW_FILE
+
+    Các cột trỏ thẳng vào file: trang dữ liệu nằm trong page cache của hệ điều
+    hành, mọi tiến trình ánh xạ cùng phiên bản dùng chung một bản vật lý.
+    DataFrame chỉ đọc; lọc bằng take/iloc tạo bản sao nhỏ như bình thường.
+
+    Returns:
+        DataFrame (giữ thứ tự dòng lúc ghi) hoặc None nếu phiên bản không có file Arrow
+    """
+    path = os.path.join(published_path(version), ARROW_FILE)
+    if not os.path.exists(path):
+        return None
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    return table.to_pandas(split_blocks=True)
+
+
+def read_published_meta(version):
+    """Đọc metadata (meta.json) của một phiên bản đã công bố"""
+    with open(os.path.join(published_path(version), META_FILE), encoding='utf-8') as f:
+        return json.load(f)
+
+
+def publish_dataset(df, meta=None, attachments=None):
+    """
+    Công bố một phiên bản dữ liệu mới (bất biến)
+
+    Ghi vào thư mục tạm, đổi tên thành thư mục phiên bản rồi mới cập nhật
+    LATEST, nên người đọc luôn thấy một phiên bản hoàn chỉnh.
+
+    Args:
+        df: DataFrame hoàn chỉnh
+        meta: Dict thông tin thêm ghi vào meta.json
+        attachments: Dict tên file -> hàm ghi file đó (nhận đường dẫn), ghi
+            cùng thư mục phiên bản (ví dụ trạng thái thống kê luỹ tiến)
+
+    Returns:
+        Tên phiên bản vừa công bố
+    """
+    created_at = datetime.now(timezone.utc)
+    version = created_at.strftime('%Y%m%dT%H%M%S%fZ')
+    root = published_path()
+    os.makedirs(root, exist_ok=True)
+
+    tmp_dir = os.path.join(root, f'.tmp-{version}-{os.getpid()}')
+    os.makedirs(tmp_dir)
+
+    # Phân vùng theo (thành phố, năm) như store, để người đọc chỉ mở những file cần
+    table = pa.Table.from_pandas(
+        df.assign(city=df['city'].astype(str), year=df['date'].dt.year.astype('int32')),
+        preserve_index=False
+    )
+    ds.write_dataset(
+        table, os.path.join(tmp_dir, DATASET_DIR), format='parquet',
+        partitioning=PARTITIONING, basename_template='part-{i}.parquet',
+        max_partitions=1 << 20, max_rows_per_group=1 << 20
+    )
+    with open(os.path.join(tmp_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump({
+            'version': version,
+            'created_at': created_at.isoformat(),
+            'rows': len(df),
+            'first_date': df['date'].min().strftime('%Y-%m-%d') if len(df) else None,
+            'last_date': df['date'].max().strftime('%Y-%m-%d') if len(df) else None,
+            **(meta or {}),
+        }, f, ensure_ascii=False, indent=2)
+    for name, write in (attachments or {}).items():
+        write(os.path.join(tmp_dir, name))
+    os.rename(tmp_dir, published_path(version))
+
+    latest_tmp = os.path.join(root, f'{LATEST_FILE}.tmp-{os.getpid()}')
+    with open(latest_tmp, 'w', encoding='utf-8') as f:
+        f.write(version)
+    os.replace(latest_tmp, os.path.join(root, LATEST_FILE))
+
+    return version
+
+
+def prune_versions(keep=3):
+    """Xoá các phiên bản cũ, giữ lại `keep` phiên bản mới nhất (luôn giữ LATEST)"""
+    root = published_path()
+    if not os.path.isdir(root):
+        return []
+
+    latest = latest_version()
+    versions = sorted(
+        name for name in os.listdir(root)
+        if not name.startswith('.') and os.path.isdir(os.path.join(root, name))
+    )
+    removed = [v for v in versions[:-keep] if v != latest] if keep > 0 else []
+    for version in removed:
+        shutil.rmtree(published_path(version), ignore_errors=True)
+    return removed
@@ -0,0 +1,190 @@
+"""
+Tóm tắt phân phối phía server cho histogram, box plot và violin plot
+
+Thay vì gửi mọi dòng xuống trình duyệt để plotly.js tự chia bin, tính tứ phân
+vị và ước lượng mật độ (KDE), các hàm ở đây tính sẵn bằng NumPy cho mọi nhóm
+trong một lần sắp xếp:
+    - histogram: số đếm theo bin
+    - box: tứ phân vị, râu (1.5 IQR như plotly), trung bình và điểm ngoại lai
+    - violin: đường mật độ KDE Gauss trên lưới điểm cố định
+Dữ liệu gửi xuống trình duyệt tỉ lệ với số bin x số nhóm thay vì số dòng.
+"""
+
+import numpy as np
+
+# CONSTANTS
+# Râu của box dài tối đa WHISKER_IQR x IQR kể từ Q1/Q3 (giống plotly)
+WHISKER_IQR = 1.5
+# Số điểm ngoại lai tối đa gửi đi cho mỗi nhóm (giữ đều theo thứ tự, gồm hai đầu)
+MAX_OUTLIERS = 200
+# Số điểm của đường mật độ mỗi violin
+KDE_POINTS = 100
+
+
+# HELPER FUNCTIONS
+def _sorted_groups(df, value_col, by):
+    """
+    Giá trị (bỏ NaN) sắp xếp theo (nhóm, giá trị)
+
+    Returns:
+        Tuple (giá trị đã sắp xếp, mã nhóm tương ứng, vị trí bắt đầu và số giá
+        trị của từng nhóm, DataFrame khoá nhóm theo thứ tự category/giá trị)
+    """
+    df = df[df[value_col].notna()]
+    grouped = df.groupby(by, observed=True, sort=True)
+    codes = grouped.ngroup().to_numpy()
+    keys = grouped.size().index.to_frame(index=False)
+
+    values = df[value_col].to_numpy(dtype='float64')
+    order = np.lexsort((values, codes))
+    values, codes = values[order], codes[order]
+    counts = np.bincount(codes, minlength=len(keys))
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    return values, codes, starts, counts, keys
+
+
+def _quantile(values, starts, counts, q):
+    """Phân vị q của từng nhóm (nội suy tuyến tính như np.quantile)"""
+    pos = starts + q * (counts - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, starts + counts - 1)
+    return values[lo] + (pos - lo) * (values[hi] - values[lo])
+
+
+def _thin(codes, keep_per_group):
+    """Mask giữ tối đa keep_per_group phần tử mỗi nhóm (codes đã sắp xếp), cách đều, gồm hai đầu"""
+    counts = np.bincount(codes)
+    starts = np.r_[0, np.cumsum(counts)[:-1]]
+    rank = np.arange(len(codes)) - starts[codes]
+    step = np.maximum(1, -(-counts // keep_per_group))[codes]
+    return (rank % step == 0) | (rank == counts[codes] - 1)
+
+
+def _box_stats(groups, value_col, max_outliers):
+    """box_stats trên kết quả _sorted_groups"""
+    values, codes, starts, counts, keys = groups
+    stats = keys.copy()
+    stats['n'] = counts
+    if len(values) == 0:
+        for col in ('mean', 'std', 'q1', 'median', 'q3', 'lowerfence', 'upperfence', 'min', 'max'):
+            stats[col] = np.array([], dtype='float64')
+        return stats, keys.assign(**{value_col: np.array([], dtype='float64')})
+
+    mean = np.add.reduceat(values, starts) / counts
+    sq = np.add.reduceat((values - mean[codes]) ** 2, starts)
+    stats['mean'] = mean
+    stats['std'] = np.sqrt(sq / np.maximum(counts - 1, 1))
+    q1 = _quantile(values, starts, counts, 0.25)
+    q3 = _quantile(values, starts, counts, 0.75)
+    stats['q1'] = q1
+    stats['median'] = _quantile(values, starts, counts, 0.5)
+    stats['q3'] = q3
+
+    # Râu: giá trị xa nhất còn nằm trong [Q1 - 1.5 IQR, Q3 + 1.5 IQR]
+    iqr = q3 - q1
+    low_limit = (q1 - WHISKER_IQR * iqr)[codes]
+    high_limit = (q3 + WHISKER_IQR * iqr)[codes]
+    inside = (values >= low_limit) & (values <= high_limit)
+    stats['lowerfence'] = np.minimum.reduceat(np.where(inside, values, np.inf), starts)
+    stats['upperfence'] = np.maximum.reduceat(np.where(inside, values, -np.inf), starts)
+    stats['min'] = values[starts]
+    stats['max'] = values[starts + counts - 1]
+
+    outside = np.flatnonzero(~inside)
+    outside = outside[_thin(codes[outside], max_outliers)] if len(outside) else outside
+    outliers = keys.iloc[codes[outside]].reset_index(drop=True)
+    outliers[value_col] = values[outside]
+    return stats, outliers
+
+
+def _kde(groups, stats, n_points):
+    """Đường mật độ của từng nhóm trên kết quả _sorted_groups (xem violin_stats)"""
+    values, codes, _, counts, _ = groups
+    if len(values) == 0:
+        empty = np.empty((len(stats), n_points))
+        return empty, empty
+
+    std = stats['std'].to_numpy()
+    spread = np.minimum(std, (stats['q3'] - stats['q1']).to_numpy() / 1.349)
+    spread = np.where(spread > 0, spread, std)
+    bandwidth = 1.059 * spread * counts.astype('float64') ** -0.2
+    # Nhóm chỉ có một giá trị lặp lại: băng thông nhỏ để vẫn vẽ được
+    bandwidth = np.where(bandwidth > 0, bandwidth, 1e-3 * (np.abs(stats['median'].to_numpy()) + 1))
+
+    lo = stats['min'].to_numpy() - 2 * bandwidth
+    hi = stats['max'].to_numpy() + 2 * bandwidth
+    step = (hi - lo) / (n_points - 1)
+    grid = lo[:, None] + step[:, None] * np.arange(n_points)
+
+    # Chia tuyến tính mỗi giá trị vào hai điểm lưới kề nhau
+    pos = (values - lo[codes]) / step[codes]
+    left = np.clip(np.floor(pos).astype(np.int64), 0, n_points - 2)
+    frac = pos - left
+    flat = codes * n_points + left
+    size = len(stats) * n_points
+    weights = np.bincount(flat, 1 - frac, minlength=size) + np.bincount(flat + 1, frac, minlength=size)
+    weights = weights.reshape(len(stats), n_points)
+
+    # Nhân Gauss trên lưới: khoảng cách giữa hai điểm lưới là (j - k) x step
+    offsets = np.arange(n_points)[:, None] - np.arange(n_points)[None, :]
+    kernel = np.exp(-0.5 * (offsets[None, :, :] * (step / bandwidth)[:, None, None]) ** 2)
+    density = np.einsum('gjk,gk->gj', kernel, weights)
+    density /= (counts * bandwidth * np.sqrt(2 * np.pi))[:, None]
+    return grid, density
+
+
+# PUBLIC API
+def histogram_counts(values, nbins=30):
+    """
+    Số đếm theo nbins bin đều nhau trên khoảng [min, max] của values
+
+    Returns:
+        Tuple (mép bin (nbins + 1), số đếm (nbins)); rỗng nếu không có giá trị
+    """
+    values = np.asarray(values, dtype='float64')
+    values = values[~np.isnan(values)]
+    if values.size == 0:
+        return np.array([]), np.array([], dtype=np.int64)
+    counts, edges = np.histogram(values, bins=nbins)
+    return edges, counts
+
+
+def box_stats(df, value_col, by, max_outliers=MAX_OUTLIERS):
+    """
+    Thống kê box plot của value_col theo từng nhóm by
+
+    Args:
+        df: DataFrame (dữ liệu ngày)
+        value_col: Cột giá trị
+        by: List cột nhóm
+        max_outliers: Số điểm ngoại lai tối đa giữ lại mỗi nhóm
+
+    Returns:
+        Tuple (DataFrame mỗi nhóm một dòng: các cột by, n, mean, std, q1,
+        median, q3, lowerfence, upperfence, min, max;
+        DataFrame điểm ngoại lai: các cột by và value_col)
+    """
+    return _box_stats(_sorted_groups(df, value_col, by), value_col, max_outliers)
+
+
+def violin_stats(df, value_col, by, n_points=KDE_POINTS, max_outliers=MAX_OUTLIERS):
+    """
+    Thống kê box plot kèm đường mật độ KDE Gauss của value_col theo từng nhóm by
+
+    Băng thông theo quy tắc Silverman như plotly
+    (1.059 x min(std, IQR / 1.349) x n^-1/5); lưới trải từ min - 2 băng thông
+    tới max + 2 băng thông (spanmode 'soft'). Giá trị được chia tuyến tính
+    vào các điểm lưới rồi nhân chập với nhân Gauss, nên chi phí tỉ lệ với số
+    dòng + số nhóm x n_points^2.
+
+    Args:
+        n_points: Số điểm lưới mỗi nhóm
+
+    Returns:
+        Tuple (thống kê và điểm ngoại lai như box_stats, lưới x (số nhóm,
+        n_points), mật độ (số nhóm, n_points)); các nhóm cùng thứ tự
+    """
+    groups = _sorted_groups(df, value_col, by)
+    stats, outliers = _box_stats(groups, value_col, max_outliers)
+    grid, density = _kde(groups, stats, n_points)
+    return stats, outliers, grid, density
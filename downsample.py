@@ -0,0 +1,161 @@
+"""
+Giảm số điểm của chuỗi thời gian trước khi vẽ
+
+Biểu đồ rộng W pixel không hiển thị được quá ~2 điểm mỗi pixel, nên mỗi chuỗi
+chỉ cần giữ một vài điểm trong mỗi khoảng thời gian ứng với một pixel:
+    - min-max: điểm nhỏ nhất và lớn nhất (giữ chính xác đỉnh và đáy)
+    - LTTB (Largest-Triangle-Three-Buckets): một điểm giữ hình dạng đường tốt nhất
+Dữ liệu gửi xuống trình duyệt bị chặn theo độ rộng biểu đồ thay vì theo
+số dòng.
+"""
+
+import numpy as np
+import pandas as pd
+
+# CONSTANTS
+# Độ rộng (pixel) mặc định của vùng vẽ, ứng với layout="wide"
+CHART_WIDTH_PX = 1200
+
+
+def _series_points(df, x_col, y_col, group_col=None, x_range=None):
+    """
+    Các điểm vẽ được (y khác NaN, trong x_range) của từng chuỗi
+
+    Returns:
+        Tuple (vị trí dòng trong df, x dạng float, y, mã chuỗi, số chuỗi)
+    """
+    x = df[x_col].to_numpy()
+    is_time = np.issubdtype(x.dtype, np.datetime64)
+    if is_time:
+        x = x.astype('datetime64[ns]').view('i8')
+    x = x.astype('float64')
+
+    y = df[y_col].to_numpy(dtype='float64', na_value=np.nan)
+    keep = ~np.isnan(y)
+    if x_range is not None:
+        lo, hi = (pd.Timestamp(v).as_unit('ns').value if is_time else float(v) for v in x_range)
+        keep &= (x >= lo) & (x <= hi)
+    positions = np.flatnonzero(keep)
+
+    if group_col is not None:
+        codes = pd.factorize(df[group_col])[0][positions].astype(np.int64)
+        n_series = int(codes.max()) + 1 if len(codes) else 0
+    else:
+        codes = np.zeros(len(positions), dtype=np.int64)
+        n_series = 1
+    return positions, x[positions], y[positions], codes, n_series
+
+
+def _buckets(xs, width):
+    """Khoảng pixel của từng điểm (dùng chung cho mọi chuỗi để các chuỗi thẳng hàng)"""
+    x_min, x_max = xs.min(), xs.max()
+    span = (x_max - x_min) or 1.0
+    return np.minimum(((xs - x_min) / span * width).astype(np.int64), width - 1)
+
+
+def minmax_downsample(df, x_col, y_col, group_col=None, width=CHART_WIDTH_PX, x_range=None):
+    """
+    Giữ điểm min và max của `y_col` trong mỗi khoảng pixel, theo từng chuỗi
+
+    Args:
+        df: DataFrame chứa chuỗi thời gian
+        x_col: Cột trục x (thời gian hoặc số)
+        y_col: Cột giá trị
+        group_col: Cột phân chuỗi (ví dụ 'city'), None = một chuỗi
+        width: Số khoảng (pixel) trên trục x
+        x_range: Tuple (đầu, cuối) vùng hiển thị; các điểm ngoài vùng bị bỏ
+
+    Returns:
+        DataFrame con của df (tối đa 2 x width điểm mỗi chuỗi), sắp xếp theo
+        (chuỗi, x); trả về df nếu không cần giảm
+    """
+    positions, xs, y, codes, n_series = _series_points(df, x_col, y_col, group_col, x_range)
+    if len(positions) <= 2 * width * max(n_series, 1):
+        return df if len(positions) == len(df) else df.iloc[positions]
+
+    buckets = _buckets(xs, width)
+
+    # Sắp theo (chuỗi, khoảng, giá trị): điểm đầu và cuối mỗi ô là min và max
+    keys = codes * width + buckets
+    order = np.lexsort((y, keys))
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    stops = np.r_[starts[1:], len(order)] - 1
+    picked = np.unique(np.concatenate([order[starts], order[stops]]))
+
+    # Giữ thứ tự (chuỗi, x) để vẽ đường
+    picked = picked[np.lexsort((xs[picked], codes[picked]))]
+    return df.iloc[positions[picked]]
+
+
+def lttb_downsample(df, x_col, y_col, group_col=None, width=CHART_WIDTH_PX, x_range=None):
+    """
+    Largest-Triangle-Three-Buckets: giữ một điểm mỗi khoảng pixel, theo từng chuỗi
+
+    Trong mỗi khoảng, chọn điểm tạo tam giác lớn nhất với điểm đã chọn ở
+    khoảng trước và trung bình của khoảng sau, nên giữ hình dạng đường tốt
+    với số điểm bằng một nửa min-max. Điểm đầu và cuối mỗi chuỗi luôn được
+    giữ. Mọi chuỗi được xử lý cùng lúc (một vòng lặp theo khoảng pixel).
+
+    Args:
+        Như minmax_downsample
+
+    Returns:
+        DataFrame con của df (tối đa width + 2 điểm mỗi chuỗi), sắp xếp theo
+        (chuỗi, x); trả về df nếu không cần giảm
+    """
+    positions, xs, ys, codes, n_series = _series_points(df, x_col, y_col, group_col, x_range)
+    if len(positions) <= (width + 2) * max(n_series, 1):
+        return df if len(positions) == len(df) else df.iloc[positions]
+
+    # x theo đơn vị pixel để diện tích không phụ thuộc đơn vị thời gian
+    x_min = xs.min()
+    xs = (xs - x_min) / ((xs.max() - x_min) or 1.0) * width
+    order = np.lexsort((xs, codes))
+    xs, ys, codes, positions = xs[order], ys[order], codes[order], positions[order]
+
+    series_start = np.searchsorted(codes, np.arange(n_series), side='left')
+    series_stop = np.searchsorted(codes, np.arange(n_series), side='right')
+    first, last = series_start, series_stop - 1
+    interior = np.ones(len(xs), dtype=bool)
+    interior[first[series_stop > series_start]] = False
+    interior[last[series_stop > series_start]] = False
+    buckets = np.minimum(xs.astype(np.int64), width - 1)
+
+    # Trung bình (x, y) của từng ô (chuỗi, khoảng); ô rỗng lấy ô khác rỗng kế tiếp,
+    # cuối chuỗi lấy điểm cuối
+    cell = codes * width + buckets
+    counts = np.bincount(cell[interior], minlength=n_series * width).reshape(n_series, width)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_x = (np.bincount(cell[interior], xs[interior], n_series * width).reshape(n_series, width) / counts)
+        mean_y = (np.bincount(cell[interior], ys[interior], n_series * width).reshape(n_series, width) / counts)
+    has_points = series_stop > series_start
+    tail_x = np.where(has_points, xs[np.maximum(last, 0)], np.nan)[:, None]
+    tail_y = np.where(has_points, ys[np.maximum(last, 0)], np.nan)[:, None]
+    next_x = pd.DataFrame(np.hstack([mean_x[:, 1:], tail_x]).T).bfill().to_numpy().T
+    next_y = pd.DataFrame(np.hstack([mean_y[:, 1:], tail_y]).T).bfill().to_numpy().T
+
+    # Điểm bên trong nhóm theo khoảng pixel, trong mỗi khoảng theo chuỗi
+    inner = np.flatnonzero(interior)
+    inner = inner[np.lexsort((codes[inner], buckets[inner]))]
+    bucket_bounds = np.searchsorted(buckets[inner], np.arange(width + 1))
+
+    prev_x = np.where(has_points, xs[np.minimum(first, len(xs) - 1)], np.nan)
+    prev_y = np.where(has_points, ys[np.minimum(first, len(xs) - 1)], np.nan)
+    picked = [first[has_points], last[has_points]]
+    for b in range(width):
+        candidates = inner[bucket_bounds[b]:bucket_bounds[b + 1]]
+        if not len(candidates):
+            continue
+        s = codes[candidates]
+        ax, ay = prev_x[s], prev_y[s]
+        area = np.abs((ax - next_x[s, b]) * (ys[candidates] - ay) - (ax - xs[candidates]) * (next_y[s, b] - ay))
+        # Điểm có diện tích lớn nhất của mỗi chuỗi: phần tử cuối mỗi nhóm sau khi sắp theo (chuỗi, diện tích)
+        ranked = np.lexsort((area, s))
+        best = ranked[np.r_[s[ranked][1:] != s[ranked][:-1], True]]
+        chosen = candidates[best]
+        prev_x[codes[chosen]], prev_y[codes[chosen]] = xs[chosen], ys[chosen]
+        picked.append(chosen)
+
+    picked = np.unique(np.concatenate(picked))
+    return df.iloc[positions[picked]]
@@ -0,0 +1,130 @@
+"""
+Bộ nhớ đệm LRU cho figure Plotly đã serialize (JSON)
+
+Dùng chung cho mọi phiên Streamlit: các tab vẽ lại mọi biểu đồ ở mỗi lần
+rerun, kể cả khi bộ lọc và tham số biểu đồ không đổi. Figure được lưu dưới
+dạng JSON, khoá gồm khoá bộ lọc của DataFrame đã lọc (phiên bản dữ liệu + bộ
+lọc đã chuẩn hoá, xem SelectionCache.key_of) và tên biểu đồ mã hoá đủ các
+tham số. Lượt trúng chỉ dựng lại Figure từ JSON, bỏ qua plotly express.
+
+Cache tách khỏi SelectionCache: figure vẫn còn khi DataFrame đã lọc bị đẩy
+ra, và chiếm ít bộ nhớ hơn nhiều. Giới hạn theo tổng dung lượng JSON và số mục.
+"""
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import plotly.graph_objects as go
+import streamlit as st
+
+from selection_cache import get_selection_cache
+
+# CONSTANTS
+MAX_BYTES = int(float(os.environ.get('WEATHER_FIGURE_CACHE_MB', 64)) * 1024 ** 2)
+MAX_ENTRIES = 512
+
+
+class FigureCache:
+    """
+    LRU các figure Plotly dạng JSON
+
+    - get(key, build): Figure cho `key`, dựng bằng build() nếu chưa có
+
+    Khi vượt `max_bytes` hoặc `max_entries`, figure ít dùng nhất bị loại.
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, max_entries=MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._specs = OrderedDict()
+        self._nbytes = 0
+        self._counts = {'hits': 0, 'misses': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+
+    def get(self, key, build):
+        """
+        Figure cho `key`
+
+        Args:
+            key: Khoá hashable (khoá bộ lọc + tên biểu đồ và tham số)
+            build: Hàm không tham số trả về Figure (hoặc None: không lưu)
+
+        Returns:
+            Figure mới (dựng từ JSON khi trúng), có thể sửa mà không ảnh hưởng cache
+        """
+        with self._lock:
+            spec = self._specs.get(key)
+            if spec is not None:
+                self._specs.move_to_end(key)
+                self._counts['hits'] += 1
+            else:
+                self._counts['misses'] += 1
+        if spec is not None:
+            # JSON do to_json() sinh ra đã hợp lệ: bỏ qua bước kiểm tra của plotly
+            return go.Figure(json.loads(spec), _validate=False)
+
+        fig = build()
+        if fig is None:
+            return None
+        spec = fig.to_json()
+
+        with self._lock:
+            if key not in self._specs:
+                self._specs[key] = spec
+                self._nbytes += len(spec)
+                self._evict()
+        return fig
+
+    def _evict(self):
+        """Loại figure ít dùng nhất cho tới khi nằm trong giới hạn (gọi khi đang giữ lock)"""
+        while self._specs and (self._nbytes > self.max_bytes or len(self._specs) > self.max_entries):
+            _, spec = self._specs.popitem(last=False)
+            self._nbytes -= len(spec)
+            self._counts['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._specs.clear()
+            self._nbytes = 0
+
+    def stats(self):
+        """
+        Thống kê sử dụng cache
+
+        Returns:
+            Dict số lần trúng/trượt, tỉ lệ trúng, số mục và dung lượng hiện tại
+        """
+        with self._lock:
+            counts = dict(self._counts)
+            lookups = counts['hits'] + counts['misses']
+            return {
+                **counts,
+                'hit_rate': counts['hits'] / lookups if lookups else 0.0,
+                'entries': len(self._specs),
+                'nbytes': self._nbytes,
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_figure_cache():
+    """FigureCache dùng chung cho mọi phiên"""
+    return FigureCache()
+
+
+def cached_figure(df, name, build):
+    """
+    Figure `name` vẽ từ dữ liệu của bộ lọc df, lấy từ cache dùng chung nếu có
+
+    Args:
+        df: DataFrame đã lọc do SelectionCache.get trả về (không nằm trong
+            cache thì chỉ dựng, không lưu)
+        name: Tên biểu đồ, phải mã hoá đủ các tham số ảnh hưởng kết quả
+            (ngoài bộ lọc), ví dụ thành phố đang chọn
+        build: Hàm không tham số trả về Figure
+    """
+    key = get_selection_cache().key_of(df)
+    if key is None:
+        return build()
+    return get_figure_cache().get((key, name), build)
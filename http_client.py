@@ -0,0 +1,175 @@
+"""
+Module HTTP dùng chung: session keep-alive, retry có backoff và circuit breaker theo host
+"""
+
+import random
+import threading
+import time
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# CONSTANTS
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5      # giây, nhân đôi sau mỗi lần thử lại
+BACKOFF_MAX = 8.0
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+# Circuit breaker: ngắt sau N lỗi liên tiếp, thử lại sau COOLDOWN giây
+BREAKER_THRESHOLD = 5
+BREAKER_COOLDOWN = 60.0
+
+_session = None
+_session_pool_size = 0
+_session_lock = threading.Lock()
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+class CircuitOpenError(requests.RequestException):
+    """Host đang bị ngắt do lỗi liên tiếp, request không được gửi"""
+
+
+# SESSION
+def get_session(pool_size=8):
+    """
+    Lấy session HTTP dùng chung (keep-alive) cho các request tới API
+
+    Args:
+        pool_size: Số kết nối tối thiểu giữ trong pool cho mỗi host
+
+    Returns:
+        requests.Session
+    """
+    global _session, _session_pool_size
+
+    with _session_lock:
+        if _session is None or _session_pool_size < pool_size:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            # Không đóng session cũ: thread khác có thể vẫn đang dùng, để GC thu hồi khi hết tham chiếu
+            _session, _session_pool_size = session, pool_size
+        return _session
+
+
+# CIRCUIT BREAKER
+class CircuitBreaker:
+    """
+    Circuit breaker đơn giản cho một host
+
+    - closed: request đi bình thường
+    - open: sau `threshold` lỗi liên tiếp, chặn mọi request trong `cooldown` giây
+    - half-open: hết cooldown, cho một request thử; thành công thì đóng lại
+    """
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, cooldown=BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self):
+        """Cho phép gửi request hay không"""
+        with self._lock:
+            state = self._state()
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+def get_breaker(url):
+    """Circuit breaker dùng chung cho host của `url`"""
+    host = urlparse(url).netloc
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker()
+        return _breakers[host]
+
+
+# REQUEST
+def _backoff_delay(attempt, response=None):
+    """Thời gian chờ trước lần thử lại: exponential backoff với full jitter"""
+    if response is not None and response.status_code == 429:
+        retry_after = response.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            return min(float(retry_after), BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def get_with_retry(session, url, params=None, timeout=None, retries=MAX_RETRIES):
+    """
+    Gửi GET, thử lại khi lỗi mạng hoặc lỗi tạm thời từ server
+
+    Lỗi kết nối, timeout và các status trong RETRY_STATUS được thử lại tối đa
+    `retries` lần với exponential backoff + jitter. Mỗi lần thất bại được ghi
+    vào circuit breaker của host; khi breaker mở, request không được gửi.
+
+    Returns:
+        requests.Response (status cuối cùng nếu hết lượt thử lại)
+
+    Raises:
+        CircuitOpenError: Host đang bị ngắt
+        requests.RequestException: Lỗi mạng ở lần thử cuối hoặc lỗi không thử lại
+    """
+    breaker = get_breaker(url)
+
+    for attempt in range(retries + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f'Tạm ngừng gửi request tới {urlparse(url).netloc} do lỗi liên tiếp')
+
+        try:
+            response = session.get(url, params=params, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            breaker.record_failure()
+            if attempt == retries:
+                raise
+            time.sleep(_backoff_delay(attempt))
+            continue
+        except requests.RequestException:
+            # Lỗi không thử lại (URL sai, quá nhiều redirect...): vẫn ghi vào breaker
+            # để request thử ở trạng thái half-open không bị treo
+            breaker.record_failure()
+            raise
+
+        if response.status_code not in RETRY_STATUS:
+            breaker.record_success()
+            return response
+
+        breaker.record_failure()
+        if attempt == retries:
+            return response
+        time.sleep(_backoff_delay(attempt, response))
@@ -0,0 +1,160 @@
+"""
+Chạy song song theo thành phố trên process pool (dùng khi làm mới dữ liệu)
+
+Dữ liệu được chia thành các phần rời nhau, mỗi phần gồm các nhóm
+(thành phố, năm) liền nhau với số dòng gần bằng nhau, nên vẫn chia đều
+được khi số thành phố ít hơn số tiến trình. Mỗi tiến trình tính đặc trưng
+hoặc tổng hợp cục bộ cho phần của mình, rồi các kết quả cục bộ được gộp lại:
+    - add_features: tính theo từng dòng, ghép lại đúng thứ tự dòng ban đầu
+    - ô của khối tổng hợp: ô (thành phố, tháng) không trùng giữa các phần, nối lại
+    - thống kê luỹ tiến: gộp bằng RunningStats.merge (công thức Chan)
+
+Kết quả giống hệt chạy tuần tự. Với workers <= 1 mọi thứ chạy trong tiến
+trình hiện tại, không tạo pool.
+"""
+
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial, reduce
+
+import numpy as np
+import pandas as pd
+
+from aggregates import build_cells
+from running_stats import RunningStats
+
+# CONSTANTS
+# Số tiến trình mặc định khi làm mới dữ liệu (1 = tuần tự)
+PROCESS_WORKERS = int(os.environ.get('WEATHER_PROCESS_WORKERS', '1'))
+# Số phần chia cho mỗi tiến trình, để các tiến trình xong gần cùng lúc
+PARTS_PER_WORKER = 2
+
+
+# HELPER FUNCTIONS
+def split_positions(df, n_parts):
+    """
+    Chia các dòng thành tối đa n_parts phần rời nhau, cân bằng theo số dòng
+
+    Mỗi nhóm (thành phố, năm) nằm trọn trong một phần; các nhóm của cùng
+    một thành phố được xếp liền nhau nên phần lớn thành phố nằm trọn trong
+    một phần.
+
+    Returns:
+        List mảng vị trí dòng (tăng dần theo thành phố, ngày trong mỗi phần)
+    """
+    if df.empty:
+        return []
+    codes = pd.factorize(df['city'], sort=False)[0].astype(np.int64)
+    years = df['date'].to_numpy().astype('datetime64[Y]').astype(np.int64)
+    keys = codes * (int(years.max() - years.min()) + 1) + (years - years.min())
+
+    # Dữ liệu thường đã sắp xếp theo (thành phố, ngày): khỏi sắp xếp lại
+    order = np.arange(len(keys)) if np.all(keys[1:] >= keys[:-1]) else np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+    # Cắt ở ranh giới nhóm gần nhất với các mốc chia đều số dòng
+    bounds = np.r_[starts, len(df)]
+    targets = np.arange(1, n_parts) * len(df) / n_parts
+    cuts = np.unique(bounds[np.searchsorted(bounds, targets)])
+    return [part for part in np.split(order, cuts) if len(part)]
+
+
+# Frame dùng chung với các tiến trình con (fork kế thừa qua copy-on-write)
+_shared = {}
+
+
+def _run_part(task):
+    func, positions = task
+    return func(_shared['df'].iloc[positions])
+
+
+def _added_columns(func, part):
+    """Chỉ các cột func thêm vào part (giảm dữ liệu gửi về tiến trình cha)"""
+    before = set(part.columns)
+    # Bản sao nông: func được gán cột mới như trên một DataFrame độc lập
+    result = func(part.copy(deep=False))
+    return result[[col for col in result.columns if col not in before]]
+
+
+def map_parts(func, df, workers=PROCESS_WORKERS):
+    """
+    Áp dụng func cho từng phần (DataFrame con) trên process pool
+
+    Với fork, tiến trình con kế thừa df nên chỉ vị trí dòng của mỗi phần được
+    gửi đi; nền tảng không có fork thì gửi từng DataFrame con.
+
+    Args:
+        func: Hàm cấp module (pickle được) nhận DataFrame con
+        df: DataFrame cần chia
+        workers: Số tiến trình
+
+    Returns:
+        Tuple (list kết quả theo thứ tự phần, list mảng vị trí dòng của từng phần)
+    """
+    positions = split_positions(df, workers * PARTS_PER_WORKER if workers > 1 else 1)
+    if workers <= 1 or len(positions) <= 1:
+        return [func(df.iloc[pos]) for pos in positions], positions
+
+    pool_size = min(workers, len(positions))
+    if 'fork' not in mp.get_all_start_methods():
+        with ProcessPoolExecutor(max_workers=pool_size) as pool:
+            return list(pool.map(func, [df.iloc[pos] for pos in positions])), positions
+
+    _shared['df'] = df
+    try:
+        with ProcessPoolExecutor(max_workers=pool_size, mp_context=mp.get_context('fork')) as pool:
+            return list(pool.map(_run_part, [(func, pos) for pos in positions])), positions
+    finally:
+        _shared.clear()
+
+
+def apply_rows(func, df, workers=PROCESS_WORKERS):
+    """
+    Áp dụng một phép tính theo từng dòng (ví dụ add_features) song song
+
+    Chỉ các cột func thêm vào được gửi về rồi gán vào df theo đúng thứ tự
+    dòng ban đầu, giống func(df) chạy tuần tự.
+
+    Returns:
+        df với các cột mới
+    """
+    if workers <= 1 or df.empty:
+        return func(df)
+    results, positions = map_parts(partial(_added_columns, func), df, workers)
+    added = pd.concat(results, ignore_index=True)
+    # Trả về thứ tự dòng ban đầu (nếu các phần không theo đúng thứ tự đó)
+    order = np.concatenate(positions)
+    if np.any(order[1:] < order[:-1]):
+        added = added.take(np.argsort(order, kind='stable'))
+    for col in added.columns:
+        df[col] = added[col].array
+    return df
+
+
+def build_cells_parallel(df, workers=PROCESS_WORKERS):
+    """
+    build_cells (aggregates.py) song song: mỗi phần gộp ô của riêng nó
+
+    Returns:
+        DataFrame ô cùng định dạng và thứ tự với build_cells(df) khi df đã
+        sắp xếp theo (thành phố, ngày)
+    """
+    if workers <= 1:
+        return build_cells(df)
+    results, _ = map_parts(build_cells, df, workers)
+    results = [cells for cells in results if not cells.empty]
+    return pd.concat(results, ignore_index=True) if results else build_cells(df.iloc[0:0])
+
+
+def running_stats_parallel(df, workers=PROCESS_WORKERS):
+    """
+    RunningStats.from_frame song song: trạng thái từng phần gộp bằng merge
+
+    Returns:
+        RunningStats của toàn bộ df
+    """
+    if workers <= 1:
+        return RunningStats.from_frame(df)
+    results, _ = map_parts(RunningStats.from_frame, df, workers)
+    return reduce(RunningStats.merge, results)
@@ -0,0 +1,157 @@
+"""
+Làm mới dữ liệu ngoài luồng phục vụ người dùng
+
+Tải dữ liệu mới, tính đặc trưng và công bố một phiên bản dữ liệu bất biến
+(xem data_store.publish_dataset). Ứng dụng Streamlit chỉ đọc phiên bản mới nhất:
+ánh xạ bộ nhớ file Arrow của phiên bản (dùng chung giữa các worker), hoặc chỉ
+đọc các phân vùng (thành phố, năm) cần cho bộ lọc nếu không có file đó.
+
+Chạy một lần (ví dụ từ cron):
+    python refresh.py
+
+Chạy lặp lại như một sidecar:
+    python refresh.py --interval 3600
+
+Toàn bộ lịch sử của API (từ 1940):
+    python refresh.py --start-date 1940-01-01
+
+Tải dữ liệu theo giờ (lưu trong store theo giờ, dữ liệu ngày được gộp từ đó):
+    python refresh.py --resolution hourly
+
+Tính đặc trưng và tổng hợp trên 8 tiến trình (chia theo thành phố):
+    python refresh.py --workers 8
+"""
+
+import argparse
+import logging
+import time
+from datetime import datetime
+
+from aggregates import CUBE_FILE, AggregateCube
+from data_fetcher import CITIES, LOCATIONS_FILE, load_weather_data
+from data_index import FilterIndex
+from data_store import (ARROW_FILE, latest_version, prune_versions, publish_dataset, read_published,
+                        read_published_meta, write_arrow)
+from parallel import PROCESS_WORKERS, build_cells_parallel, running_stats_parallel
+from running_stats import STATS_FILE, read_published_stats, update_stats
+
+logger = logging.getLogger('refresh')
+
+
+def load_base(start_date, resolution='daily'):
+    """
+    Phiên bản đã công bố gần nhất, dùng làm base để chỉ xử lý dòng mới
+
+    Bỏ qua nếu phiên bản đó được tạo với ngày bắt đầu, danh mục địa điểm hoặc
+    độ phân giải khác.
+
+    Returns:
+        Tuple (DataFrame, trạng thái thống kê) hoặc (None, None); trạng thái
+        là None nếu phiên bản không lưu kèm thống kê
+    """
+    version = latest_version()
+    if version is None:
+        return None, None
+
+    meta = read_published_meta(version)
+    if (meta.get('start_date') != start_date or meta.get('cities') != list(CITIES)
+            or meta.get('resolution', 'daily') != resolution):
+        logger.info('Phiên bản %s khác tham số hiện tại, tải lại toàn bộ', version)
+        return None, None
+
+    return read_published(version), read_published_stats(version)
+
+
+def refresh_once(start_date, keep, resolution='daily', workers=PROCESS_WORKERS):
+    """
+    Một lần làm mới: tải phần dữ liệu mới, công bố phiên bản mới nếu có thay đổi
+
+    Args:
+        workers: Số tiến trình tính đặc trưng, khối tổng hợp và thống kê
+            (chia theo thành phố, xem parallel.py; 1 = tuần tự)
+
+    Returns:
+        Tên phiên bản mới nhất sau khi làm mới (None nếu không có dữ liệu)
+    """
+    t0 = time.perf_counter()
+    base, base_stats = load_base(start_date, resolution)
+
+    def on_progress(done, total, city):
+        logger.info('Đã tải %d/%d (%s)', done, total, city)
+
+    df = load_weather_data(start_date, compact=True, base=base, on_progress=on_progress, resolution=resolution,
+                           process_workers=workers)
+    t_load = time.perf_counter() - t0
+
+    if df.empty:
+        logger.error('Không tải được dữ liệu, giữ nguyên phiên bản hiện tại')
+        return latest_version()
+
+    if df is base:
+        logger.info('Không có dữ liệu mới, giữ nguyên phiên bản %s', latest_version())
+        return latest_version()
+
+    # Thống kê luỹ tiến: chỉ quét các dòng mới rồi gộp vào trạng thái của base
+    # (thành phố có dòng cũ bị ghi đè khi làm mới được tính lại toàn bộ;
+    # lần đầu: tính từng phần trên process pool rồi gộp)
+    t1 = time.perf_counter()
+    if base_stats is not None:
+        stats = update_stats(base_stats, df, base, df.attrs.get('refetched_from'))
+    else:
+        stats = running_stats_parallel(df, workers)
+    # Khối tổng hợp lưu kèm phiên bản: dashboard không cần đọc toàn bộ dữ liệu ngày
+    ordered = FilterIndex(df).df
+    cube = AggregateCube.from_cells(build_cells_parallel(ordered, workers))
+    t_aggregate = time.perf_counter() - t1
+
+    version = publish_dataset(df, meta={
+        'start_date': start_date,
+        'end_date': df['date'].max().strftime('%Y-%m-%d'),
+        'cities': list(CITIES),
+        'locations_file': LOCATIONS_FILE,
+        'resolution': resolution,
+    }, attachments={
+        STATS_FILE: stats.save,
+        CUBE_FILE: cube.save,
+        # Bản Arrow đã sắp xếp theo (thành phố, ngày): các worker ánh xạ bộ nhớ dùng chung
+        ARROW_FILE: lambda path: write_arrow(ordered, path),
+    })
+    removed = prune_versions(keep)
+
+    logger.info('Đã công bố phiên bản %s: %s dòng trong %.1fs (tải + đặc trưng %.1fs, tổng hợp %.1fs, '
+                '%d tiến trình; xoá %d phiên bản cũ)', version, f'{len(df):,}', time.perf_counter() - t0,
+                t_load, t_aggregate, workers, len(removed))
+    return version
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Làm mới và công bố dữ liệu thời tiết')
+    parser.add_argument('--start-date', default='2025-01-01', help='Ngày bắt đầu (YYYY-MM-DD)')
+    parser.add_argument('--interval', type=float, default=0,
+                        help='Chạy lặp lại sau mỗi N giây (0 = chạy một lần)')
+    parser.add_argument('--keep', type=int, default=3, help='Số phiên bản giữ lại')
+    parser.add_argument('--resolution', choices=['daily', 'hourly'], default='daily',
+                        help='Độ phân giải tải từ API (hourly: gộp thành ngày từ store theo giờ)')
+    parser.add_argument('--workers', type=int, default=PROCESS_WORKERS,
+                        help='Số tiến trình tính đặc trưng và tổng hợp theo thành phố (1 = tuần tự)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+
+    while True:
+        try:
+            refresh_once(args.start_date, args.keep, args.resolution, args.workers)
+        except Exception:
+            logger.exception('Làm mới dữ liệu thất bại')
+            if not args.interval:
+                raise
+
+        if not args.interval:
+            break
+        logger.info('Lần làm mới tiếp theo lúc %s',
+                    datetime.fromtimestamp(time.time() + args.interval).strftime('%H:%M:%S'))
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
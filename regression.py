@@ -0,0 +1,107 @@
+"""
+Hồi quy tuyến tính (bình phương tối thiểu) theo nhóm, dạng đóng
+
+Thay cho trendline='ols' của plotly express (mỗi nhóm màu một mô hình
+statsmodels): hệ số góc, hệ số chặn, R² và dải tin cậy của đường hồi quy
+được tính cho mọi nhóm cùng lúc từ các tổng theo nhóm (np.bincount):
+    slope = Sxy / Sxx, intercept = ȳ - slope x̄, R² = Sxy² / (Sxx Syy)
+Kết quả giống OLS của statsmodels với một biến và hệ số chặn.
+"""
+
+import numpy as np
+import pandas as pd
+from scipy import stats as sps
+
+# CONSTANTS
+# Mức tin cậy của dải quanh đường hồi quy
+CONFIDENCE_LEVEL = 0.95
+# Số điểm vẽ đường hồi quy và dải tin cậy mỗi nhóm
+LINE_POINTS = 50
+
+
+def fit_lines(df, x_col, y_col, by):
+    """
+    Hồi quy y_col theo x_col cho từng nhóm by
+
+    Bỏ các dòng có x hoặc y là NaN; mọi nhóm được tính trong một lượt
+    (các tổng theo nhóm bằng np.bincount, đã trừ trung bình để ổn định số).
+
+    Args:
+        df: DataFrame (dữ liệu ngày)
+        x_col, y_col: Biến độc lập, biến phụ thuộc
+        by: Cột nhóm (None = một nhóm cho toàn bộ df)
+
+    Returns:
+        DataFrame mỗi nhóm một dòng: cột by (nếu có), n, slope, intercept, r2,
+        x_mean, sxx, resid_std (độ lệch chuẩn phần dư), x_min, x_max
+    """
+    df = df[df[x_col].notna() & df[y_col].notna()]
+    x = df[x_col].to_numpy(dtype='float64')
+    y = df[y_col].to_numpy(dtype='float64')
+    if by is None:
+        codes, keys = np.zeros(len(df), dtype=np.int64), pd.DataFrame(index=range(1 if len(df) else 0))
+    else:
+        codes, uniques = pd.factorize(df[by])
+        keys = pd.DataFrame({by: uniques})
+    n_groups = len(keys)
+
+    n = np.bincount(codes, minlength=n_groups).astype('float64')
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = np.bincount(codes, x, n_groups) / n
+        y_mean = np.bincount(codes, y, n_groups) / n
+        dx = x - x_mean[codes]
+        dy = y - y_mean[codes]
+        sxx = np.bincount(codes, dx * dx, n_groups)
+        sxy = np.bincount(codes, dx * dy, n_groups)
+        syy = np.bincount(codes, dy * dy, n_groups)
+
+        slope = sxy / sxx
+        intercept = y_mean - slope * x_mean
+        r2 = sxy * sxy / (sxx * syy)
+        # Tổng bình phương phần dư = Syy - slope x Sxy, bậc tự do n - 2
+        resid_std = np.sqrt(np.maximum(syy - slope * sxy, 0) / (n - 2))
+
+    fits = keys.copy()
+    fits['n'] = n.astype(np.int64)
+    fits['slope'] = slope
+    fits['intercept'] = intercept
+    fits['r2'] = r2
+    fits['x_mean'] = x_mean
+    fits['sxx'] = sxx
+    fits['resid_std'] = resid_std
+    # Khoảng x của từng nhóm (mỗi nhóm có ít nhất một dòng)
+    x_sorted = x[np.argsort(codes, kind='stable')]
+    starts = np.r_[0, np.cumsum(n[:-1])].astype(np.int64)
+    fits['x_min'] = np.minimum.reduceat(x_sorted, starts) if len(x) else np.array([])
+    fits['x_max'] = np.maximum.reduceat(x_sorted, starts) if len(x) else np.array([])
+    return fits
+
+
+def confidence_bands(fits, n_points=LINE_POINTS, level=CONFIDENCE_LEVEL):
+    """
+    Đường hồi quy và dải tin cậy của giá trị trung bình dự đoán, cho mọi nhóm
+
+    Sai số chuẩn tại x: resid_std x sqrt(1/n + (x - x̄)² / Sxx), nhân với
+    phân vị Student t bậc tự do n - 2.
+
+    Args:
+        fits: Kết quả fit_lines
+        n_points: Số điểm trên đoạn [x_min, x_max] của mỗi nhóm
+        level: Mức tin cậy
+
+    Returns:
+        Tuple mảng (số nhóm, n_points): (x, ŷ, cận dưới, cận trên); nhóm
+        dưới 3 điểm có dải NaN
+    """
+    n = fits['n'].to_numpy().astype('float64')
+    x = fits['x_min'].to_numpy()[:, None] + (fits['x_max'] - fits['x_min']).to_numpy()[:, None] \
+        * np.linspace(0, 1, n_points)
+    fitted = fits['intercept'].to_numpy()[:, None] + fits['slope'].to_numpy()[:, None] * x
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = sps.t.ppf((1 + level) / 2, np.where(n > 2, n - 2, np.nan))
+        se = fits['resid_std'].to_numpy()[:, None] * np.sqrt(
+            1 / n[:, None] + (x - fits['x_mean'].to_numpy()[:, None]) ** 2 / fits['sxx'].to_numpy()[:, None]
+        )
+    half = t[:, None] * se
+    return x, fitted, fitted - half, fitted + half
@@ -0,0 +1,405 @@
+"""
+Thống kê luỹ tiến theo thành phố, cập nhật khi có dữ liệu mới
+
+Mỗi thành phố giữ số mẫu, trung bình và M2 (Welford), min, max của từng
+số đo cùng ma trận đồng mô-men (co-moment) để tính tương quan. Hai trạng
+thái được gộp chính xác bằng công thức của Chan và cộng sự, nên mỗi lần
+làm mới chỉ cần tính trạng thái của các dòng mới rồi gộp vào trạng thái
+cũ: O(số dòng mới), không phụ thuộc độ dài lịch sử.
+
+Trạng thái được lưu cùng phiên bản dữ liệu đã công bố (STATS_FILE).
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+
+from aggregates import MEASURES, ROW_COUNT
+from data_store import published_path
+
+# CONSTANTS
+STATS_FILE = 'stats.npz'
+
+_ARRAYS = ['rows', 'last_date', 'n', 'mean', 'm2', 'min', 'max', 'cov_n', 'cov_mean', 'cov_m2', 'comoment']
+
+
+def _combine(n_a, mean_a, m2_a, n_b, mean_b, m2_b):
+    """Gộp (n, mean, M2) của hai nhóm (công thức Chan), hoạt động theo từng phần tử"""
+    n = n_a + n_b
+    with np.errstate(divide='ignore', invalid='ignore'):
+        delta = mean_b - mean_a
+        weight = np.where(n > 0, n_b / n, 0.0)
+        mean = mean_a + delta * weight
+        m2 = m2_a + m2_b + delta * delta * n_a * weight
+    return n, mean, m2, delta
+
+
+def _combine_pairs(a, b):
+    """
+    Gộp trạng thái theo cặp số đo (cov_n, cov_mean, cov_m2, comoment) của hai nhóm
+
+    Phần tử [i, j] của mean/M2 thuộc số đo i, phần tử [j, i] thuộc số đo j
+    (cùng tập dòng), nên đồng mô-men gộp bằng delta x delta chuyển vị.
+    """
+    n_a, mean_a, m2_a, comoment_a = a
+    n_b, mean_b, m2_b, comoment_b = b
+    n, mean, m2, delta = _combine(n_a, mean_a, m2_a, n_b, mean_b, m2_b)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = np.where(n > 0, n_a * n_b / n, 0.0)
+    comoment = comoment_a + comoment_b + factor * delta * np.swapaxes(delta, -1, -2)
+    return n, mean, m2, comoment
+
+
+class RunningStats:
+    """
+    Trạng thái thống kê luỹ tiến của từng thành phố
+
+    Attributes:
+        cities, regions: Tên thành phố và vùng (cùng thứ tự với các mảng)
+        rows, last_date: Số dòng và ngày cuối cùng đã gộp của từng thành phố
+        measures: Các số đo
+        n, mean, m2, min, max: Mảng (thành phố x số đo), bỏ qua NaN
+        cov_n, cov_mean, cov_m2, comoment: Theo từng cặp số đo (i, j), trên
+            các dòng có cả hai: số dòng, trung bình và M2 của số đo i, đồng
+            mô-men (thành phố x số đo x số đo); tương quan tính theo từng cặp
+            như DataFrame.corr()
+    """
+
+    def __init__(self, cities, regions, measures, **arrays):
+        self.cities = list(cities)
+        self.regions = list(regions)
+        self.measures = list(measures)
+        for name in _ARRAYS:
+            setattr(self, name, arrays[name])
+
+    @classmethod
+    def empty(cls, measures=MEASURES):
+        m = len(measures)
+        return cls([], [], measures, rows=np.zeros(0, np.int64),
+                   last_date=np.zeros(0, 'datetime64[ns]'), n=np.zeros((0, m), np.int64),
+                   mean=np.zeros((0, m)), m2=np.zeros((0, m)), min=np.zeros((0, m)), max=np.zeros((0, m)),
+                   cov_n=np.zeros((0, m, m), np.int64), cov_mean=np.zeros((0, m, m)), cov_m2=np.zeros((0, m, m)),
+                   comoment=np.zeros((0, m, m)))
+
+    @classmethod
+    def from_frame(cls, df, measures=MEASURES):
+        """
+        Trạng thái của một DataFrame ngày
+
+        Args:
+            df: DataFrame có cột city, region và các số đo
+        """
+        measures = [col for col in measures if col in df.columns]
+        if df.empty:
+            return cls.empty(measures)
+
+        codes, cities = pd.factorize(df['city'], sort=False)
+        cities = list(cities)
+        n_cities, m = len(cities), len(measures)
+        values = np.column_stack([df[col].to_numpy(dtype='float64', na_value=np.nan) for col in measures])
+        valid = ~np.isnan(values)
+        filled = np.where(valid, values, 0.0)
+
+        rows = np.bincount(codes, minlength=n_cities)
+        dates = df['date'].to_numpy().astype('datetime64[ns]', copy=False)
+        last_date = pd.Series(dates).groupby(codes).max().to_numpy(dtype='datetime64[ns]')
+        n = np.stack([np.bincount(codes, weights=valid[:, j], minlength=n_cities) for j in range(m)], axis=1)
+        sums = np.stack([np.bincount(codes, weights=filled[:, j], minlength=n_cities) for j in range(m)], axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = np.where(n > 0, sums / n, 0.0)
+        centered = np.where(valid, values - mean[codes], 0.0)
+        m2 = np.stack([np.bincount(codes, weights=centered[:, j] ** 2, minlength=n_cities) for j in range(m)], axis=1)
+
+        minimum = np.full((n_cities, m), np.nan)
+        maximum = np.full((n_cities, m), np.nan)
+        for j in range(m):
+            col = pd.Series(values[:, j]).groupby(codes)
+            minimum[:, j] = col.min().reindex(range(n_cities)).to_numpy()
+            maximum[:, j] = col.max().reindex(range(n_cities)).to_numpy()
+
+        # Theo từng cặp số đo, trên các dòng có cả hai (đã trừ trung bình cột để ổn định số)
+        cov_n = np.zeros((n_cities, m, m), np.int64)
+        cov_mean = np.zeros((n_cities, m, m))
+        cov_m2 = np.zeros((n_cities, m, m))
+        comoment = np.zeros((n_cities, m, m))
+        order = np.argsort(codes, kind='stable')
+        bounds = np.r_[0, np.cumsum(rows)]
+        for c in range(n_cities):
+            block = order[bounds[c]:bounds[c + 1]]
+            pair_valid = valid[block].astype('float64')
+            x = centered[block]
+            pair_n = pair_valid.T @ pair_valid
+            # sums[i, j]: tổng của số đo i trên các dòng có cả i và j
+            sums = x.T @ pair_valid
+            sumsq = (x * x).T @ pair_valid
+            with np.errstate(divide='ignore', invalid='ignore'):
+                shift = np.where(pair_n > 0, sums / pair_n, 0.0)
+            cov_n[c] = pair_n
+            cov_mean[c] = mean[c][:, None] + shift
+            cov_m2[c] = sumsq - shift * sums
+            comoment[c] = x.T @ x - shift * sums.T
+
+        first_rows = np.unique(codes, return_index=True)[1]
+        regions = list(df['region'].to_numpy()[first_rows]) if 'region' in df.columns else [''] * n_cities
+
+        return cls(cities, regions, measures, rows=rows, last_date=last_date, n=n.astype(np.int64), mean=mean, m2=m2,
+                   min=minimum, max=maximum, cov_n=cov_n, cov_mean=cov_mean, cov_m2=cov_m2, comoment=comoment)
+
+    def _aligned(self, cities):
+        """Các mảng sắp theo danh sách `cities` (thành phố chưa có: trạng thái rỗng)"""
+        pos = {city: i for i, city in enumerate(self.cities)}
+        take = np.array([pos.get(city, -1) for city in cities], dtype=np.int64)
+        present = take >= 0
+
+        def pick(arr, fill):
+            fill = np.asarray(fill)
+            out = np.full((len(cities),) + arr.shape[1:], fill, dtype=np.result_type(arr, fill))
+            out[present] = arr[take[present]]
+            return out
+
+        return {
+            'rows': pick(self.rows, 0), 'last_date': pick(self.last_date, np.datetime64('NaT', 'ns')),
+            'n': pick(self.n, 0), 'mean': pick(self.mean, 0.0), 'm2': pick(self.m2, 0.0),
+            'min': pick(self.min, np.nan), 'max': pick(self.max, np.nan),
+            'cov_n': pick(self.cov_n, 0), 'cov_mean': pick(self.cov_mean, 0.0),
+            'cov_m2': pick(self.cov_m2, 0.0), 'comoment': pick(self.comoment, 0.0),
+        }
+
+    def subset(self, cities):
+        """Trạng thái chỉ gồm các thành phố `cities` (đã có trong self), theo đúng thứ tự đó"""
+        region_of = dict(zip(self.cities, self.regions))
+        return RunningStats(list(cities), [region_of[c] for c in cities], self.measures, **self._aligned(cities))
+
+    def merge(self, other):
+        """
+        Gộp với trạng thái của các dòng khác (không trùng lặp)
+
+        Returns:
+            RunningStats mới; thứ tự thành phố giữ như self, thành phố mới nối vào cuối
+        """
+        cities = self.cities + [c for c in other.cities if c not in set(self.cities)]
+        region_of = dict(zip(self.cities, self.regions))
+        region_of.update({c: r for c, r in zip(other.cities, other.regions) if c not in region_of})
+        a, b = self._aligned(cities), other._aligned(cities)
+
+        n, mean, m2, _ = _combine(a['n'], a['mean'], a['m2'], b['n'], b['mean'], b['m2'])
+
+        cov_n, cov_mean, cov_m2, comoment = _combine_pairs(
+            (a['cov_n'], a['cov_mean'], a['cov_m2'], a['comoment']),
+            (b['cov_n'], b['cov_mean'], b['cov_m2'], b['comoment']))
+
+        return RunningStats(
+            cities, [region_of[c] for c in cities], self.measures,
+            rows=a['rows'] + b['rows'], last_date=np.fmax(a['last_date'], b['last_date']), n=n, mean=mean, m2=m2,
+            min=np.fmin(a['min'], b['min']), max=np.fmax(a['max'], b['max']),
+            cov_n=cov_n, cov_mean=cov_mean, cov_m2=cov_m2, comoment=comoment,
+        )
+
+    def city_frame(self, cities=None):
+        """
+        Thống kê từng thành phố ở định dạng ô của khối tổng hợp
+
+        Dùng được với get_statistics và group_agg (theo 'city', 'region' hoặc toàn bộ).
+        """
+        names = [c for c in self.cities if not cities or c in set(cities)]
+        arrays = self._aligned(names)
+        frame = {'city': names, 'region': [self.regions[self.cities.index(c)] for c in names],
+                 ROW_COUNT: arrays['rows']}
+        for j, col in enumerate(self.measures):
+            n, mean = arrays['n'][:, j], arrays['mean'][:, j]
+            frame[f'{col}__sum'] = mean * n
+            frame[f'{col}__count'] = n
+            frame[f'{col}__min'] = arrays['min'][:, j]
+            frame[f'{col}__max'] = arrays['max'][:, j]
+            frame[f'{col}__sumsq'] = arrays['m2'][:, j] + n * mean * mean
+        return pd.DataFrame(frame)
+
+    def correlation(self, cities=None, columns=None):
+        """
+        Ma trận tương quan Pearson gộp trên các thành phố
+
+        Mỗi cặp số đo dùng các dòng có cả hai giá trị, giống DataFrame.corr().
+
+        Returns:
+            DataFrame (columns x columns)
+        """
+        columns = [col for col in (columns or self.measures) if col in self.measures]
+        names = [c for c in self.cities if not cities or c in set(cities)]
+        arrays = self._aligned(names)
+
+        m = len(self.measures)
+        pairs = ('cov_n', 'cov_mean', 'cov_m2', 'comoment')
+        total = (np.zeros((m, m), np.int64), np.zeros((m, m)), np.zeros((m, m)), np.zeros((m, m)))
+        for i in range(len(names)):
+            total = _combine_pairs(total, tuple(arrays[name][i] for name in pairs))
+        _, _, m2, comoment = total
+
+        idx = [self.measures.index(col) for col in columns]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = comoment / np.sqrt(m2 * m2.T)
+        corr = corr[np.ix_(idx, idx)]
+        return pd.DataFrame(corr, index=columns, columns=columns)
+
+    # PERSISTENCE
+    def save(self, path):
+        """Ghi trạng thái ra file .npz (không dùng pickle)"""
+        np.savez(path, cities=np.array(self.cities, dtype=str), regions=np.array(self.regions, dtype=str),
+                 measures=np.array(self.measures, dtype=str),
+                 **{name: getattr(self, name) for name in _ARRAYS})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data['cities'].tolist(), data['regions'].tolist(), data['measures'].tolist(),
+                       **{name: data[name] for name in _ARRAYS})
+
+
+# INCREMENTAL UPDATE
+def _city_codes(df, cities, rows=slice(None)):
+    """Mã theo danh sách `cities` của các dòng `rows` (-1 = không có trong danh sách)"""
+    col = df['city']
+    index = pd.Index(cities)
+    if isinstance(col.dtype, pd.CategoricalDtype):
+        lookup = np.append(index.get_indexer(col.cat.categories), -1)
+        return lookup[col.cat.codes.to_numpy()[rows]]
+    return index.get_indexer(col.to_numpy()[rows])
+
+
+def _per_row(codes, per_city):
+    """Ngày của thành phố tương ứng với từng mã (NaT với mã -1)"""
+    values = np.append(np.asarray(per_city, dtype='datetime64[ns]'), np.datetime64('NaT', 'ns'))
+    return values[codes]
+
+
+def _appended_mask(stats, df):
+    """Mask các dòng của `df` nằm sau ngày cuối cùng đã gộp vào `stats` của từng thành phố"""
+    cutoff = _per_row(_city_codes(df, stats.cities), stats.last_date)
+    dates = df['date'].to_numpy().astype('datetime64[ns]', copy=False)
+    # NaT (thành phố mới) so sánh luôn sai nên được giữ lại
+    return ~(dates <= cutoff)
+
+
+def appended_rows(stats, df):
+    """
+    Các dòng của `df` nằm sau ngày cuối cùng đã gộp vào `stats` của từng thành phố
+
+    Thành phố chưa có trong `stats` được lấy toàn bộ. Chỉ so sánh ngày,
+    không quét lại dữ liệu cũ để tính trạng thái.
+    """
+    return df[_appended_mask(stats, df)]
+
+
+def _sorted_rows(df, rows, codes, measures):
+    """(mã thành phố, ngày int64, mảng số đo) của các dòng `rows`, sắp theo thành phố rồi ngày"""
+    dates = df['date'].to_numpy().astype('datetime64[ns]', copy=False).view(np.int64)[rows]
+    values = np.column_stack([df[col].to_numpy(dtype='float64', na_value=np.nan)[rows] for col in measures]) \
+        if measures else np.zeros((len(rows), 0))
+    step = np.diff(codes)
+    if not ((step > 0) | ((step == 0) & (np.diff(dates) >= 0))).all():
+        order = np.lexsort((dates, codes))
+        codes, dates, values = codes[order], dates[order], values[order]
+    return codes, dates, values
+
+
+def revised_cities(stats, base, df, refetched_from=None):
+    """
+    Các thành phố có dòng đã gộp vào `stats` bị thay đổi hoặc mất trong `df`
+
+    Khi làm mới, dòng cùng (city, date) được ghi đè bằng dữ liệu mới tải
+    (vd. các ngày cuối trước đó còn trống được điền bổ sung), nên phần đóng
+    góp cũ của chúng trong `stats` không còn đúng. Chỉ các dòng từ ngày
+    tải lại của mỗi thành phố được so sánh.
+
+    Args:
+        stats: Trạng thái của `base`
+        base: DataFrame trước khi làm mới
+        df: DataFrame sau khi làm mới
+        refetched_from: Dict thành phố -> ngày sớm nhất được đọc/tải lại
+            (xem load_weather_data); None = so sánh toàn bộ
+
+    Returns:
+        Set tên thành phố
+    """
+    measures = [col for col in stats.measures if col in df.columns and col in base.columns]
+
+    since = None
+    if refetched_from is not None:
+        since = pd.Series(refetched_from, dtype='datetime64[ns]').reindex(stats.cities).to_numpy()
+        if np.isnat(since).all():
+            return set()
+        floor = since[~np.isnat(since)].min()
+
+    def candidates(frame):
+        """Vị trí và mã thành phố của các dòng có thể bị ghi đè trong `frame`"""
+        dates = frame['date'].to_numpy().astype('datetime64[ns]', copy=False)
+        # Lọc thô theo ngày tải lại sớm nhất trước, rồi mới tra từng thành phố trên phần còn lại
+        rows = np.flatnonzero(dates >= floor) if since is not None else np.arange(len(frame))
+        codes, dates = _city_codes(frame, stats.cities, rows), dates[rows]
+        keep = (codes >= 0) & (dates <= _per_row(codes, stats.last_date))
+        if since is not None:
+            keep &= dates >= _per_row(codes, since)
+        return rows[keep], codes[keep]
+
+    old = _sorted_rows(base, *candidates(base), measures)
+    new = _sorted_rows(df, *candidates(df), measures)
+
+    # Số dòng khác nhau: có dòng bị mất (hoặc thêm vào giữa)
+    counts_old = np.bincount(old[0], minlength=len(stats.cities))
+    counts_new = np.bincount(new[0], minlength=len(stats.cities))
+    revised = counts_old != counts_new
+
+    # Cùng số dòng: hai bên sắp theo (thành phố, ngày) nên so sánh được từng vị trí
+    same_old, same_new = ~revised[old[0]], ~revised[new[0]]
+    codes = old[0][same_old]
+    a, b = old[2][same_old], new[2][same_new]
+    differs = (old[1][same_old] != new[1][same_new]) | ((a != b) & ~(np.isnan(a) & np.isnan(b))).any(axis=1)
+    revised[codes[differs]] = True
+    return {stats.cities[i] for i in np.flatnonzero(revised)}
+
+
+def update_stats(stats, df, base=None, refetched_from=None):
+    """
+    Trạng thái thống kê của `df`
+
+    Args:
+        stats: Trạng thái của `base` (None = tính lại từ đầu)
+        df: DataFrame sau khi làm mới (xem load_weather_data với base)
+        base: DataFrame đã tính ra `stats`; khi có, thành phố nào có dòng cũ
+            bị ghi đè (xem revised_cities) được tính lại toàn bộ
+        refetched_from: Ngày tải lại của từng thành phố (xem revised_cities)
+
+    Returns:
+        RunningStats; khi đã có `stats` chỉ các dòng mới (và thành phố bị sửa) được tính rồi gộp vào
+    """
+    if stats is None:
+        return RunningStats.from_frame(df)
+    fresh = appended_rows(stats, df)
+    revised = revised_cities(stats, base, df, refetched_from) if base is not None else set()
+    if not revised:
+        return stats.merge(RunningStats.from_frame(fresh))
+
+    order = stats.cities
+    is_revised = df['city'].isin(list(revised))
+    fresh = pd.concat([fresh[~fresh['city'].isin(list(revised))], df[is_revised]])
+    merged = stats.subset([c for c in order if c not in revised]).merge(RunningStats.from_frame(fresh))
+    # Giữ thứ tự thành phố như trước; thành phố bị sửa mà không còn dòng nào thì bỏ
+    present = set(merged.cities)
+    return merged.subset([c for c in order if c in present] + [c for c in merged.cities if c not in set(order)])
+
+
+def read_published_stats(version):
+    """
+    Trạng thái thống kê lưu cùng một phiên bản đã công bố
+
+    Returns:
+        RunningStats hoặc None nếu phiên bản không có file thống kê
+    """
+    path = os.path.join(published_path(version), STATS_FILE)
+    if not os.path.exists(path):
+        return None
+    with np.load(path, allow_pickle=False) as data:
+        # Định dạng cũ (tương quan trên các dòng đủ mọi số đo): để tính lại
+        if 'cov_m2' not in data.files:
+            return None
+    return RunningStats.load(path)
@@ -0,0 +1,182 @@
+"""
+Bộ nhớ đệm LRU cho kết quả lọc và các tổng hợp suy ra từ chúng
+
+Dùng chung cho mọi phiên Streamlit: nhiều người dùng cùng xem bộ lọc mặc
+định, một thành phố hay một mùa thì chỉ lần đầu phải lọc và tính toán.
+Khoá gồm phiên bản dữ liệu và trạng thái bộ lọc đã chuẩn hoá
+(xem FilterIndex.normalize). Giới hạn theo tổng dung lượng ước tính và số mục.
+"""
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import streamlit as st
+
+# CONSTANTS
+MAX_BYTES = int(float(os.environ.get('WEATHER_SELECTION_CACHE_MB', 256)) * 1024 ** 2)
+MAX_ENTRIES = 64
+
+
+def estimate_nbytes(obj):
+    """Ước tính dung lượng (byte) của một kết quả lưu trong cache"""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(index=True, deep=False)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(obj, dict):
+        return sys.getsizeof(obj) + sum(estimate_nbytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sys.getsizeof(obj) + sum(estimate_nbytes(v) for v in obj)
+    return sys.getsizeof(obj)
+
+
+class _Entry:
+    __slots__ = ('df', 'derived', 'nbytes')
+
+    def __init__(self, df):
+        self.df = df
+        self.derived = {}
+        self.nbytes = estimate_nbytes(df)
+
+
+class SelectionCache:
+    """
+    LRU các DataFrame đã lọc, kèm các tổng hợp tính trên từng DataFrame đó
+
+    - get(key, compute): lấy DataFrame đã lọc theo khoá, tính nếu chưa có
+    - derive(df, name, compute): lấy tổng hợp `name` của một DataFrame do
+      get() trả về; DataFrame không nằm trong cache thì chỉ tính, không lưu
+
+    Khi vượt `max_bytes` hoặc `max_entries`, mục ít dùng nhất bị loại
+    (kèm toàn bộ tổng hợp của nó).
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES, max_entries=MAX_ENTRIES):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._keys_by_id = {}
+        self._nbytes = 0
+        self._counts = {'hits': 0, 'misses': 0, 'derived_hits': 0, 'derived_misses': 0, 'evictions': 0}
+        self._lock = threading.Lock()
+
+    def get(self, key, compute):
+        """
+        DataFrame đã lọc cho `key`
+
+        Args:
+            key: Khoá hashable (phiên bản dữ liệu + bộ lọc đã chuẩn hoá)
+            compute: Hàm không tham số trả về DataFrame đã lọc
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counts['hits'] += 1
+                return entry.df
+            self._counts['misses'] += 1
+
+        df = compute()
+
+        with self._lock:
+            # Phiên khác có thể đã tính xong trước
+            entry = self._entries.get(key)
+            if entry is not None:
+                return entry.df
+            entry = _Entry(df)
+            self._entries[key] = entry
+            self._keys_by_id[id(df)] = key
+            self._nbytes += entry.nbytes
+            self._evict()
+        return df
+
+    def key_of(self, df):
+        """Khoá của df nếu df là DataFrame đã lọc đang nằm trong cache, ngược lại None"""
+        with self._lock:
+            key = self._keys_by_id.get(id(df))
+            entry = self._entries.get(key) if key is not None else None
+            return key if entry is not None and entry.df is df else None
+
+    def derive(self, df, name, compute):
+        """
+        Tổng hợp `name` tính từ một DataFrame do get() trả về
+
+        Args:
+            df: DataFrame đã lọc
+            name: Tên tổng hợp, phải mã hoá đủ các tham số ảnh hưởng kết quả
+            compute: Hàm không tham số trả về kết quả tổng hợp
+        """
+        with self._lock:
+            key = self._keys_by_id.get(id(df))
+            entry = self._entries.get(key) if key is not None else None
+            if entry is None or entry.df is not df:
+                entry = None
+            elif name in entry.derived:
+                self._entries.move_to_end(key)
+                self._counts['derived_hits'] += 1
+                return entry.derived[name]
+            self._counts['derived_misses'] += 1
+
+        result = compute()
+
+        if entry is not None:
+            with self._lock:
+                if self._entries.get(key) is entry and name not in entry.derived:
+                    entry.derived[name] = result
+                    nbytes = estimate_nbytes(result)
+                    entry.nbytes += nbytes
+                    self._nbytes += nbytes
+                    self._evict(keep=key)
+        return result
+
+    def _evict(self, keep=None):
+        """Loại mục ít dùng nhất cho tới khi nằm trong giới hạn (gọi khi đang giữ lock)"""
+        while self._entries and (self._nbytes > self.max_bytes or len(self._entries) > self.max_entries):
+            key = next(iter(self._entries))
+            if key == keep:
+                if len(self._entries) == 1:
+                    break
+                self._entries.move_to_end(key)
+                continue
+            entry = self._entries.pop(key)
+            self._keys_by_id.pop(id(entry.df), None)
+            self._nbytes -= entry.nbytes
+            self._counts['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_id.clear()
+            self._nbytes = 0
+
+    def stats(self):
+        """
+        Thống kê sử dụng cache
+
+        Returns:
+            Dict số lần trúng/trượt, tỉ lệ trúng, số mục và dung lượng hiện tại
+        """
+        with self._lock:
+            counts = dict(self._counts)
+            lookups = counts['hits'] + counts['misses']
+            derived_lookups = counts['derived_hits'] + counts['derived_misses']
+            return {
+                **counts,
+                'hit_rate': counts['hits'] / lookups if lookups else 0.0,
+                'derived_hit_rate': counts['derived_hits'] / derived_lookups if derived_lookups else 0.0,
+                'entries': len(self._entries),
+                'nbytes': self._nbytes,
+            }
+
+
+@st.cache_resource(show_spinner=False)
+def get_selection_cache():
+    """SelectionCache dùng chung cho mọi phiên"""
+    return SelectionCache()
+
+
+def derive(df, name, compute):
+    """Tổng hợp `name` của df, lấy từ cache dùng chung nếu df là kết quả lọc đã cache"""
+    return get_selection_cache().derive(df, name, compute)
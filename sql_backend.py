@@ -0,0 +1,285 @@
+"""
+Backend truy vấn SQL (DuckDB) trên một phiên bản đã công bố
+
+Lọc (filter_data), thống kê KPI (get_statistics) và các phép gộp của tab
+(group_agg) được viết thành câu SQL chạy trên DuckDB: đọc thẳng các file
+Parquet phân vùng của phiên bản, chỉ đọc các cột cần dùng, bỏ qua phân
+vùng (thành phố, năm) ngoài bộ lọc và chạy song song trên nhiều luồng,
+không tạo DataFrame trung gian.
+
+Kết quả có cùng định dạng với đường pandas (read_published / filter_data,
+data_fetcher.get_statistics, aggregates.group_agg trên dữ liệu ngày), nên
+hai backend kiểm tra chéo được (xem benchmarks/bench_sql.py).
+
+DuckDB là phụ thuộc tuỳ chọn (pip install duckdb); bật trong dashboard
+bằng biến môi trường WEATHER_QUERY_BACKEND=duckdb.
+"""
+
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_fetcher import FEATURE_BINS, SEASONS
+from data_index import PartitionedIndex
+from data_store import DATASET_DIR, DATASET_FILE, published_files, published_path
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+# CONSTANTS
+# Backend lọc/gộp của dashboard: 'pandas' (mặc định) hoặc 'duckdb'
+QUERY_BACKEND = os.environ.get('WEATHER_QUERY_BACKEND', 'pandas')
+# Số luồng DuckDB dùng cho mỗi truy vấn
+SQL_THREADS = int(os.environ.get('WEATHER_SQL_THREADS', os.cpu_count() or 1))
+
+# Phép gộp của group_agg -> hàm SQL (bỏ qua NULL như pandas bỏ qua NaN)
+_SQL_AGG = {
+    'sum': 'sum', 'mean': 'avg', 'min': 'min', 'max': 'max',
+    'count': 'count', 'std': 'stddev_samp',
+}
+# Tuỳ chọn đọc dataset phân vùng city=<tên>/year=<năm>
+_HIVE_OPTIONS = "hive_partitioning = true, hive_types = {'year': INTEGER}"
+# Các chiều dạng category và danh mục cố định của chúng
+_CATEGORIES = {
+    'season': (SEASONS, False),
+    **{col: (labels, True) for col, (_, _, labels) in FEATURE_BINS.items()},
+}
+
+
+# HELPER FUNCTIONS
+def sql_available():
+    """DuckDB đã được cài đặt"""
+    return duckdb is not None
+
+
+def _quote(name):
+    """Tên cột trong câu SQL"""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _where(cities=None, date_range=None, season=None):
+    """
+    Mệnh đề WHERE và tham số cho bộ lọc
+
+    Điều kiện theo năm (cột phân vùng) giúp DuckDB bỏ qua cả các file ngoài
+    khoảng ngày, giống _filter_expression của data_store.
+    """
+    clauses, params = [], []
+    if cities:
+        clauses.append('list_contains(?, city)')
+        params.append(list(cities))
+    if date_range:
+        start, end = pd.Timestamp(date_range[0]), pd.Timestamp(date_range[1])
+        clauses.append('year BETWEEN ? AND ? AND date BETWEEN ? AND ?')
+        params += [start.year, end.year, start.to_pydatetime(), end.to_pydatetime()]
+    if season and season != 'Tất cả':
+        clauses.append('season = ?')
+        params.append(season)
+    return (' WHERE ' + ' AND '.join(clauses)) if clauses else '', params
+
+
+class SQLBackend(PartitionedIndex):
+    """
+    Lọc và gộp dữ liệu của một phiên bản đã công bố bằng DuckDB
+
+    Cùng giao diện với PartitionedIndex (select, normalize, first_date, ...),
+    nên dùng được ở mọi chỗ nhận chỉ mục lọc; thêm get_statistics và
+    group_agg tính thẳng trên file thay vì trên DataFrame đã lọc.
+    """
+
+    def __init__(self, version, threads=SQL_THREADS):
+        if duckdb is None:
+            raise ImportError('Backend SQL cần gói duckdb (pip install duckdb)')
+        super().__init__(version)
+
+        path = published_path(version)
+        self._partitioned = os.path.isdir(os.path.join(path, DATASET_DIR))
+        if self._partitioned:
+            pattern = os.path.join(path, DATASET_DIR, '*', '*', '*.parquet')
+            source = f"read_parquet('{pattern}', {_HIVE_OPTIONS})"
+        else:
+            # Phiên bản cũ một file: không có cột phân vùng year
+            source = (f"(SELECT *, year(date)::INTEGER AS year "
+                      f"FROM read_parquet('{os.path.join(path, DATASET_FILE)}'))")
+
+        # Giữ metadata các file Parquet giữa các truy vấn
+        self._connection = duckdb.connect(config={'threads': threads, 'enable_object_cache': True})
+        self._connection.execute(f'CREATE VIEW weather AS SELECT * FROM {source}')
+        self.columns = [row[0] for row in self._connection.execute('DESCRIBE weather').fetchall()]
+
+        # Cột category đọc ra dạng ENUM: DuckDB trả thẳng pandas Categorical thay vì chuỗi
+        regions = self._connection.execute('SELECT DISTINCT region FROM weather ORDER BY 1').fetchall()
+        categories = {
+            'city': self.cities,
+            'region': [row[0] for row in regions if row[0] is not None],
+            **{col: labels for col, (labels, _) in _CATEGORIES.items()},
+        }
+        self._enums = {}
+        for col, labels in categories.items():
+            if col in self.columns and labels:
+                self._connection.execute(f'CREATE TYPE {col}_enum AS ENUM (SELECT unnest(?::VARCHAR[]))', [labels])
+                self._enums[col] = f'{col}_enum'
+        self._local = threading.local()
+
+    def _query(self, sql, params):
+        """Chạy truy vấn trên cursor riêng của luồng hiện tại (các phiên Streamlit chạy song song)"""
+        cursor = getattr(self._local, 'cursor', None)
+        if cursor is None:
+            cursor = self._local.cursor = self._connection.cursor()
+        return cursor.execute(sql, params).df()
+
+    def _source(self, cities=None, date_range=None):
+        """
+        Nguồn dữ liệu (mệnh đề FROM) và tham số cho bộ lọc
+
+        Danh sách file được chọn trước theo (thành phố, năm) như read_published,
+        nên DuckDB không phải liệt kê mọi phân vùng của lịch sử ở mỗi truy vấn.
+        """
+        if not self._partitioned:
+            return 'weather', []
+        start, end = date_range if date_range else (None, None)
+        files = published_files(self.version, cities or None, start, end)
+        if not files:
+            return '(SELECT * FROM weather LIMIT 0)', []
+        return f'read_parquet(?, {_HIVE_OPTIONS})', [files]
+
+    def _column(self, col):
+        """Biểu thức SELECT của một cột (ép sang ENUM nếu là cột category)"""
+        if col in self._enums:
+            return f'CAST({_quote(col)} AS {self._enums[col]}) AS {_quote(col)}'
+        return _quote(col)
+
+    def _restore_dtypes(self, df):
+        """Category như đường pandas: chỉ các cột phân loại (FEATURE_BINS) có thứ tự"""
+        for col in df.columns:
+            if col in self._enums:
+                ordered = col in _CATEGORIES and _CATEGORIES[col][1]
+                df[col] = df[col].cat.as_ordered() if ordered else df[col].cat.as_unordered()
+        return df
+
+    def select(self, cities=None, date_range=None, season=None):
+        """
+        Lọc dữ liệu bằng một truy vấn SQL
+
+        Args:
+            cities: List thành phố cần lọc (None/rỗng = tất cả)
+            date_range: Tuple (start_date, end_date), bao gồm hai đầu
+            season: Mùa cần lọc ('Tất cả' hoặc None = không lọc)
+
+        Returns:
+            DataFrame sắp xếp theo (thành phố, ngày), cùng cột với read_published
+        """
+        source, params = self._source(cities, date_range)
+        where, where_params = _where(cities, date_range, season)
+        columns = ['city'] + [col for col in self.columns if col not in ('city', 'year')]
+        select = ', '.join(self._column(col) for col in columns)
+        df = self._query(f'SELECT {select} FROM {source}{where} ORDER BY date', params + where_params)
+        if df.empty:
+            return pd.DataFrame()
+
+        df = self._restore_dtypes(df)
+        # Sắp theo thứ tự danh mục thành phố (ngày đã tăng dần, sắp ổn định)
+        order = np.argsort(df['city'].cat.codes.to_numpy(), kind='stable')
+        return df.iloc[order].reset_index(drop=True)
+
+    def group_agg(self, by, spec, cities=None, date_range=None, season=None):
+        """
+        group_agg (aggregates.py) trên dữ liệu ngày của bộ lọc, tính bằng SQL
+
+        Args:
+            by: List chiều cần gộp (city, region, season, month, ...); None = gộp toàn bộ
+            spec: Dict tên cột kết quả -> (cột số đo, 'sum'|'mean'|'min'|'max'|'count'|'std')
+
+        Returns:
+            DataFrame index theo `by` (hoặc Series nếu by là None), cột theo spec
+        """
+        return self.group_aggs([(by, spec)], cities, date_range, season)[0]
+
+    def group_aggs(self, aggregations, cities=None, date_range=None, season=None):
+        """
+        Nhiều phép group_agg trên cùng bộ lọc trong một lần quét (GROUPING SETS)
+
+        Args:
+            aggregations: List (by, spec) như tham số của group_agg
+
+        Returns:
+            List kết quả, cùng thứ tự và định dạng với group_agg
+        """
+        keys = list(dict.fromkeys(col for by, _ in aggregations for col in by or []))
+        measures = list(dict.fromkeys(m for _, spec in aggregations for m in spec.values()))
+        aliases = {m: f'agg_{i}' for i, m in enumerate(measures)}
+
+        # Ép kiểu ENUM trước khi gộp, để các chiều trả về dạng category
+        inner = [self._column(col) for col in keys]
+        inner += [_quote(col) for col in dict.fromkeys(col for col, _ in measures) if col not in keys]
+        groups = dict.fromkeys(tuple(by or ()) for by, _ in aggregations)
+        sets = ', '.join('(' + ', '.join(_quote(col) for col in group) + ')' for group in groups)
+        grouping = f'GROUPING({", ".join(_quote(col) for col in keys)})' if keys else '0'
+        select = [_quote(col) for col in keys] + [f'{grouping} AS grouping_id'] + [
+            f'{_SQL_AGG[how]}({_quote(col)})::DOUBLE AS {aliases[(col, how)]}' for col, how in measures
+        ]
+        source, params = self._source(cities, date_range)
+        where, where_params = _where(cities, date_range, season)
+        result = self._restore_dtypes(self._query(
+            f'SELECT {", ".join(select)} FROM (SELECT {", ".join(inner)} FROM {source}{where}) '
+            f'GROUP BY GROUPING SETS ({sets})', params + where_params
+        ))
+
+        frames = []
+        for by, spec in aggregations:
+            # Bit của GROUPING() bật với các chiều không thuộc nhóm
+            grouping_id = sum(1 << (len(keys) - 1 - i) for i, col in enumerate(keys) if col not in (by or []))
+            rows = result[result['grouping_id'] == grouping_id]
+            if by is None:
+                frames.append(pd.Series({
+                    name: rows[aliases[m]].iloc[0] if len(rows) else np.nan for name, m in spec.items()
+                }, dtype='float64'))
+                continue
+            index = pd.MultiIndex.from_frame(rows[by]) if len(by) > 1 else pd.Index(rows[by[0]])
+            frames.append(pd.DataFrame(
+                {name: rows[aliases[m]].to_numpy() for name, m in spec.items()}, index=index
+            ).sort_index())
+        return frames
+
+    def get_statistics(self, cities=None, date_range=None, season=None):
+        """
+        get_statistics (data_fetcher.py) của bộ lọc, tính bằng SQL
+
+        Returns:
+            Dictionary chứa các thống kê (rỗng nếu bộ lọc không có dòng nào)
+        """
+        by_city = self.group_agg(['city'], {
+            'temp_mean': ('temp_mean', 'mean'),
+            'rainfall': ('rainfall', 'sum'),
+            'temp_max': ('temp_max', 'max'),
+            'temp_min': ('temp_min', 'min'),
+            'humidity_sum': ('humidity', 'sum'),
+            'humidity_count': ('humidity', 'count'),
+            'rainfall_count': ('rainfall', 'count'),
+            'windspeed_sum': ('windspeed', 'sum'),
+            'windspeed_count': ('windspeed', 'count'),
+            'temp_sum': ('temp_mean', 'sum'),
+            'temp_count': ('temp_mean', 'count'),
+        }, cities, date_range, season)
+        if by_city.empty:
+            return {}
+
+        # Tổng toàn bộ gộp lại từ kết quả theo thành phố, không quét dữ liệu lần hai
+        totals = by_city.sum()
+        return {
+            'avg_temp': totals['temp_sum'] / totals['temp_count'],
+            'max_temp': by_city['temp_max'].max(),
+            'min_temp': by_city['temp_min'].min(),
+            'avg_humidity': totals['humidity_sum'] / totals['humidity_count'],
+            'total_rainfall': totals['rainfall'],
+            'avg_rainfall': totals['rainfall'] / totals['rainfall_count'],
+            'avg_windspeed': totals['windspeed_sum'] / totals['windspeed_count'],
+            'hottest_city': by_city['temp_mean'].idxmax(),
+            'coldest_city': by_city['temp_mean'].idxmin(),
+            'rainiest_city': by_city['rainfall'].idxmax(),
+            'driest_city': by_city['rainfall'].idxmin(),
+        }
@@ -5,6 +5,8 @@ Tab 5: So Sánh & Tương Quan
 import streamlit as st
 import pandas as pd
 from scipy import stats
+from aggregates import group_agg
+from figure_cache import cached_figure
 from visualizations import (
     create_correlation_heatmap,
     create_radar_chart,
@@ -12,8 +14,16 @@ from visualizations import (
     create_3d_scatter
 )
 
-def render_tab_comparison(df_filtered):
-    """Render tab so sánh & tương quan"""
+def render_tab_comparison(df_filtered, cube, city_stats, corr_matrix):
+    """
+    Render tab so sánh & tương quan
+    
+    Args:
+        df_filtered: Dữ liệu ngày đã lọc
+        cube: Lát cắt khối tổng hợp của cùng bộ lọc
+        city_stats: Thống kê theo thành phố của cùng bộ lọc (PrefixIndex.select)
+        corr_matrix: Ma trận tương quan của các số đo trong cùng bộ lọc
+    """
     
     st.header("🔍 So Sánh & Phân Tích Tương Quan")
     
@@ -33,12 +43,13 @@ def render_tab_comparison(df_filtered):
     }
     
     # Check if all columns exist
-    available_vars = [var for var in corr_vars if var in df_filtered.columns]
+    available_vars = [var for var in corr_vars if var in corr_matrix.columns]
     
     if len(available_vars) >= 2:
-        # Rename columns để hiển thị tiếng Việt
-        df_for_heatmap = df_filtered[available_vars].rename(columns=var_labels)
-        fig = create_correlation_heatmap(df_for_heatmap, df_for_heatmap.columns.tolist())
+        # Rename để hiển thị tiếng Việt
+        matrix = corr_matrix.loc[available_vars, available_vars].rename(index=var_labels, columns=var_labels)
+        fig = cached_figure(df_filtered, 'comparison_heatmap',
+                            lambda: create_correlation_heatmap(None, matrix.columns.tolist(), corr_matrix=matrix))
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.warning("⚠️ Không đủ dữ liệu để tạo ma trận tương quan")
@@ -48,7 +59,7 @@ def render_tab_comparison(df_filtered):
     
     st.subheader(" So Sánh 2 Thành Phố")
     
-    selected_cities = df_filtered['city'].unique().tolist()
+    selected_cities = city_stats['city'].tolist()
     
     if len(selected_cities) >= 2:
         col1, col2 = st.columns(2)
@@ -58,11 +69,24 @@ def render_tab_comparison(df_filtered):
         with col2:
             city2 = st.selectbox("Thành phố 2", selected_cities, index=min(1, len(selected_cities)-1), key='city2')
         
-        df_city1 = df_filtered[df_filtered['city'] == city1]
-        df_city2 = df_filtered[df_filtered['city'] == city2]
+        # Chỉ số của từng thành phố, đọc từ thống kê theo thành phố (không quét dữ liệu ngày)
+        profiles = group_agg(city_stats, ['city'], {
+            'temp_mean': ('temp_mean', 'mean'),
+            'temp_max': ('temp_max', 'max'),
+            'temp_min': ('temp_min', 'min'),
+            'humidity': ('humidity', 'mean'),
+            'rainfall': ('rainfall', 'mean'),
+            'rainfall_sum': ('rainfall', 'sum'),
+            'temp_range': ('temp_range', 'mean'),
+            'temp_std': ('temp_mean', 'std'),
+            'temp_count': ('temp_mean', 'count')
+        })
+        profile1 = profiles.loc[city1]
+        profile2 = profiles.loc[city2]
         
         # Radar Chart
-        fig = create_radar_chart(df_city1, df_city2, city1, city2)
+        fig = cached_figure(df_filtered, ('comparison_radar', city1, city2),
+                            lambda: create_radar_chart(profile1, profile2, city1, city2))
         st.plotly_chart(fig, use_container_width=True)
         
         # Comparison Table
@@ -72,20 +96,20 @@ def render_tab_comparison(df_filtered):
             'Chỉ số': ['Nhiệt độ TB', 'Nhiệt độ Max', 'Nhiệt độ Min', 'Độ ẩm TB', 
                        'Tổng mưa', 'Biên độ nhiệt TB'],
             city1: [
-                f"{df_city1['temp_mean'].mean():.1f}°C",
-                f"{df_city1['temp_max'].max():.1f}°C",
-                f"{df_city1['temp_min'].min():.1f}°C",
-                f"{df_city1['humidity'].mean():.0f}%",
-                f"{df_city1['rainfall'].sum():.0f}mm",
-                f"{df_city1['temp_range'].mean():.1f}°C"
+                f"{profile1['temp_mean']:.1f}°C",
+                f"{profile1['temp_max']:.1f}°C",
+                f"{profile1['temp_min']:.1f}°C",
+                f"{profile1['humidity']:.0f}%",
+                f"{profile1['rainfall_sum']:.0f}mm",
+                f"{profile1['temp_range']:.1f}°C"
             ],
             city2: [
-                f"{df_city2['temp_mean'].mean():.1f}°C",
-                f"{df_city2['temp_max'].max():.1f}°C",
-                f"{df_city2['temp_min'].min():.1f}°C",
-                f"{df_city2['humidity'].mean():.0f}%",
-                f"{df_city2['rainfall'].sum():.0f}mm",
-                f"{df_city2['temp_range'].mean():.1f}°C"
+                f"{profile2['temp_mean']:.1f}°C",
+                f"{profile2['temp_max']:.1f}°C",
+                f"{profile2['temp_min']:.1f}°C",
+                f"{profile2['humidity']:.0f}%",
+                f"{profile2['rainfall_sum']:.0f}mm",
+                f"{profile2['temp_range']:.1f}°C"
             ]
         }
         
@@ -95,9 +119,10 @@ def render_tab_comparison(df_filtered):
         with st.expander(" Kiểm Định Thống Kê"):
             st.write("### T-test: So sánh nhiệt độ trung bình 2 thành phố")
             
-            t_stat, p_value = stats.ttest_ind(
-                df_city1['temp_mean'].dropna(),
-                df_city2['temp_mean'].dropna()
+            # T-test hai mẫu (phương sai bằng nhau) từ trung bình, độ lệch chuẩn và cỡ mẫu
+            t_stat, p_value = stats.ttest_ind_from_stats(
+                profile1['temp_mean'], profile1['temp_std'], profile1['temp_count'],
+                profile2['temp_mean'], profile2['temp_std'], profile2['temp_count']
             )
             
             st.write(f"**T-statistic:** {t_stat:.4f}")
@@ -117,7 +142,7 @@ def render_tab_comparison(df_filtered):
     st.subheader(" Parallel Coordinates - So Sánh Đa Chiều")
     
     if len(selected_cities) > 0:
-        fig = create_parallel_coordinates(df_filtered)
+        fig = cached_figure(df_filtered, 'comparison_parallel', lambda: create_parallel_coordinates(cube))
         st.plotly_chart(fig, use_container_width=True)
     
     
@@ -126,5 +151,5 @@ def render_tab_comparison(df_filtered):
     st.subheader(" Scatter 3D - Nhiệt Độ × Độ Ẩm × Mưa")
     
     if len(selected_cities) > 0:
-        fig = create_3d_scatter(df_filtered)
+        fig = cached_figure(df_filtered, 'comparison_3d', lambda: create_3d_scatter(cube))
         st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
@@ -5,26 +5,36 @@ Tab 6: Bản Đồ Tương Tác
 import streamlit as st
 import folium
 from streamlit_folium import folium_static
+from aggregates import group_agg
+from data_fetcher import get_city_table
+from figure_cache import cached_figure
+from selection_cache import derive
 from visualizations import create_scatter_map
 
-def render_tab_map(df_filtered):
-    """Render tab bản đồ"""
+def summarize_by_city(cube):
+    """Trung bình / tổng theo thành phố kèm toạ độ"""
+    # Calculate average by city
+    df_map = group_agg(cube, ['city'], {
+        'temp_mean': ('temp_mean', 'mean'),
+        'rainfall': ('rainfall', 'sum'),
+        'humidity': ('humidity', 'mean')
+    }).reset_index()
+    
+    # Toạ độ lấy từ bảng thành phố, không lưu lặp lại trên từng dòng
+    df_map['city'] = df_map['city'].astype(str)
+    return df_map.merge(get_city_table()[['city', 'lat', 'lon']], on='city', how='left')
+
+def render_tab_map(df_filtered, cube):
+    """Render tab bản đồ (cube: lát cắt khối tổng hợp của cùng bộ lọc)"""
     
     st.header("🗺️ Bản Đồ Tương Tác")
     
-    # Calculate average by city
-    df_map = df_filtered.groupby('city').agg({
-        'temp_mean': 'mean',
-        'rainfall': 'sum',
-        'humidity': 'mean',
-        'lat': 'first',
-        'lon': 'first'
-    }).reset_index()
+    df_map = derive(df_filtered, 'map_summary', lambda: summarize_by_city(cube))
     
     # PLOTLY SCATTER MAP
     st.subheader(" Bản Đồ Nhiệt Độ Trung Bình")
     
-    fig = create_scatter_map(df_map)
+    fig = cached_figure(df_filtered, 'map_scatter', lambda: create_scatter_map(df_map))
     st.plotly_chart(fig, use_container_width=True)
     
     # FOLIUM MAP
@@ -4,6 +4,8 @@ Tab 1: Tổng Quan & Thống Kê
 import networkx as nx
 import streamlit as st
 from data_fetcher import get_statistics
+from figure_cache import cached_figure
+from selection_cache import derive
 from visualizations import (
     create_histogram, 
     create_boxplot, 
@@ -12,13 +14,20 @@ from visualizations import (
     create_network_graph
 )
 
-def render_tab_overview(df_filtered):
-    """Render tab tổng quan"""
+def render_tab_overview(df_filtered, cube, city_stats):
+    """
+    Render tab tổng quan
+    
+    Args:
+        df_filtered: Dữ liệu ngày đã lọc
+        cube: Lát cắt khối tổng hợp của cùng bộ lọc
+        city_stats: Thống kê theo thành phố của cùng bộ lọc (PrefixIndex.select)
+    """
     
     st.header("📊 Thống Kê Tổng Quan")
     
     # KPI METRICS
-    stats = get_statistics(df_filtered)
+    stats = derive(df_filtered, 'statistics', lambda: get_statistics(city_stats))
     
     col1, col2, col3, col4 = st.columns(4)
     
@@ -53,37 +62,39 @@ def render_tab_overview(df_filtered):
     
     with col1:
         st.subheader(" Histogram - Phân Bố Nhiệt Độ")
-        fig = create_histogram(
+        fig = cached_figure(df_filtered, 'overview_histogram', lambda: create_histogram(
             df_filtered, 
             'temp_mean',
             'Phân bố nhiệt độ trung bình',
             'Nhiệt độ (°C)'
-        )
+        ))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.subheader(" Boxplot - Nhiệt Độ Theo Thành Phố")
-        fig = create_boxplot(
+        fig = cached_figure(df_filtered, 'overview_boxplot', lambda: create_boxplot(
             df_filtered,
             'city',
             'temp_mean',
-            'So sánh nhiệt độ các thành phố'
-        )
+            'So sánh nhiệt độ các thành phố',
+            cube=cube
+        ))
         st.plotly_chart(fig, use_container_width=True)
     
     # Violin Plot
     st.subheader(" Violin Plot - Phân Bố Chi Tiết")
-    fig = create_violin_plot(
+    fig = cached_figure(df_filtered, 'overview_violin', lambda: create_violin_plot(
         df_filtered,
         'city',
         'temp_mean',
-        'Phân bố nhiệt độ chi tiết (Violin Plot)'
-    )
+        'Phân bố nhiệt độ chi tiết (Violin Plot)',
+        cube=cube
+    ))
     st.plotly_chart(fig, use_container_width=True)
     
     # NETWORK GRAPH
     st.subheader(" Network Graph - Mối Liên Hệ Thời Tiết")
-    fig_net = create_network_graph(df_filtered)
+    fig_net = cached_figure(df_filtered, 'overview_network', lambda: create_network_graph(cube))
     if fig_net:
         st.plotly_chart(fig_net, use_container_width=True)
     
@@ -6,38 +6,42 @@ import streamlit as st
 import plotly.express as px
 from visualizations import (
     create_treemap,
-    create_sunburst
+    create_sunburst,
+    limit_cities
 )
+from aggregates import group_agg
+from figure_cache import cached_figure
 
-def render_tab_rainfall(df_filtered):
-    """Render tab phân tích độ ẩm & mưa"""
+def render_tab_rainfall(df_filtered, cube):
+    """Render tab phân tích độ ẩm & mưa (cube: lát cắt khối tổng hợp của cùng bộ lọc)"""
     
     st.header("💧 Phân Tích Độ Ẩm & Lượng Mưa")
     
     # TREEMAP
     st.subheader(" Treemap - Tổng Lượng Mưa Theo Thành Phố")
     
-    fig = create_treemap(
-        df_filtered,
+    fig = cached_figure(df_filtered, 'rainfall_treemap', lambda: create_treemap(
+        cube,
         ['region', 'city'],
         'rainfall',
         'Phân bố lượng mưa (Treemap)'
-    )
+    ))
     st.plotly_chart(fig, use_container_width=True)
     
     # SUNBURST
     st.subheader(" Sunburst - Phân Bố Mưa Theo Mùa & Thành Phố")
     
-    fig = create_sunburst(df_filtered)
+    fig = cached_figure(df_filtered, 'rainfall_sunburst', lambda: create_sunburst(cube))
     st.plotly_chart(fig, use_container_width=True)
     
     # RAINFALL STATISTICS
+    rain_by_city = group_agg(cube, ['city'], {'rainfall': ('rainfall', 'sum')})['rainfall']
     col1, col2 = st.columns(2)
     
     with col1:
         st.subheader(" Top Thành Phố Mưa Nhiều")
-        top_rain = df_filtered.groupby('city')['rainfall'].sum().sort_values(ascending=False).head(5)
-        fig = px.bar(
+        top_rain = rain_by_city.sort_values(ascending=False).head(5)
+        fig = cached_figure(df_filtered, 'rainfall_top_bar', lambda: px.bar(
             x=top_rain.values,
             y=top_rain.index,
             orientation='h',
@@ -45,27 +49,31 @@ def render_tab_rainfall(df_filtered):
             labels={'x': 'Tổng lượng mưa (mm)', 'y': 'Thành phố'},
             color=top_rain.values,
             color_continuous_scale='Blues'
-        )
+        ))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         st.subheader(" Độ Ẩm Theo Mùa")
-        df_hum = df_filtered.groupby(['season', 'city'])['humidity'].mean().reset_index()
-        fig = px.line_polar(
-            df_hum,
-            r='humidity',
-            theta='season',
-            color='city',
-            line_close=True,
-            title='Độ ẩm trung bình theo mùa (Radar Chart)'
-        )
+        def build_humidity_radar():
+            df_top, title = limit_cities(cube, 'humidity', 'Độ ẩm trung bình theo mùa (Radar Chart)')
+            df_hum = group_agg(df_top, ['season', 'city'], {'humidity': ('humidity', 'mean')}).reset_index()
+            return px.line_polar(
+                df_hum,
+                r='humidity',
+                theta='season',
+                color='city',
+                line_close=True,
+                title=title
+            )
+        
+        fig = cached_figure(df_filtered, 'rainfall_humidity_radar', build_humidity_radar)
         st.plotly_chart(fig, use_container_width=True)
     
     # INSIGHTS
     with st.expander("💡 Insights về mưa"):
-        rainiest = df_filtered.groupby('city')['rainfall'].sum().idxmax()
-        driest = df_filtered.groupby('city')['rainfall'].sum().idxmin()
-        rainiest_season = df_filtered.groupby('season')['rainfall'].sum().idxmax()
+        rainiest = rain_by_city.idxmax()
+        driest = rain_by_city.idxmin()
+        rainiest_season = group_agg(cube, ['season'], {'rainfall': ('rainfall', 'sum')})['rainfall'].idxmax()
         
         st.write(f"🌧️ **Thành phố mưa nhiều nhất:** {rainiest}")
         st.write(f"☀️ **Thành phố ít mưa nhất:** {driest}")
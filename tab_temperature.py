@@ -7,30 +7,38 @@ import plotly.express as px
 from visualizations import (
     create_scatter_with_regression,
     create_heatmap_calendar,
-    create_boxplot
+    create_boxplot,
+    MAX_CHART_CITIES
 )
+from aggregates import group_agg
+from figure_cache import cached_figure
 
-def render_tab_temperature(df_filtered):
-    """Render tab phân tích nhiệt độ"""
+def render_tab_temperature(df_filtered, cube):
+    """Render tab phân tích nhiệt độ (cube: lát cắt khối tổng hợp của cùng bộ lọc)"""
     
     st.header("🌡️ Phân Tích Chi Tiết Nhiệt Độ")
     
     # SCATTER WITH REGRESSION
     st.subheader(" Scatter Plot - Nhiệt Độ vs Độ Ẩm (với Hồi Quy)")
     
-    fig = create_scatter_with_regression(
-        df_filtered,
-        'temp_mean',
-        'humidity',
-        'city',
-        'rainfall'
-    )
-    # Đổi title của biểu đồ sang tiếng Việt
-    fig.update_layout(
-        title='Mối quan hệ Nhiệt độ - Độ ẩm',
-        xaxis_title='Nhiệt độ trung bình (°C)',
-        yaxis_title='Độ ẩm (%)'
-    )
+    def build_scatter():
+        fig = create_scatter_with_regression(
+            df_filtered,
+            'temp_mean',
+            'humidity',
+            'city',
+            'rainfall',
+            cube=cube
+        )
+        # Đổi title của biểu đồ sang tiếng Việt
+        fig.update_layout(
+            title='Mối quan hệ Nhiệt độ - Độ ẩm',
+            xaxis_title='Nhiệt độ trung bình (°C)',
+            yaxis_title='Độ ẩm (%)'
+        )
+        return fig
+    
+    fig = cached_figure(df_filtered, 'temperature_scatter', build_scatter)
     st.plotly_chart(fig, use_container_width=True)
     
     # Calculate correlation
@@ -43,7 +51,8 @@ def render_tab_temperature(df_filtered):
     selected_cities = df_filtered['city'].unique().tolist()
     if selected_cities:
         city = st.selectbox("Chọn thành phố xem heatmap:", selected_cities, key='heatmap_city')
-        fig = create_heatmap_calendar(df_filtered, city)
+        fig = cached_figure(df_filtered, ('temperature_calendar', city),
+                            lambda: create_heatmap_calendar(df_filtered, city))
         st.plotly_chart(fig, use_container_width=True)
     
     # TEMPERATURE RANGE ANALYSIS
@@ -52,24 +61,31 @@ def render_tab_temperature(df_filtered):
     col1, col2 = st.columns(2)
     
     with col1:
-        fig = create_boxplot(
+        fig = cached_figure(df_filtered, 'temperature_boxplot', lambda: create_boxplot(
             df_filtered,
             'season',
             'temp_range',
             'Biên độ nhiệt theo mùa',
             'region'
-        )
+        ))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
-        df_range = df_filtered.groupby('city')['temp_range'].mean().sort_values(ascending=False)
-        fig = px.bar(
-            x=df_range.values,
-            y=df_range.index,
-            orientation='h',
-            title='Biên độ nhiệt trung bình theo thành phố',
-            labels={'x': 'Biên độ (°C)', 'y': 'Thành phố'},
-            color=df_range.values,
-            color_continuous_scale='Reds'
-        )
+        def build_range_bar():
+            df_range = group_agg(cube, ['city'], {'temp_range': ('temp_range', 'mean')})['temp_range'].sort_values(ascending=False)
+            title = 'Biên độ nhiệt trung bình theo thành phố'
+            if len(df_range) > MAX_CHART_CITIES:
+                title = f'{title} (top {MAX_CHART_CITIES}/{len(df_range)} thành phố)'
+                df_range = df_range.head(MAX_CHART_CITIES)
+            return px.bar(
+                x=df_range.values,
+                y=df_range.index,
+                orientation='h',
+                title=title,
+                labels={'x': 'Biên độ (°C)', 'y': 'Thành phố'},
+                color=df_range.values,
+                color_continuous_scale='Reds'
+            )
+        
+        fig = cached_figure(df_filtered, 'temperature_range_bar', build_range_bar)
         st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
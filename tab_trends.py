@@ -3,40 +3,132 @@ Tab 2: Xu Hướng Thời Gian
 """
 
 import streamlit as st
+from datetime import timedelta
+from aggregates import group_agg
+from data_fetcher import DATA_TTL, read_hourly
+from data_store import HOURLY_STORE, stored_date_ranges
+from figure_cache import cached_figure
+from downsample import CHART_WIDTH_PX, minmax_downsample
 from visualizations import (
+    MAX_CHART_CITIES,
     create_line_chart,
     create_area_chart,
     create_seasonal_bar
 )
 
-def render_tab_trends(df_filtered):
-    """Render tab xu hướng thời gian"""
+# Số ngày mặc định của cửa sổ xem dữ liệu theo giờ
+HOURLY_WINDOW_DAYS = 14
+
+
+@st.cache_data(show_spinner=False, max_entries=32, ttl=DATA_TTL)
+def load_hourly_window(cities, start, end, column, width=CHART_WIDTH_PX):
+    """
+    Dữ liệu theo giờ của cửa sổ đang xem
+
+    Chỉ đọc các phân vùng và cột cần thiết; cache giữ kết quả đã giảm điểm
+    (tối đa 2 x width điểm mỗi thành phố) nên bộ nhớ không phụ thuộc độ dài cửa sổ.
+
+    Returns:
+        Tuple (chuỗi theo giờ đã giảm điểm, trung bình theo giờ trong ngày) hoặc (None, None)
+    """
+    hourly = read_hourly(list(cities), start, end, columns=[column])
+    if hourly.empty:
+        return None, None
+
+    profile = (
+        hourly.groupby(['city', hourly['date'].dt.hour.rename('hour')], observed=True)[column]
+        .mean()
+        .reset_index()
+    )
+    return minmax_downsample(hourly, 'date', column, 'city', width), profile
+
+
+@st.cache_data(show_spinner=False, max_entries=32, ttl=DATA_TTL)
+def hourly_coverage(cities):
+    """Khoảng thời gian đã có dữ liệu theo giờ của từng thành phố (chỉ đọc metadata của store)"""
+    return stored_date_ranges(list(cities), HOURLY_STORE)
+
+
+def render_hourly_section(cities, first_day, last_day):
+    """Diễn biến theo giờ của `cities` trong cửa sổ chọn bằng slider (trong khoảng first_day..last_day)"""
+    st.subheader(" Diễn Biến Theo Giờ")
+    
+    if first_day == last_day:
+        # Chỉ có một ngày: slider không có khoảng để chọn
+        window = (first_day, last_day)
+    else:
+        window = st.slider(
+            "Cửa sổ xem",
+            min_value=first_day,
+            max_value=last_day,
+            value=(max(first_day, last_day - timedelta(days=HOURLY_WINDOW_DAYS - 1)), last_day),
+            format="DD/MM/YYYY",
+            key='hourly_window'
+        )
+    series, profile = load_hourly_window(cities, window[0], window[1], 'temp')
+    
+    if series is None:
+        st.info("ℹ️ Không có dữ liệu theo giờ trong cửa sổ này.")
+        return
+    
+    # Dữ liệu theo giờ được làm mới riêng (không theo phiên bản dữ liệu ngày)
+    # nên không qua cache figure; load_hourly_window đã cache dữ liệu đã giảm điểm
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        fig = create_line_chart(series, 'date', 'temp', 'city', 'Nhiệt độ theo giờ', downsample='minmax')
+        st.plotly_chart(fig, use_container_width=True)
+    with col2:
+        fig = create_line_chart(profile, 'hour', 'temp', 'city', 'Nhiệt độ TB theo giờ trong ngày',
+                                x_label='Giờ')
+        st.plotly_chart(fig, use_container_width=True)
+
+
+def render_tab_trends(df_filtered, cube, hourly=False):
+    """
+    Render tab xu hướng thời gian
+
+    Args:
+        df_filtered: Dữ liệu ngày đã lọc
+        cube: Lát cắt khối tổng hợp của cùng bộ lọc
+        hourly: Phiên bản dữ liệu được làm mới theo giờ (refresh.py --resolution hourly)
+    """
     
     st.header(" Xu Hướng Theo Thời Gian")
     
     # LINE CHART - Temperature
     st.subheader(" Biểu Đồ Đường - Nhiệt Độ Theo Thời Gian")
     
-    fig = create_line_chart(
+    fig = cached_figure(df_filtered, 'trends_line', lambda: create_line_chart(
         df_filtered,
         'date',
         'temp_mean',
         'city',
-        'Xu hướng nhiệt độ trung bình'
-    )
+        'Xu hướng nhiệt độ trung bình',
+        cube=cube
+    ))
     st.plotly_chart(fig, use_container_width=True)
     
+    # HOURLY - Diễn biến theo giờ trong cửa sổ đang xem (chỉ khi có dữ liệu theo giờ cho lựa chọn)
+    if hourly:
+        first_day, last_day = df_filtered['date'].min().date(), df_filtered['date'].max().date()
+        cities = group_agg(cube, ['city'], {'temp_mean': ('temp_mean', 'mean')})['temp_mean'] \
+            .nlargest(MAX_CHART_CITIES).index
+        cities = tuple(sorted(cities))
+        if any(first.date() <= last_day and last.date() >= first_day
+               for first, last in hourly_coverage(cities).values()):
+            render_hourly_section(cities, first_day, last_day)
+    
     # AREA CHART - Humidity & Rainfall
     st.subheader(" Biểu Đồ Vùng - Độ Ẩm & Lượng Mưa")
     
-    selected_cities = df_filtered['city'].unique().tolist()
-    fig = create_area_chart(df_filtered, selected_cities)
+    selected_cities = cube['city'].unique().tolist()
+    fig = cached_figure(df_filtered, 'trends_area', lambda: create_area_chart(cube, selected_cities))
     st.plotly_chart(fig, use_container_width=True)
     
     # SEASONAL ANALYSIS
     st.subheader(" Phân Tích Theo Mùa")
     
-    fig = create_seasonal_bar(df_filtered)
+    fig = cached_figure(df_filtered, 'trends_seasonal', lambda: create_seasonal_bar(cube))
     st.plotly_chart(fig, use_container_width=True)
     
     # INSIGHTS
@@ -51,7 +143,7 @@ def render_tab_trends(df_filtered):
     # INSIGHTS
     with st.expander("💡 Phát hiện về xu hướng"):
         # Tính toán động theo tháng
-        monthly_temp = df_filtered.groupby('month')['temp_mean'].mean()
+        monthly_temp = group_agg(cube, ['month'], {'temp_mean': ('temp_mean', 'mean')})['temp_mean']
         max_temp_month = int(monthly_temp.idxmax())
         min_temp_month = int(monthly_temp.idxmin())
         
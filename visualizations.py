@@ -2,63 +2,237 @@
 Module chứa các hàm tạo biểu đồ
 """
 
+import os
 import plotly.express as px
 import plotly.graph_objects as go
+from plotly.colors import hex_to_rgb
 from plotly.subplots import make_subplots
+import numpy as np
 import pandas as pd
+import streamlit as st
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
 import networkx as nx
+from aggregates import group_agg
+from distributions import box_stats, histogram_counts, violin_stats
+from downsample import lttb_downsample, minmax_downsample
+from regression import confidence_bands, fit_lines
 
 # COLORS
 COLOR_PALETTE = px.colors.qualitative.Set2
 
-# BASIC CHARTS
-def create_histogram(df, column, title, x_label, nbins=30):
-    """Tạo histogram"""
-    fig = px.histogram(
-        df, 
-        x=column,
-        nbins=nbins,
+# Số thành phố tối đa vẽ riêng trên một biểu đồ
+MAX_CHART_CITIES = 10
+
+# Từ số điểm này trở lên, biểu đồ đường vẽ bằng WebGL (Scattergl) thay vì SVG
+WEBGL_MIN_POINTS = 1000
+# Cách giảm điểm của biểu đồ đường (xem downsample.py)
+DOWNSAMPLERS = {'lttb': lttb_downsample, 'minmax': minmax_downsample}
+
+# Histogram, box và violin tính sẵn số đếm, tứ phân vị và KDE phía server
+# (distributions.py) thay vì gửi mọi dòng xuống trình duyệt; 0 = để plotly tự tính
+SERVER_SIDE_DISTRIBUTIONS = os.environ.get('WEATHER_SERVER_DISTRIBUTIONS', '1') != '0'
+# Màu mặc định của plotly express
+DEFAULT_COLORS = px.colors.qualitative.Plotly
+
+# Số điểm scatter tối đa gửi xuống trình duyệt (lấy mẫu theo nhóm màu);
+# đường hồi quy vẫn tính trên toàn bộ dữ liệu
+MAX_SCATTER_POINTS = 5000
+
+# HELPERS
+def limit_cities(df, value_col, title=None, n=MAX_CHART_CITIES, agg='mean', cube=None):
+    """
+    Giữ lại n thành phố có giá trị value_col (theo agg) cao nhất khi có quá nhiều thành phố
+    
+    Args:
+        df: DataFrame ngày hoặc lát cắt khối tổng hợp
+        cube: Lát cắt khối tương ứng với df, dùng để xếp hạng thay vì gộp df
+    
+    Returns:
+        Tuple (DataFrame, title) - title được ghi chú "top n" nếu có lọc bớt
+    """
+    source = df if cube is None else cube
+    n_cities = source['city'].nunique()
+    if n_cities <= n:
+        return df, title
+    
+    top = group_agg(source, ['city'], {value_col: (value_col, agg)})[value_col].nlargest(n).index
+    if title is not None:
+        title = f'{title} (top {n}/{n_cities} thành phố)'
+    return df[df['city'].isin(top)], title
+
+def _with_alpha(color, alpha):
+    """Màu hex dạng rgba với độ trong suốt alpha"""
+    return 'rgba({}, {}, {}, {})'.format(*hex_to_rgb(color), alpha)
+
+def _group_layout(stats, x_col, color_col):
+    """
+    Vị trí trên trục x (dạng số) của từng nhóm trong stats
+    
+    Mỗi giá trị x_col một vị trí nguyên; các giá trị color_col trong cùng một
+    x đặt cạnh nhau (như boxmode='group'), nên điểm ngoại lai và đường mật độ
+    nằm đúng box của nhóm.
+    
+    Returns:
+        Tuple (vị trí từng nhóm, độ rộng mỗi nhóm, các giá trị x, các giá trị màu)
+    """
+    x_values = pd.unique(stats[x_col].astype(str))
+    positions = pd.Index(x_values).get_indexer(stats[x_col].astype(str)).astype(float)
+    color_values = pd.unique(stats[color_col].astype(str))
+    if color_col == x_col:
+        return positions, 0.7, x_values, color_values
+    
+    width = 0.8 / max(len(color_values), 1)
+    color_idx = pd.Index(color_values).get_indexer(stats[color_col].astype(str))
+    return positions + (color_idx - (len(color_values) - 1) / 2) * width, width, x_values, color_values
+
+def _outlier_positions(stats, outliers, by, positions):
+    """Vị trí trên trục x của từng điểm ngoại lai (vị trí nhóm của nó)"""
+    groups = pd.MultiIndex.from_frame(stats[by].astype(str))
+    return positions[groups.get_indexer(pd.MultiIndex.from_frame(outliers[by].astype(str)))]
+
+def _distribution_figure(stats, outliers, x_col, y_col, color_col, title, curves=None):
+    """
+    Box plot (hoặc violin khi có curves) dựng từ thống kê tính sẵn
+    
+    Args:
+        stats, outliers: Kết quả box_stats / violin_stats theo [x_col, color_col]
+        curves: Tuple (lưới, mật độ) của violin_stats, None = box plot
+    """
+    by = list(dict.fromkeys([x_col, color_col]))
+    positions, width, x_values, color_values = _group_layout(stats, x_col, color_col)
+    outlier_x = _outlier_positions(stats, outliers, by, positions)
+    stat_colors = stats[color_col].astype(str).to_numpy()
+    outlier_colors = outliers[color_col].astype(str).to_numpy()
+    
+    traces = []
+    for i, name in enumerate(color_values):
+        color = DEFAULT_COLORS[i % len(DEFAULT_COLORS)]
+        rows = np.flatnonzero(stat_colors == name)
+        group = stats.iloc[rows]
+        box_width = width * 0.9
+        
+        if curves is not None:
+            # Đường mật độ: mỗi violin một đa giác (ngăn cách bằng NaN), cùng độ rộng tối đa
+            grid, density = curves[0][rows], curves[1][rows]
+            half = density / density.max(axis=1, keepdims=True) * width * 0.45
+            center = positions[rows][:, None]
+            xs = np.hstack([center + half, (center - half)[:, ::-1], np.full((len(rows), 1), np.nan)]).ravel()
+            ys = np.hstack([grid, grid[:, ::-1], np.full((len(rows), 1), np.nan)]).ravel()
+            # float32 đủ chính xác cho hình dạng đường mật độ, giảm một nửa dữ liệu gửi đi
+            traces.append(go.Scatter(
+                x=xs.astype(np.float32), y=ys.astype(np.float32), mode='lines', fill='toself', name=name, legendgroup=name,
+                line=dict(color=color, width=1), fillcolor=_with_alpha(color, 0.5), hoveron='fills'
+            ))
+            box_width = width * 0.2
+        
+        traces.append(go.Box(
+            x=positions[rows],
+            q1=group['q1'].to_numpy(), median=group['median'].to_numpy(), q3=group['q3'].to_numpy(),
+            lowerfence=group['lowerfence'].to_numpy(), upperfence=group['upperfence'].to_numpy(),
+            mean=group['mean'].to_numpy(), width=box_width,
+            name=name, legendgroup=name, showlegend=curves is None,
+            marker_color=color, fillcolor='white' if curves is not None else None
+        ))
+        
+        points = outlier_colors == name
+        traces.append(go.Scatter(
+            x=outlier_x[points], y=outliers[y_col].to_numpy()[points],
+            mode='markers', name=name, legendgroup=name, showlegend=False,
+            marker=dict(color=color, size=4), hovertemplate=f'{name}: %{{y}}<extra></extra>'
+        ))
+    
+    fig = go.Figure(data=traces)
+    fig.update_layout(
         title=title,
-        labels={column: x_label, 'count': 'Tần suất'},
-        color_discrete_sequence=['#667eea']
+        xaxis=dict(title='Nhóm', tickvals=np.arange(len(x_values)), ticktext=list(x_values)),
+        yaxis_title='Giá trị',
+        legend_title_text='Nhóm' if color_col == x_col else color_col
     )
+    return fig
+
+# BASIC CHARTS
+def create_histogram(df, column, title, x_label, nbins=30, server_side=SERVER_SIDE_DISTRIBUTIONS):
+    """Tạo histogram (server_side: chỉ gửi số đếm của từng bin)"""
+    if server_side:
+        edges, counts = histogram_counts(df[column], nbins)
+        fig = go.Figure(go.Bar(
+            x=(edges[:-1] + edges[1:]) / 2,
+            y=counts,
+            width=np.diff(edges),
+            marker_color='#667eea',
+            hovertemplate='%{x:.2f}: %{y}<extra></extra>'
+        ))
+        fig.update_layout(title=title, xaxis_title=x_label, yaxis_title='Tần suất', bargap=0)
+    else:
+        fig = px.histogram(
+            df, 
+            x=column,
+            nbins=nbins,
+            title=title,
+            labels={column: x_label, 'count': 'Tần suất'},
+            color_discrete_sequence=['#667eea']
+        )
     fig.update_layout(showlegend=False, height=400)
     return fig
 
-def create_boxplot(df, x_col, y_col, title, color_col=None):
-    """Tạo boxplot"""
-    fig = px.box(
-        df,
-        x=x_col,
-        y=y_col,
-        color=color_col or x_col,
-        title=title,
-        labels={y_col: 'Giá trị', x_col: 'Nhóm'}
-    )
+def create_boxplot(df, x_col, y_col, title, color_col=None, cube=None, server_side=SERVER_SIDE_DISTRIBUTIONS):
+    """Tạo boxplot (server_side: chỉ gửi tứ phân vị, râu và điểm ngoại lai của từng nhóm)"""
+    if 'city' in (x_col, color_col):
+        df, title = limit_cities(df, y_col, title, cube=cube)
+    
+    if server_side:
+        by = list(dict.fromkeys([x_col, color_col or x_col]))
+        stats, outliers = box_stats(df, y_col, by)
+        fig = _distribution_figure(stats, outliers, x_col, y_col, color_col or x_col, title)
+    else:
+        fig = px.box(
+            df,
+            x=x_col,
+            y=y_col,
+            color=color_col or x_col,
+            title=title,
+            labels={y_col: 'Giá trị', x_col: 'Nhóm'}
+        )
     fig.update_layout(height=400)
     return fig
 
-def create_violin_plot(df, x_col, y_col, title):
-    """Tạo violin plot"""
-    fig = px.violin(
-        df,
-        x=x_col,
-        y=y_col,
-        color=x_col,
-        box=True,
-        points='outliers',
-        title=title,
-        labels={y_col: 'Giá trị', x_col: 'Nhóm'}
-    )
+def create_violin_plot(df, x_col, y_col, title, cube=None, server_side=SERVER_SIDE_DISTRIBUTIONS):
+    """Tạo violin plot (server_side: chỉ gửi đường mật độ KDE, tứ phân vị và điểm ngoại lai)"""
+    if x_col == 'city':
+        df, title = limit_cities(df, y_col, title, cube=cube)
+    
+    if server_side:
+        stats, outliers, grid, density = violin_stats(df, y_col, [x_col])
+        fig = _distribution_figure(stats, outliers, x_col, y_col, x_col, title, curves=(grid, density))
+    else:
+        fig = px.violin(
+            df,
+            x=x_col,
+            y=y_col,
+            color=x_col,
+            box=True,
+            points='outliers',
+            title=title,
+            labels={y_col: 'Giá trị', x_col: 'Nhóm'}
+        )
     fig.update_layout(height=450)
     return fig
 
 # TIME SERIES CHARTS
-def create_line_chart(df, x_col, y_col, color_col, title):
-    """Tạo line chart"""
-    df_grouped = df.groupby([x_col, color_col])[y_col].mean().reset_index()
+def create_line_chart(df, x_col, y_col, color_col, title, cube=None, x_label='Thời gian', downsample='lttb'):
+    """
+    Tạo line chart
+    
+    Mỗi đường được giảm điểm theo độ rộng biểu đồ (downsample: 'lttb' hoặc
+    'minmax', xem downsample.py), nên số điểm gửi xuống trình duyệt không tăng
+    theo độ dài lịch sử; biểu đồ nhiều điểm được vẽ bằng WebGL.
+    """
+    if color_col == 'city':
+        df, title = limit_cities(df, y_col, title, cube=cube)
+    
+    df_grouped = df.groupby([x_col, color_col], observed=True)[y_col].mean().reset_index()
+    df_grouped = DOWNSAMPLERS[downsample](df_grouped, x_col, y_col, color_col)
     
     fig = px.line(
         df_grouped,
@@ -66,17 +240,22 @@ def create_line_chart(df, x_col, y_col, color_col, title):
         y=y_col,
         color=color_col,
         title=title,
-        labels={x_col: 'Thời gian', y_col: 'Giá trị'}
+        labels={x_col: x_label, y_col: 'Giá trị'},
+        render_mode='webgl' if len(df_grouped) >= WEBGL_MIN_POINTS else 'svg'
     )
     fig.update_traces(line=dict(width=2))
     fig.update_layout(height=450, hovermode='x unified')
     return fig
 
 def create_area_chart(df, cities):
-    """Tạo area chart cho độ ẩm và mưa"""
-    df_monthly = df.groupby(['month', 'city']).agg({
-        'humidity': 'mean',
-        'rainfall': 'sum'
+    """Tạo area chart cho độ ẩm và mưa (df: dữ liệu ngày hoặc lát cắt khối tổng hợp)"""
+    df, title = limit_cities(df, 'rainfall', 'Xu hướng độ ẩm và lượng mưa theo tháng', agg='sum')
+    shown = set(df['city'].unique())
+    cities = [city for city in cities if city in shown]
+    
+    df_monthly = group_agg(df, ['month', 'city'], {
+        'humidity': ('humidity', 'mean'),
+        'rainfall': ('rainfall', 'sum')
     }).reset_index()
     
     fig = make_subplots(specs=[[{"secondary_y": True}]])
@@ -111,7 +290,7 @@ def create_area_chart(df, cities):
     fig.update_yaxes(title_text="Độ ẩm (%)", secondary_y=False)
     fig.update_yaxes(title_text="Lượng mưa (mm)", secondary_y=True)
     fig.update_layout(
-        title='Xu hướng độ ẩm và lượng mưa theo tháng',
+        title=title,
         height=450,
         hovermode='x unified'
     )
@@ -119,24 +298,67 @@ def create_area_chart(df, cities):
     return fig
 
 # SCATTER & CORRELATION
-def create_scatter_with_regression(df, x_col, y_col, color_col, size_col=None):
-    """Tạo scatter plot với đường hồi quy"""
+def create_scatter_with_regression(df, x_col, y_col, color_col, size_col=None, cube=None,
+                                   max_points=MAX_SCATTER_POINTS):
+    """
+    Tạo scatter plot với đường hồi quy
+    
+    Đường hồi quy OLS và dải tin cậy của mọi nhóm màu được tính cùng lúc trên
+    toàn bộ df (regression.py); khi df có hơn max_points dòng, chỉ một mẫu
+    (cùng tỉ lệ ở mỗi nhóm màu) được vẽ thành điểm (None = vẽ mọi điểm).
+    """
+    if color_col == 'city':
+        df, _ = limit_cities(df, y_col, cube=cube)
+    
+    fits = fit_lines(df, x_col, y_col, color_col)
+    groups = fits[color_col].astype(str).tolist()
+    colors = {group: DEFAULT_COLORS[i % len(DEFAULT_COLORS)] for i, group in enumerate(groups)}
+    
+    points = df
+    if max_points is not None and len(df) > max_points:
+        points = df.groupby(color_col, observed=True, group_keys=False) \
+            .sample(frac=max_points / len(df), random_state=0)
+    
     fig = px.scatter(
-        df,
+        points,
         x=x_col,
         y=y_col,
         color=color_col,
         size=size_col,
-        trendline='ols',
         title=f'Mối quan hệ {x_col} - {y_col}',
-        labels={x_col: x_col, y_col: y_col}
+        labels={x_col: x_col, y_col: y_col},
+        color_discrete_map=colors,
+        category_orders={color_col: groups}
     )
+    
+    # Đường hồi quy và dải tin cậy của từng nhóm (cùng màu, cùng legendgroup với điểm)
+    line_x, fitted, lower, upper = confidence_bands(fits)
+    slopes, intercepts, r2s = fits['slope'].to_numpy(), fits['intercept'].to_numpy(), fits['r2'].to_numpy()
+    traces = []
+    for i, group in enumerate(groups):
+        color = colors[group]
+        if np.isfinite(lower[i]).all():
+            traces.append(go.Scatter(
+                x=np.r_[line_x[i], line_x[i][::-1]], y=np.r_[upper[i], lower[i][::-1]],
+                fill='toself', fillcolor=_with_alpha(color, 0.15), line=dict(width=0),
+                hoverinfo='skip', legendgroup=group, showlegend=False
+            ))
+        traces.append(go.Scatter(
+            x=line_x[i], y=fitted[i], mode='lines', line=dict(color=color, width=2),
+            name=group, legendgroup=group, showlegend=False,
+            hovertemplate=(
+                f'<b>OLS trendline</b><br>{y_col} = {slopes[i]:.6g} * {x_col} + {intercepts[i]:.6g}'
+                f'<br>R<sup>2</sup>={r2s[i]:.6f}<br>{x_col}=%{{x}}<br>{y_col}=%{{y}} <b>(trend)</b><extra>{group}</extra>'
+            )
+        ))
+    fig.add_traces(traces)
     fig.update_layout(height=450)
     return fig
 
-def create_correlation_heatmap(df, columns):
-    """Tạo heatmap tương quan"""
-    corr_matrix = df[columns].corr()
+def create_correlation_heatmap(df, columns, corr_matrix=None):
+    """Tạo heatmap tương quan (corr_matrix: ma trận đã tính sẵn, khi đó bỏ qua df)"""
+    if corr_matrix is None:
+        corr_matrix = df[columns].corr()
     
     fig = px.imshow(
         corr_matrix,
@@ -153,8 +375,8 @@ def create_correlation_heatmap(df, columns):
 
 # HIERARCHICAL CHARTS
 def create_treemap(df, path_cols, value_col, title):
-    """Tạo treemap"""
-    df_grouped = df.groupby(path_cols)[value_col].sum().reset_index()
+    """Tạo treemap (df: dữ liệu ngày hoặc lát cắt khối tổng hợp)"""
+    df_grouped = group_agg(df, path_cols, {value_col: (value_col, 'sum')}).reset_index()
     
     fig = px.treemap(
         df_grouped,
@@ -168,8 +390,8 @@ def create_treemap(df, path_cols, value_col, title):
     return fig
 
 def create_sunburst(df):
-    """Tạo sunburst chart cho mưa"""
-    df_sun = df.groupby(['region', 'season', 'city'])['rainfall'].sum().reset_index()
+    """Tạo sunburst chart cho mưa (df: dữ liệu ngày hoặc lát cắt khối tổng hợp)"""
+    df_sun = group_agg(df, ['region', 'season', 'city'], {'rainfall': ('rainfall', 'sum')}).reset_index()
     
     fig = px.sunburst(
         df_sun,
@@ -215,21 +437,27 @@ def create_scatter_map(df_map):
 
 # COMPARISON CHARTS
 def create_radar_chart(city1_data, city2_data, city1_name, city2_name):
-    """Tạo radar chart so sánh 2 thành phố"""
+    """
+    Tạo radar chart so sánh 2 thành phố
+    
+    Args:
+        city1_data, city2_data: Giá trị trung bình theo ngày của từng thành phố
+            (Series/dict có temp_mean, humidity, rainfall, temp_range)
+    """
     categories = ['Nhiệt độ TB', 'Độ ẩm', 'Lượng mưa', 'Biên độ nhiệt']
     
     city1_values = [
-        city1_data['temp_mean'].mean() / 35 * 100,
-        city1_data['humidity'].mean(),
-        city1_data['rainfall'].mean() * 2,
-        city1_data['temp_range'].mean() * 10
+        city1_data['temp_mean'] / 35 * 100,
+        city1_data['humidity'],
+        city1_data['rainfall'] * 2,
+        city1_data['temp_range'] * 10
     ]
     
     city2_values = [
-        city2_data['temp_mean'].mean() / 35 * 100,
-        city2_data['humidity'].mean(),
-        city2_data['rainfall'].mean() * 2,
-        city2_data['temp_range'].mean() * 10
+        city2_data['temp_mean'] / 35 * 100,
+        city2_data['humidity'],
+        city2_data['rainfall'] * 2,
+        city2_data['temp_range'] * 10
     ]
     
     fig = go.Figure()
@@ -258,12 +486,12 @@ def create_radar_chart(city1_data, city2_data, city1_name, city2_name):
     return fig
 
 def create_parallel_coordinates(df):
-    """Tạo parallel coordinates"""
-    df_parallel = df.groupby('city').agg({
-        'temp_mean': 'mean',
-        'humidity': 'mean',
-        'rainfall': 'sum',
-        'temp_range': 'mean'
+    """Tạo parallel coordinates (df: dữ liệu ngày hoặc lát cắt khối tổng hợp)"""
+    df_parallel = group_agg(df, ['city'], {
+        'temp_mean': ('temp_mean', 'mean'),
+        'humidity': ('humidity', 'mean'),
+        'rainfall': ('rainfall', 'sum'),
+        'temp_range': ('temp_range', 'mean')
     }).reset_index()
     
     fig = px.parallel_coordinates(
@@ -283,11 +511,12 @@ def create_parallel_coordinates(df):
     return fig
 
 def create_3d_scatter(df):
-    """Tạo 3D scatter plot"""
-    df_3d = df.groupby('city').agg({
-        'temp_mean': 'mean',
-        'humidity': 'mean',
-        'rainfall': 'sum'
+    """Tạo 3D scatter plot (df: dữ liệu ngày hoặc lát cắt khối tổng hợp)"""
+    df, title = limit_cities(df, 'rainfall', 'Phân tích 3D: Nhiệt độ - Độ ẩm - Lượng mưa', agg='sum')
+    df_3d = group_agg(df, ['city'], {
+        'temp_mean': ('temp_mean', 'mean'),
+        'humidity': ('humidity', 'mean'),
+        'rainfall': ('rainfall', 'sum')
     }).reset_index()
     
     fig = px.scatter_3d(
@@ -297,7 +526,7 @@ def create_3d_scatter(df):
         z='rainfall',
         color='city',
         size='rainfall',
-        title='Phân tích 3D: Nhiệt độ - Độ ẩm - Lượng mưa',
+        title=title,
         labels={
             'temp_mean': 'Nhiệt độ (°C)',
             'humidity': 'Độ ẩm (%)',
@@ -319,7 +548,8 @@ def create_heatmap_calendar(df, city):
         values='temp_mean',
         index='week',
         columns='dayofweek',
-        aggfunc='mean'
+        aggfunc='mean',
+        observed=True
     )
     
     fig = px.imshow(
@@ -358,43 +588,49 @@ def create_heatmap_calendar(df, city):
     
 #     return fig
 
+@st.cache_data(show_spinner=False, max_entries=32)
+def network_layout(n_nodes, edges):
+    """
+    Toạ độ spring layout của đồ thị, cache theo cấu trúc (dùng chung mọi phiên)
+
+    Layout chỉ phụ thuộc số đỉnh, các cạnh và seed cố định, không phụ thuộc tên
+    đỉnh, nên các bộ lọc cho cùng cấu trúc đồ thị dùng chung một kết quả.
+
+    Args:
+        n_nodes: Số đỉnh (đỉnh được đánh số 0..n_nodes-1 theo thứ tự thêm vào)
+        edges: Mảng (số cạnh, 2) chỉ số hai đầu mỗi cạnh
+
+    Returns:
+        Mảng (n_nodes, 2) toạ độ x, y của từng đỉnh
+    """
+    G = nx.Graph()
+    G.add_nodes_from(range(n_nodes))
+    G.add_edges_from(edges.tolist(), weight=2)
+    pos = nx.spring_layout(G, k=2, iterations=50, seed=42)
+    return np.array([pos[node] for node in range(n_nodes)]).reshape(n_nodes, 2)
+
 def create_network_graph(df):
-    """Tạo Network Graph thể hiện mối liên hệ"""
+    """Tạo Network Graph thể hiện mối liên hệ (df: dữ liệu ngày hoặc lát cắt khối tổng hợp)"""
     
     if df.empty:
         return None
     
-    # Tạo graph
-    G = nx.Graph()
-    
-    # Thêm nodes cho thành phố
-    for city in df['city'].unique():
-        G.add_node(city, node_type='city')
+    # Đỉnh: các thành phố rồi các mùa (theo thứ tự xuất hiện);
+    # cạnh: các cặp (thành phố, mùa) có trong dữ liệu
+    city_codes, cities = pd.factorize(df['city'])
+    season_codes, seasons = pd.factorize(df['season'])
+    pairs = city_codes.astype(np.int64) * len(seasons) + season_codes
+    _, first = np.unique(pairs, return_index=True)
+    first.sort()
+    edges = np.column_stack([city_codes[first], len(cities) + season_codes[first]])
     
-    # Thêm nodes cho mùa
-    for season in df['season'].unique():
-        G.add_node(season, node_type='season')
+    # Tính layout (cache theo cấu trúc đồ thị)
+    names = [*cities, *seasons]
+    pos = network_layout(len(names), edges)
     
-    # Thêm edges - kết nối thành phố với mùa
-    city_season_pairs = df[['city', 'season']].drop_duplicates()
-    for _, row in city_season_pairs.iterrows():
-        G.add_edge(row['city'], row['season'], weight=2)
-    
-    # Tính layout
-    pos = nx.spring_layout(G, k=2, iterations=50, seed=42)
-    
-    # Chuẩn bị dữ liệu cho Plotly
-    edge_x = []
-    edge_y = []
-    for edge in G.edges():
-        x0, y0 = pos[edge[0]]
-        x1, y1 = pos[edge[1]]
-        edge_x.append(x0)
-        edge_x.append(x1)
-        edge_x.append(None)
-        edge_y.append(y0)
-        edge_y.append(y1)
-        edge_y.append(None)
+    # Cạnh: một trace, các đoạn ngăn cách bằng NaN
+    edge_x = np.column_stack([pos[edges[:, 0], 0], pos[edges[:, 1], 0], np.full(len(edges), np.nan)]).ravel()
+    edge_y = np.column_stack([pos[edges[:, 0], 1], pos[edges[:, 1], 1], np.full(len(edges), np.nan)]).ravel()
     
     edge_trace = go.Scatter(
         x=edge_x, y=edge_y,
@@ -404,38 +640,20 @@ def create_network_graph(df):
         showlegend=False
     )
     
-    # Nodes
-    node_x = []
-    node_y = []
-    node_color = []
-    node_size = []
-    node_text = []
-    
-    for node in G.nodes():
-        x, y = pos[node]
-        node_x.append(x)
-        node_y.append(y)
-        
-        # Màu và kích thước theo loại
-        if G.nodes[node].get('node_type') == 'city':
-            node_color.append('#FF6B6B')  # Đỏ cho thành phố
-            node_size.append(25)
-            node_text.append(f"<b>{node}</b><br>Thành phố")
-        else:
-            node_color.append('#4ECDC4')  # Xanh cho mùa
-            node_size.append(20)
-            node_text.append(f"<b>{node}</b><br>Mùa")
+    # Nodes: màu và kích thước theo loại (đỏ cho thành phố, xanh cho mùa)
+    is_city = np.arange(len(names)) < len(cities)
+    node_text = [f"<b>{name}</b><br>{'Thành phố' if city else 'Mùa'}" for name, city in zip(names, is_city)]
     
     node_trace = go.Scatter(
-        x=node_x, y=node_y,
+        x=pos[:, 0], y=pos[:, 1],
         mode='markers+text',
-        text=[node for node in G.nodes()],
+        text=names,
         textposition="top center",
         hovertext=node_text,
         hoverinfo='text',
         marker=dict(
-            size=node_size,
-            color=node_color,
+            size=np.where(is_city, 25, 20).tolist(),
+            color=np.where(is_city, '#FF6B6B', '#4ECDC4').tolist(),
             line_width=2,
             line_color='white'
         ),
@@ -458,8 +676,9 @@ def create_network_graph(df):
     return fig
 
 def create_seasonal_bar(df):
-    """Tạo bar chart theo mùa"""
-    df_season = df.groupby(['season', 'city'])['temp_mean'].mean().reset_index()
+    """Tạo bar chart theo mùa (df: dữ liệu ngày hoặc lát cắt khối tổng hợp)"""
+    df, title = limit_cities(df, 'temp_mean', 'Nhiệt độ trung bình theo mùa')
+    df_season = group_agg(df, ['season', 'city'], {'temp_mean': ('temp_mean', 'mean')}).reset_index()
     
     fig = px.bar(
         df_season,
@@ -467,7 +686,7 @@ def create_seasonal_bar(df):
         y='temp_mean',
         color='city',
         barmode='group',
-        title='Nhiệt độ trung bình theo mùa',
+        title=title,
         labels={'season': 'Mùa', 'temp_mean': 'Nhiệt độ (°C)', 'city': 'Thành phố'}
     )
     fig.update_layout(height=450)